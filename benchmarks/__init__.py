@@ -0,0 +1,7 @@
+"""Performance benchmarks for phmdoctest.
+
+Run from the root of the repository:
+
+    python -m benchmarks run --output results.json
+    python -m benchmarks compare base.json results.json
+"""
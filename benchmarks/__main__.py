@@ -0,0 +1,108 @@
+"""Command line for the benchmarks. Run with python -m benchmarks."""
+import json
+import sys
+import tempfile
+
+import click
+
+from benchmarks import bench
+from benchmarks.corpus import CORPORA, generate_markdown
+
+
+@click.group()
+def cli() -> None:
+    """phmdoctest performance benchmarks."""
+
+
+@cli.command()
+@click.option(
+    "--output",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    default="-",
+    help='Write the JSON results to path PATH. "-" writes to stdout.',
+)
+@click.option(
+    "-c",
+    "--corpus",
+    "corpora",
+    multiple=True,
+    type=click.Choice(sorted(CORPORA)),
+    help="Run on just this corpus. More than one is ok.",
+)
+@click.option(
+    "-b",
+    "--bench",
+    "benchmarks",
+    multiple=True,
+    type=click.Choice(list(bench.BENCHMARKS)),
+    help="Run just this benchmark. More than one is ok.",
+)
+@click.option("--repeat", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option(
+    "--min-time",
+    type=float,
+    default=0.2,
+    show_default=True,
+    help="Minimum seconds for each repeat.",
+)
+def run(output, corpora, benchmarks, repeat, min_time):  # type: ignore
+    """Run the benchmarks and save the results as JSON."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        results = bench.run_benchmarks(
+            tmpdir,
+            corpora=list(corpora),
+            benchmarks=list(benchmarks),
+            repeat=repeat,
+            min_time=min_time,
+            progress=lambda name: click.echo(name, err=True),
+        )
+    with click.open_file(output, "w", encoding="utf-8") as fp:
+        fp.write(json.dumps(results, indent=2) + "\n")
+
+
+@cli.command(name="compare")
+@click.argument("base", type=click.Path(exists=True, dir_okay=False))
+@click.argument("new", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.1,
+    show_default=True,
+    help="Fraction slower than BASE that is a regression.",
+)
+def compare_command(base, new, threshold):  # type: ignore
+    """Compare two results files. Exit with status 1 if NEW regressed."""
+    comparisons = bench.compare(bench.load(base), bench.load(new), threshold)
+    click.echo("{:<32} {:>12} {:>12} {:>7}".format("benchmark", "base", "new", "ratio"))
+    for c in comparisons:
+        flag = "  REGRESSION" if c.regressed else ""
+        click.echo(
+            "{:<32} {:>12.6f} {:>12.6f} {:>7.2f}{}".format(
+                c.name, c.base, c.new, c.ratio, flag
+            )
+        )
+    regressions = [c for c in comparisons if c.regressed]
+    if regressions:
+        raise click.ClickException(
+            "{} of {} benchmarks regressed more than {:.0%}.".format(
+                len(regressions), len(comparisons), threshold
+            )
+        )
+
+
+@cli.command()
+@click.option("-c", "--corpus", type=click.Choice(sorted(CORPORA)), default="small")
+@click.option("--seed", type=int, help="Override the corpus seed.")
+@click.option("--blocks", type=click.IntRange(min=0), help="Override block count.")
+def corpus(corpus, seed, blocks):  # type: ignore
+    """Write a synthetic Markdown file to stdout."""
+    spec = CORPORA[corpus]
+    if seed is not None:
+        spec = spec._replace(seed=seed)
+    if blocks is not None:
+        spec = spec._replace(blocks=blocks)
+    sys.stdout.write(generate_markdown(spec))
+
+
+if __name__ == "__main__":
+    cli()
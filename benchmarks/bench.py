@@ -0,0 +1,215 @@
+"""Time the stages of phmdoctest on the synthetic corpora.
+
+Each benchmark is a function that takes the Markdown text and a
+temporary directory and returns a callable to time.
+Work that is not part of the stage is done before returning
+the callable.
+"""
+from collections import namedtuple
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from typing import Any, Callable, Dict, List, Optional
+
+from click.testing import CliRunner
+
+import phmdoctest
+from phmdoctest.entryargs import Args
+from phmdoctest.fenced import Role
+import phmdoctest.cases
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.inline
+import phmdoctest.main
+import phmdoctest.scanner
+import phmdoctest.stream
+import phmdoctest.tool
+
+from benchmarks.corpus import CORPORA, generate_markdown
+
+Comparison = namedtuple("Comparison", ["name", "base", "new", "ratio", "regressed"])
+"""One benchmark in both results files. Times are the minimums."""
+
+
+def make_args(markdown_path: str, outfile: Optional[str]) -> Args:
+    """Args for the Markdown file with all the options off."""
+    return Args(
+        markdown_file=markdown_path,
+        outfile=outfile,
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+
+
+def commonmark_blocks(markdown: str) -> List[phmdoctest.fenced.FencedBlock]:
+    """Blocks of the Markdown found by the commonmark parser."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    return phmdoctest.fenced.convert_nodes(nodes)
+
+
+def bench_parse_scanner(markdown: str, tmpdir: str) -> Callable[[], Any]:
+    """Line scanner. Falls back to commonmark for nested blocks."""
+    return lambda: phmdoctest.scanner.fenced_block_nodes(io.StringIO(markdown))
+
+
+def bench_parse_commonmark(markdown: str, tmpdir: str) -> Callable[[], Any]:
+    """commonmark parser."""
+    return lambda: phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+
+
+def bench_roles(markdown: str, tmpdir: str) -> Callable[[], Any]:
+    """Convert nodes to blocks and assign roles."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    args = make_args("bench.md", None)
+
+    def assign() -> None:
+        blocks = phmdoctest.fenced.convert_nodes(nodes)
+        phmdoctest.fillrole.assign_roles(args, blocks)
+
+    return assign
+
+
+def bench_inline(markdown: str, tmpdir: str) -> Callable[[], Any]:
+    """Inline command rewriting of every Python code block."""
+    blocks = commonmark_blocks(markdown)
+    phmdoctest.fillrole.assign_roles(make_args("bench.md", None), blocks)
+    contents = [b.contents for b in blocks if b.role == Role.CODE]
+
+    def rewrite() -> None:
+        for code in contents:
+            phmdoctest.inline.apply_inline_commands(code)
+
+    return rewrite
+
+
+def bench_cases(markdown: str, tmpdir: str) -> Callable[[], Any]:
+    """Generate the test file text from blocks with roles."""
+    args = make_args("bench.md", "-")
+    blocks = commonmark_blocks(markdown)
+    phmdoctest.fillrole.assign_roles(args, blocks)
+    return lambda: phmdoctest.cases.build_test_cases(args, blocks)
+
+
+def write_markdown(markdown: str, tmpdir: str) -> str:
+    """Write the Markdown to a file in tmpdir and return its path."""
+    path = os.path.join(tmpdir, "bench.md")
+    with open(path, "w", encoding="utf-8") as fp:
+        fp.write(markdown)
+    return path
+
+
+def bench_generate(markdown: str, tmpdir: str) -> Callable[[], Any]:
+    """Markdown file to test file without the command line or the cache."""
+    path = write_markdown(markdown, tmpdir)
+    args = make_args(path, os.path.join(tmpdir, "test_bench.py"))
+    return lambda: phmdoctest.main.generate(args)
+
+
+def bench_cli(markdown: str, tmpdir: str) -> Callable[[], Any]:
+    """phmdoctest command line with --no-cache."""
+    path = write_markdown(markdown, tmpdir)
+    outfile = os.path.join(tmpdir, "test_bench.py")
+    runner = CliRunner()
+    command = [path, "--outfile", outfile, "--no-cache"]
+
+    def invoke() -> None:
+        result = runner.invoke(phmdoctest.main.entry_point, command)
+        assert result.exit_code == 0, result.output
+
+    return invoke
+
+
+BENCHMARKS = {
+    "parse_scanner": bench_parse_scanner,
+    "parse_commonmark": bench_parse_commonmark,
+    "roles": bench_roles,
+    "inline": bench_inline,
+    "cases": bench_cases,
+    "generate": bench_generate,
+    "cli": bench_cli,
+}
+"""Benchmark name to benchmark function."""
+
+
+def time_callable(
+    function: Callable[[], Any], repeat: int, min_time: float
+) -> Dict[str, Any]:
+    """Time the function. Each of repeat samples runs at least min_time."""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    samples = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return dict(
+        min=min(samples),
+        median=statistics.median(samples),
+        mean=statistics.mean(samples),
+        repeat=repeat,
+        number=number,
+    )
+
+
+def run_benchmarks(
+    tmpdir: str,
+    corpora: Optional[List[str]] = None,
+    benchmarks: Optional[List[str]] = None,
+    repeat: int = 5,
+    min_time: float = 0.2,
+    progress: Callable[[str], None] = lambda name: None,
+) -> Dict[str, Any]:
+    """Run the benchmarks on the corpora and return the results."""
+    results = {}
+    for corpus_name in corpora or sorted(CORPORA):
+        markdown = generate_markdown(CORPORA[corpus_name])
+        for bench_name in benchmarks or list(BENCHMARKS):
+            name = "{}/{}".format(corpus_name, bench_name)
+            progress(name)
+            function = BENCHMARKS[bench_name](markdown, tmpdir)
+            results[name] = time_callable(function, repeat, min_time)
+    return dict(
+        phmdoctest_version=phmdoctest.__version__,
+        python=sys.version,
+        platform=platform.platform(),
+        created=datetime.datetime.now().isoformat(timespec="seconds"),
+        results=results,
+    )
+
+
+def compare(
+    base: Dict[str, Any], new: Dict[str, Any], threshold: float
+) -> List[Comparison]:
+    """Compare the minimum times of the benchmarks in both results."""
+    comparisons = []
+    for name in sorted(base["results"]):
+        if name not in new["results"]:
+            continue
+        base_time = base["results"][name]["min"]
+        new_time = new["results"][name]["min"]
+        ratio = new_time / base_time
+        comparisons.append(
+            Comparison(name, base_time, new_time, ratio, ratio > 1.0 + threshold)
+        )
+    return comparisons
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as fp:
+        data = json.load(fp)  # type: Dict[str, Any]
+    return data
@@ -0,0 +1,149 @@
+"""Generate synthetic Markdown files for benchmarks.
+
+The same arguments and seed always generate the same Markdown.
+The Python code blocks print what their output blocks expect
+so the generated test files pass.
+"""
+from collections import namedtuple
+import random
+from typing import List
+
+CorpusSpec = namedtuple(
+    "CorpusSpec",
+    [
+        "seed",
+        "blocks",
+        "block_lines",
+        "directive_density",
+        "session_fraction",
+        "output_fraction",
+        "other_fraction",
+        "inline_density",
+        "nesting",
+    ],
+)
+"""Controls for generate_markdown().
+
+seed
+    Random number generator seed.
+blocks
+    Number of fenced code blocks, not counting output blocks.
+block_lines
+    Average number of lines in a block.
+directive_density
+    Probability a block has an HTML comment directive.
+session_fraction
+    Fraction of the Python blocks that are sessions.
+output_fraction
+    Probability a Python code block has an output block.
+other_fraction
+    Fraction of the blocks that are not Python.
+inline_density
+    Probability a print line has a phmdoctest:omit inline command.
+nesting
+    Probability a block is inside a list item or block quote.
+    Nested blocks need the commonmark parser.
+"""
+
+DEFAULT_SPEC = CorpusSpec(
+    seed=0,
+    blocks=100,
+    block_lines=6,
+    directive_density=0.2,
+    session_fraction=0.3,
+    output_fraction=0.7,
+    other_fraction=0.1,
+    inline_density=0.1,
+    nesting=0.0,
+)
+
+CORPORA = {
+    "small": DEFAULT_SPEC._replace(blocks=20),
+    "large": DEFAULT_SPEC._replace(blocks=1000),
+    "long_blocks": DEFAULT_SPEC._replace(blocks=50, block_lines=200),
+    "huge_blocks": DEFAULT_SPEC._replace(blocks=5, block_lines=5000),
+    "directives": DEFAULT_SPEC._replace(directive_density=0.9),
+    "nested": DEFAULT_SPEC._replace(nesting=0.3),
+}
+"""Named corpora used by the benchmarks."""
+
+
+def code_block(rng: random.Random, spec: CorpusSpec, index: int) -> List[str]:
+    """Lines of a Python code block and its output block."""
+    code = []
+    output = []
+    num_lines = max(1, int(rng.expovariate(1.0 / spec.block_lines)))
+    for number in range(num_lines):
+        name = "v{}_{}".format(index, number)
+        code.append("{} = {}".format(name, number * index))
+        line = "print({})".format(name)
+        if rng.random() < spec.inline_density:
+            code.append(line + "  # phmdoctest:omit")
+        else:
+            code.append(line)
+            output.append(str(number * index))
+    lines = ["```python"] + code + ["```"]
+    if output and rng.random() < spec.output_fraction:
+        lines.extend(["```"] + output + ["```"])
+    return lines
+
+
+def session_block(rng: random.Random, spec: CorpusSpec, index: int) -> List[str]:
+    """Lines of a Python interactive session block."""
+    lines = ["```py"]
+    num_lines = max(1, int(rng.expovariate(1.0 / spec.block_lines)))
+    for number in range(num_lines):
+        lines.append(">>> {} + {}".format(index, number))
+        lines.append(str(index + number))
+    lines.append("```")
+    return lines
+
+
+def other_block(rng: random.Random, spec: CorpusSpec, index: int) -> List[str]:
+    """Lines of a fenced code block that is not Python."""
+    num_lines = max(1, int(rng.expovariate(1.0 / spec.block_lines)))
+    body = ["echo {} {}".format(index, n) for n in range(num_lines)]
+    return ["```bash"] + body + ["```"]
+
+
+def directive(rng: random.Random, index: int) -> str:
+    """HTML comment directive that is OK on any number of blocks."""
+    choices = [
+        "<!--phmdoctest-skip-->",
+        "<!--phmdoctest-mark.skip-->",
+        "<!--phmdoctest-mark.skipif<3.6-->",
+        "<!--phmdoctest-label test_block_{}-->".format(index),
+        "<!--phmdoctest-share-names-->",
+        "<!--phmdoctest-clear-names-->",
+    ]
+    return rng.choice(choices)
+
+
+def nest(rng: random.Random, lines: List[str]) -> List[str]:
+    """Put the lines in a list item or block quote."""
+    if rng.random() < 0.5:
+        return ["- list item", ""] + ["  " + line for line in lines]
+    return ["> " + line for line in lines]
+
+
+def generate_markdown(spec: CorpusSpec = DEFAULT_SPEC) -> str:
+    """Generate the Markdown text."""
+    rng = random.Random(spec.seed)
+    lines = ["# Synthetic Markdown seed {}".format(spec.seed), ""]
+    for index in range(spec.blocks):
+        lines.append("Paragraph {} describes the next block.".format(index))
+        lines.append("")
+        kind = rng.random()
+        if kind < spec.other_fraction:
+            block = other_block(rng, spec, index)
+        elif rng.random() < spec.session_fraction:
+            block = session_block(rng, spec, index)
+        else:
+            block = code_block(rng, spec, index)
+        if rng.random() < spec.directive_density:
+            block.insert(0, directive(rng, index))
+        if rng.random() < spec.nesting:
+            block = nest(rng, block)
+        lines.extend(block)
+        lines.append("")
+    return "\n".join(lines)
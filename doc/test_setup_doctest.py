@@ -18,9 +18,7 @@ def _phm_setup_doctest_teardown(doctest_namespace, managenamespace):
 
     managenamespace(operation="update", additions=locals())
     # update doctest namespace
-    additions = managenamespace(operation="copy")
-    for k, v in additions.items():
-        doctest_namespace[k] = v
+    managenamespace(operation="sync", target=doctest_namespace)
     yield
     # teardown code line 86.
     mylist.clear()
@@ -32,11 +30,9 @@ def _phm_setup_doctest_teardown(doctest_namespace, managenamespace):
 pytestmark = pytest.mark.usefixtures("_phm_setup_doctest_teardown")
 
 
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def populate_doctest_namespace(doctest_namespace, managenamespace):
-    additions = managenamespace(operation="copy")
-    for k, v in additions.items():
-        doctest_namespace[k] = v
+    managenamespace(operation="sync", target=doctest_namespace)
 
 
 def session_00000():
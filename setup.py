@@ -13,6 +13,11 @@ setup(
     entry_points={
         "console_scripts": [
             "phmdoctest=phmdoctest.main:entry_point",
+            "phmdoctest-batch=phmdoctest.batch:batch_entry_point",
+            "phmdoctest-server=phmdoctest.server:server_entry_point",
+        ],
+        "pytest11": [
+            "phmdoctest=phmdoctest.plugin",
         ],
     },
 )
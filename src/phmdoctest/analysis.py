@@ -0,0 +1,164 @@
+"""Facts about the fenced code blocks gathered in one pass."""
+from collections import Counter
+import math
+from typing import Iterable, List, Optional
+from typing import Counter as CounterType, Dict  # noqa: F401
+
+import click
+
+from phmdoctest.direct import Marker
+from phmdoctest.fenced import Role, FencedBlock
+
+
+def get_skipif_minor_number(block: FencedBlock) -> int:
+    """Get block's first skipif minor numeric value, if it exists."""
+    # Return zero if there is no such directive.
+    minor_number = 0
+    for directive in block.directives:
+        if directive.type == Marker.PYTEST_SKIPIF:
+            value = directive.value
+            try:
+                minor_number = int(value, 10)
+                if minor_number < 0:
+                    raise ValueError("phmdoctest- must be >= 0")
+            except ValueError:
+                lines = [
+                    Marker.PYTEST_SKIPIF.value + "{}-->".format(value),
+                    (
+                        "at markdown file line {} ".format(directive.line)
+                        + "must be a decimal number and >= zero."
+                    ),
+                ]
+                message = "\n".join(lines)
+                raise click.ClickException(message)
+    return minor_number
+
+
+def get_timeout_seconds(block: FencedBlock) -> Optional[float]:
+    """Get block's first timeout directive value, if it exists."""
+    # Return None if there is no such directive.
+    for directive in block.directives:
+        if directive.type == Marker.TIMEOUT:
+            value = directive.value
+            try:
+                seconds = float(value)
+                if not math.isfinite(seconds) or seconds < 0:
+                    raise ValueError("phmdoctest- must be finite and >= 0")
+            except ValueError:
+                lines = [
+                    Marker.TIMEOUT.value + "{}-->".format(value),
+                    (
+                        "at markdown file line {} ".format(directive.line)
+                        + "must be a number of seconds >= zero."
+                    ),
+                ]
+                message = "\n".join(lines)
+                raise click.ClickException(message)
+            return seconds
+    return None
+
+
+class Analysis:
+    """Role counts, first block of each role, and what the test file imports.
+
+    Add each block once it has its final role.  The code generator
+    and the report read from here instead of scanning the blocks again.
+    The TEXT patterns that matched each block are collected from
+    FencedBlock.patterns for the skips report.
+    An invalid mark.skipif or timeout directive is held in
+    directive_error so the report can still be printed.
+    """
+
+    def __init__(self) -> None:
+        self.role_counts = Counter()  # type: CounterType[Role]
+        self.first_blocks = {}  # type: Dict[Role, FencedBlock]
+        self.skipif_minor_numbers = {}  # type: Dict[FencedBlock, int]
+        self.timeouts = {}  # type: Dict[FencedBlock, float]
+        self.pattern_lines = {}  # type: Dict[str, List[int]]
+        self.needs_sys_import = False
+        self.needs_import_pytest = False
+        self.needs_names_fixture = False
+        self.needs_output_checking = False
+        self.has_collected_code = False
+        self.needs_time_limit = False
+        self.directive_error = None  # type: Optional[click.ClickException]
+
+    def add(self, block: FencedBlock) -> None:
+        """Add the facts about one block."""
+        self.role_counts[block.role] += 1
+        self.first_blocks.setdefault(block.role, block)
+        # A pattern is listed more than once if it repeats on the command line.
+        for pattern in dict.fromkeys(block.patterns):
+            self.pattern_lines.setdefault(pattern, []).append(block.line)
+        if block.role != Role.CODE:
+            return
+        try:
+            minor_number = get_skipif_minor_number(block)
+        except click.ClickException as exc:
+            if self.directive_error is None:
+                self.directive_error = exc
+            minor_number = 0
+        if minor_number:
+            self.skipif_minor_numbers[block] = minor_number
+            self.needs_sys_import = True
+            self.needs_import_pytest = True
+        try:
+            seconds = get_timeout_seconds(block)
+        except click.ClickException as exc:
+            if self.directive_error is None:
+                self.directive_error = exc
+            seconds = None
+        if seconds is not None:
+            self.timeouts[block] = seconds
+            if seconds:
+                self.needs_time_limit = True
+        label = ""
+        for directive in block.directives:
+            if directive.type == Marker.PYTEST_SKIP:
+                self.needs_import_pytest = True
+            elif directive.type in (Marker.SHARE_NAMES, Marker.CLEAR_NAMES):
+                self.needs_names_fixture = True
+            elif directive.type == Marker.LABEL:
+                label = directive.value
+        # pytest collects the test function unless a label names it.
+        if not label or label.startswith("test_"):
+            self.has_collected_code = True
+        if block.output is not None and block.output.role == Role.OUTPUT:
+            self.needs_output_checking = True
+
+    def first_block(self, role: Role) -> Optional[FencedBlock]:
+        """Get first block with the role."""
+        return self.first_blocks.get(role)
+
+    def matching_lines(self, pattern: str) -> List[int]:
+        """Line numbers of the blocks that matched the TEXT pattern."""
+        return self.pattern_lines.get(pattern, [])
+
+    def skipif_minor_number(self, block: FencedBlock) -> int:
+        """Get the block's parsed mark.skipif minor number or zero."""
+        return self.skipif_minor_numbers.get(block, 0)
+
+    def time_limit(self, block: FencedBlock, default: Optional[float]) -> float:
+        """Seconds the code block may run. Zero means no limit.
+
+        A timeout directive overrides default, the --timeout value.
+        """
+        seconds = self.timeouts.get(block, default)
+        return seconds or 0
+
+    def number_of_test_cases(self) -> int:
+        """Number of code and session blocks."""
+        return self.role_counts[Role.CODE] + self.role_counts[Role.SESSION]
+
+    def raise_directive_error(self) -> None:
+        """Raise the exception held for an invalid mark.skipif or timeout."""
+        if self.directive_error is not None:
+            raise self.directive_error
+
+
+def analyze(blocks: Iterable[FencedBlock]) -> Analysis:
+    """Gather the facts about blocks that have their final roles."""
+    analysis = Analysis()
+    for block in blocks:
+        analysis.add(block)
+    return analysis
@@ -0,0 +1,246 @@
+"""Generate pytest files for many Markdown files using a process pool."""
+from collections import namedtuple
+import concurrent.futures
+import functools
+import glob
+import os
+import re
+from typing import Dict, Iterable, List, Optional
+
+import click
+
+from phmdoctest.entryargs import Args
+import phmdoctest.main
+import phmdoctest.stamp
+
+FileResult = namedtuple("FileResult", ["markdown_file", "outfile", "error"])
+"""Outcome of generating one test file. error is None or the message."""
+
+
+def find_markdown_files(paths: Iterable[str]) -> Dict[str, str]:
+    """Find Markdown files in files, directories, and glob patterns.
+
+    Directories are searched recursively for .md files.
+    Returns dict of Markdown file paths in sorted order.
+    The value is the test file name built from the path
+    relative to the directory or glob pattern.
+    """
+    found = {}  # type: Dict[str, str]
+    for path in paths:
+        if os.path.isdir(path):
+            pattern = os.path.join(path, "**", "*.md")
+            matches = glob.glob(pattern, recursive=True)
+            base = path
+        elif os.path.isfile(path):
+            matches = [path]
+            base = os.path.dirname(path)
+        else:
+            matches = [m for m in glob.glob(path, recursive=True) if os.path.isfile(m)]
+            base = glob_base(path)
+            if not matches:
+                raise click.ClickException(
+                    "No Markdown files found for {}.".format(path)
+                )
+        for markdown_file in sorted(matches):
+            key = os.path.normpath(markdown_file)
+            if key not in found:
+                found[key] = test_file_name(os.path.relpath(key, base))
+    return dict(sorted(found.items()))
+
+
+def glob_base(pattern: str) -> str:
+    """Directory part of the pattern before the first wildcard."""
+    parts = []
+    for part in pattern.replace(os.sep, "/").split("/"):
+        if re.search(r"[*?[]", part):
+            break
+        parts.append(part)
+    return "/".join(parts) or "."
+
+
+def test_file_name(relative_path: str) -> str:
+    """Make a pytest file name from the Markdown file relative path.
+
+    For example the name for sub/example2.md is test_sub_example2.py.
+    """
+    root, _ = os.path.splitext(os.path.normpath(relative_path))
+    parts = [p for p in root.split(os.sep) if p not in (os.curdir, os.pardir)]
+    name = re.sub(r"\W", "_", "/".join(parts))
+    return "test_" + name + ".py"
+
+
+def check_unique_names(markdown_files: Dict[str, str]) -> None:
+    """Raise an exception if two Markdown files get the same test file name."""
+    by_name = {}  # type: Dict[str, List[str]]
+    for markdown_file, name in markdown_files.items():
+        by_name.setdefault(name, []).append(markdown_file)
+    lines = []
+    for name, sources in by_name.items():
+        if len(sources) > 1:
+            lines.append("{} is built from {}.".format(name, ", ".join(sources)))
+    if lines:
+        raise click.ClickException(
+            "More than one Markdown file has the same test file name.\n"
+            + "\n".join(lines)
+        )
+
+
+def generate_one(
+    args: Args, cache_dir: Optional[str] = None, check: bool = False
+) -> FileResult:
+    """Write or check the test file for one Markdown file. Runs in the pool.
+
+    Errors reading or writing the files are kept in the result too.
+    """
+    try:
+        if check:
+            phmdoctest.stamp.check(args)
+        else:
+            phmdoctest.main.generate(args, cache_dir)
+    except click.ClickException as exc:
+        return FileResult(args.markdown_file, args.outfile, exc.format_message())
+    except (OSError, UnicodeDecodeError) as exc:
+        message = "{}: {}".format(type(exc).__name__, exc)
+        return FileResult(args.markdown_file, args.outfile, message)
+    return FileResult(args.markdown_file, args.outfile, None)
+
+
+def generate_all(
+    args_list: List[Args],
+    jobs: Optional[int],
+    cache_dir: Optional[str] = None,
+    check: bool = False,
+) -> List[FileResult]:
+    """Write the test files using jobs worker processes.
+
+    The results are in the same order as args_list.
+    With jobs equal to 1 the files are written in this process.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(args_list))
+    work = functools.partial(generate_one, cache_dir=cache_dir, check=check)
+    if jobs <= 1:
+        return [work(args) for args in args_list]
+    chunksize = max(1, len(args_list) // (jobs * 4))
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(work, args_list, chunksize=chunksize))
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True)
+@click.option(
+    "--outdir",
+    required=True,
+    type=click.Path(file_okay=False),
+    help=(
+        "Write the generated test case files to directory DIRECTORY."
+        " The directory is created if needed. Each file is named"
+        " test_ followed by the Markdown file path relative to the PATHS"
+        " directory or glob pattern, with the separators and"
+        " punctuation changed to underscores."
+    ),
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=1),
+    help=(
+        "Number of worker processes. The default is the number of CPUs."
+        " 1 generates the files without starting worker processes."
+    ),
+)
+@phmdoctest.main.skip_option
+@phmdoctest.main.fail_nocode_option
+@phmdoctest.main.setup_option
+@phmdoctest.main.teardown_option
+@phmdoctest.main.setup_doctest_option
+@phmdoctest.main.stream_output_option
+@phmdoctest.main.compact_option
+@phmdoctest.main.shard_option
+@phmdoctest.main.xdist_groups_option
+@phmdoctest.main.fingerprints_option
+@phmdoctest.main.timeout_option
+@phmdoctest.main.measure_option
+@phmdoctest.main.measure_cprofile_option
+@phmdoctest.main.watch_option
+@phmdoctest.main.cache_dir_option
+@phmdoctest.main.no_cache_option
+@phmdoctest.main.stamp_option
+@phmdoctest.main.check_option
+@click.version_option()  # type: ignore
+# Note- docstring for entry point shows up in click's usage text.
+def batch_entry_point(
+    paths,
+    outdir,
+    jobs,
+    skip,
+    fail_nocode,
+    setup,
+    teardown,
+    setup_doctest,
+    stream_output,
+    compact,
+    shard,
+    xdist_groups,
+    fingerprints,
+    timeout,
+    measure,
+    measure_cprofile,
+    watch,
+    cache_dir,
+    no_cache,
+    stamp,
+    check,
+):
+    """Generate a pytest file for each Markdown file in PATHS.
+
+    PATHS are Markdown files, directories searched for .md files,
+    or glob patterns.
+    """
+    if watch and (check or shard is not None):
+        raise click.ClickException("--watch can't be used with --check or --shard.")
+    markdown_files = find_markdown_files(paths)
+    check_unique_names(markdown_files)
+    os.makedirs(outdir, exist_ok=True)
+    args_list = [
+        Args(
+            markdown_file=markdown_file,
+            outfile=os.path.join(outdir, name),
+            skips=skip,
+            is_report=False,
+            fail_nocode=fail_nocode,
+            setup=setup,
+            teardown=teardown,
+            setup_doctest=setup_doctest,
+            stamp=stamp,
+            stream_output=stream_output,
+            compact=compact,
+            shard=shard,
+            xdist_groups=xdist_groups,
+            fingerprints=fingerprints,
+            timeout=timeout,
+            measure=measure or measure_cprofile,
+            measure_cprofile=measure_cprofile,
+        )
+        for markdown_file, name in markdown_files.items()
+    ]
+    cache_dir = phmdoctest.main.choose_cache_dir(cache_dir, no_cache)
+    results = generate_all(args_list, jobs, cache_dir, check)
+    failed = [r for r in results if r.error is not None]
+    for result in failed:
+        click.echo("{}:\n{}".format(result.markdown_file, result.error), err=True)
+    if check:
+        summary = "{} Markdown files, {} test files up to date, {} failed."
+    else:
+        summary = "{} Markdown files, {} test files written, {} failed."
+    click.echo(summary.format(len(results), len(results) - len(failed), len(failed)))
+    if failed:
+        raise click.ClickException(
+            "{} of {} Markdown files failed.".format(len(failed), len(results))
+        )
+    if watch:
+        # import here since phmdoctest.watch imports phmdoctest.main
+        from phmdoctest.watch import watch as watch_files
+
+        watch_files(args_list, cache_dir)
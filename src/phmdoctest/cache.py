@@ -0,0 +1,174 @@
+"""Cache of generated test files keyed by the Markdown file and options.
+
+The cache is a directory of files named by the SHA-256 hash of the
+Markdown file bytes, the command line options that change the test
+file, the phmdoctest version, and the phmdoctest source files.
+Each file holds the generated test file text.
+
+New entries are written to a temporary file in the cache
+directory and renamed with os.replace() so concurrent phmdoctest
+processes never see a partly written entry.  When the total size of
+the entries exceeds the limit the least recently used entries
+are deleted.
+"""
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+import tempfile
+import time
+from typing import Optional
+
+import phmdoctest
+from phmdoctest.entryargs import Args
+
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+"""Least recently used entries are deleted above this total size."""
+
+STALE_TEMP_SECONDS = 24 * 60 * 60
+"""Left over temporary files older than this are deleted."""
+
+ENTRY_SUFFIX = ".py"
+TEMP_SUFFIX = ".tmp"
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 hex digest of the file bytes."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(functools.partial(fp.read, 1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def options_digest(args: Args) -> str:
+    """SHA-256 hex digest of the args that change the generated test file.
+
+    --outfile and --report don't change the test file.
+    """
+    options = [
+        args.markdown_file,
+        list(args.skips),
+        args.fail_nocode,
+        args.setup,
+        args.teardown,
+        args.setup_doctest,
+        args.stamp,
+    ]
+    # Only added when set so digests of earlier stamps still match.
+    if args.stream_output:
+        options.append("stream_output")
+    if args.compact:
+        options.append("compact")
+    if args.shard is not None:
+        options.append(["shard"] + list(args.shard))
+    if args.xdist_groups:
+        options.append("xdist_groups")
+    if args.fingerprints:
+        options.append("fingerprints")
+    if args.timeout:
+        options.append(["timeout", args.timeout])
+    if args.measure:
+        options.append("measure")
+    if args.measure_cprofile:
+        options.append("measure_cprofile")
+    text = json.dumps(options)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def code_digest() -> str:
+    """Digest of the names, sizes and modification times of the source files.
+
+    Keeps a development install from using test files generated
+    by an edited copy of phmdoctest with the same version.
+    """
+    digest = hashlib.sha256()
+    package_dir = Path(__file__).parent
+    for path in sorted(package_dir.glob("*.py")):
+        stat = path.stat()
+        digest.update(
+            "{} {} {}\n".format(path.name, stat.st_size, stat.st_mtime_ns).encode()
+        )
+    return digest.hexdigest()
+
+
+def cache_key(args: Args, markdown_digest: str) -> str:
+    """Key of the cache entry for the Markdown file generated with args."""
+    parts = [
+        phmdoctest.__version__,
+        code_digest(),
+        markdown_digest,
+        options_digest(args),
+    ]
+    return hashlib.sha256(" ".join(parts).encode("utf-8")).hexdigest()
+
+
+def entry_path(cache_dir: str, key: str) -> str:
+    """Path of the cache entry file."""
+    return os.path.join(cache_dir, key + ENTRY_SUFFIX)
+
+
+def lookup(cache_dir: str, key: str) -> Optional[str]:
+    """Return the cached test file text or None if not in the cache."""
+    path = entry_path(cache_dir, key)
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            text = fp.read()
+    except OSError:
+        return None
+    try:
+        # Mark as recently used.
+        os.utime(path)
+    except OSError:
+        pass
+    return text
+
+
+def new_temp_path(cache_dir: str) -> str:
+    """Create an empty temporary file in the cache directory."""
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=TEMP_SUFFIX, dir=cache_dir)
+    os.close(fd)
+    return path
+
+
+def publish(cache_dir: str, temp_path: str, key: str) -> None:
+    """Rename the temporary file to the cache entry. Enforce size limit."""
+    os.replace(temp_path, entry_path(cache_dir, key))
+    evict(cache_dir, MAX_CACHE_BYTES)
+
+
+def evict(cache_dir: str, max_bytes: int) -> None:
+    """Delete least recently used entries until total size <= max_bytes."""
+    entries = []
+    total = 0
+    now = time.time()
+    with os.scandir(cache_dir) as it:
+        for dir_entry in it:
+            try:
+                stat = dir_entry.stat()
+            except OSError:
+                continue
+            if dir_entry.name.endswith(ENTRY_SUFFIX):
+                entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+                total += stat.st_size
+            elif dir_entry.name.endswith(TEMP_SUFFIX):
+                if now - stat.st_mtime > STALE_TEMP_SECONDS:
+                    remove(dir_entry.path)
+    if total <= max_bytes:
+        return
+    for _, size, path in sorted(entries):
+        remove(path)
+        total -= size
+        if total <= max_bytes:
+            break
+
+
+def remove(path: str) -> None:
+    """Delete the file. It is OK if another process deleted it already."""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
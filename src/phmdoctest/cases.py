@@ -1,25 +1,23 @@
 """Compose the pytest test case file."""
-import inspect
 import textwrap
 from io import StringIO
 import itertools
-from typing import List, Iterator, Optional, Set
+from typing import Dict, List, Iterator, Optional, Set, Tuple
+from typing import Any  # noqa: F401
 
 import click
 
+from phmdoctest.analysis import Analysis
 from phmdoctest.entryargs import Args
 from phmdoctest.fenced import Role, FencedBlock
 from phmdoctest.direct import Marker
-from phmdoctest import functions
+from phmdoctest import templates
 from phmdoctest.inline import apply_inline_commands
-
-
-def get_block_with_role(blocks: List[FencedBlock], role: Role) -> Optional[FencedBlock]:
-    """Get first occurrence of block with the caller's role."""
-    for block in blocks:
-        if block.role == role:
-            return block
-    return None
+import phmdoctest.analysis
+import phmdoctest.chains
+import phmdoctest.functions
+import phmdoctest.stamp
+import phmdoctest.timings
 
 
 def get_label_name(block: FencedBlock) -> str:
@@ -50,69 +48,40 @@ def make_label_unique(label: str, line_num: int, used: Set[str]) -> str:
     return label
 
 
-def get_skipif_minor_number(block: FencedBlock) -> int:
-    """Get block's first skipif minor numeric value, if it exists."""
-    # Return zero if there is no such directive.
-    minor_number = 0
-    for directive in block.directives:
-        if directive.type == Marker.PYTEST_SKIPIF:
-            value = directive.value
-            try:
-                minor_number = int(value, 10)
-                if minor_number < 0:
-                    raise ValueError("phmdoctest- must be >= 0")
-            except ValueError:
-                lines = [
-                    Marker.PYTEST_SKIPIF.value + "{}-->".format(value),
-                    (
-                        "at markdown file line {} ".format(directive.line)
-                        + "must be a decimal number and >= zero."
-                    ),
-                ]
-                message = "\n".join(lines)
-                raise click.ClickException(message)
-    return minor_number
-
-
-def needs_sys(blocks: List[FencedBlock]) -> bool:
-    """See if import sys is needed for mark.skipif expression."""
-    for block in blocks:
-        # Look for the phmdoctest-mark.skipif<3. directive on code blocks only.
-        # If one is found this means import sys is required in the test file.
-        if block.role == Role.CODE:
-            if get_skipif_minor_number(block):
-                return True  # import sys is needed
-    return False
-
-
-def has_pytest_mark_decorator(blocks: List[FencedBlock]) -> bool:
-    """True if any code blocks generate @pytest.mark.* decorators."""
-    code_blocks = [b for b in blocks if b.role == Role.CODE]
-    # Return True if any calls to add_pytest_mark_decorator() write a line
-    # to the StringIO file.
-    pytest_marks_lines = StringIO()
-    for block in code_blocks:
-        add_pytest_mark_decorator(pytest_marks_lines, block)
-    return len(pytest_marks_lines.getvalue()) > 0
-
-
-def compose_import_lines(
-    blocks: List[FencedBlock],
-    needs_setup_or_teardown: bool,
+def import_lines(
+    needs_sys_import: bool,
+    needs_fixture: bool,
+    needs_import_pytest: bool,
     needs_output_checking: bool,
+    stream_output: bool = False,
+    compact: bool = False,
+    needs_time_limit: bool = False,
+    measure: bool = False,
 ) -> str:
-    """Generate import lines for the test file."""
-    needs_fixture = needs_setup_or_teardown or any_names_directives(blocks)
-    needs_import_pytest = has_pytest_mark_decorator(blocks)
+    """Generate import lines for the test file from what is needed.
+
+    compact is True if the code blocks are in a table of test cases.
+    needs_time_limit is True if a test function has a time limit.
+    measure is True if the code blocks are measured.
+    """
     lines = list()
-    if needs_sys(blocks):
+    if needs_sys_import:
         lines.append("import sys\n\n")
     if needs_fixture or needs_import_pytest:
         lines.append("import pytest\n\n")
     if needs_fixture:
         lines.append("from phmdoctest.fixture import managenamespace\n")
     if needs_output_checking:
-        lines.append("from phmdoctest.functions import _phm_compare_exact\n")
+        if stream_output:
+            lines.append("from phmdoctest.fixture import expectoutput\n")
+        elif not compact:
+            lines.append("from phmdoctest.functions import _phm_compare_exact\n")
+    if compact:
+        lines.append("from phmdoctest.functions import _phm_run_case\n")
+    elif needs_time_limit:
+        lines.append("from phmdoctest.functions import _phm_time_limit\n")
+    if measure:
+        lines.append("from phmdoctest.functions import _phm_measure\n")
     return "".join(lines)
 
 
@@ -123,41 +92,33 @@ def setup_and_teardown_fixture(
 ) -> str:
     """Add functions to handle setup, teardown and setup for doctest."""
     assert setup_block or teardown_block, "Must get at least one."
-    src = "\n\n"
-    if setup_doctest:
-        src += inspect.getsource(functions._phm_setup_doctest_teardown)
-    else:
-        src += inspect.getsource(functions._phm_setup_teardown)
-    # do teardown code replace first so not searching through setup code.
+    # A placeholder without a block is left in the fixture.
+    setup_code = templates.SETUP_CODE
+    teardown_code = templates.TEARDOWN_CODE
+    if setup_block:
+        comment = "# setup code line {}.\n".format(setup_block.line)
+        code, _ = apply_inline_commands(setup_block.contents)
+        setup_code = textwrap.indent(comment + code, "    ")
     if teardown_block:
         comment = "# teardown code line {}.\n".format(teardown_block.line)
         code, _ = apply_inline_commands(teardown_block.contents)
-        full_code = comment + code
-        indented_code = textwrap.indent(full_code, "    ")
-        src = src.replace("    # <teardown code here>\n", indented_code, 1)
+        teardown_code = textwrap.indent(comment + code, "    ")
+    template = templates.setup_and_teardown_fixture(setup_doctest)
+    values = {templates.SETUP_CODE: setup_code, templates.TEARDOWN_CODE: teardown_code}
+    return templates.fill(template, values)
 
-    if setup_block:
-        comment = "# setup code line {}.\n".format(setup_block.line)
-        code, _ = apply_inline_commands((setup_block.contents))
-        full_code = comment + code
-        indented_code = textwrap.indent(full_code, "    ")
-        src = src.replace("    # <setup code here>\n", indented_code, 1)
-
-    src += "\n\n"
-    markspec = 'pytestmark = pytest.mark.usefixtures("{}")\n'
-    if setup_doctest:
-        src += markspec.format("_phm_setup_doctest_teardown")
-        # Add in more fixtures.
-        # 1. Populate the doctest namespace with values from the setup code.
-        # 2. session_00000 makes the names visible to the doctests.
-        src += "\n\n"
-        src += functions.populate_doctest_namespace_str
-        src += "\n\n"
-        src += inspect.getsource(functions.session_00000)
-    else:
-        src += markspec.format("_phm_setup_teardown")
 
-    return src
+def namespace_operation(block: FencedBlock) -> str:
+    """Return the managenamespace operation for the block or empty string.
+
+    If the block has both directives, ignore the clear-names directive.
+    """
+    if block.has_directive(Marker.SHARE_NAMES):
+        return "update"
+    elif block.has_directive(Marker.CLEAR_NAMES):
+        return "clear"
+    else:
+        return ""
 
 
 def call_namespace_manager(block: FencedBlock) -> str:
@@ -166,9 +127,10 @@ def call_namespace_manager(block: FencedBlock) -> str:
     If the block has both directives, ignore the clear-names directive.
     If the block has neither directive return empty string.
     """
-    if block.has_directive(Marker.SHARE_NAMES):
+    operation = namespace_operation(block)
+    if operation == "update":
         return '    managenamespace(operation="update", additions=locals())\n'
-    elif block.has_directive(Marker.CLEAR_NAMES):
+    elif operation == "clear":
         return '    managenamespace(operation="clear")\n'
     else:
         return ""
@@ -182,45 +144,52 @@ def has_names_directive(block: FencedBlock) -> bool:
     )
 
 
-def any_names_directives(blocks: List[FencedBlock]) -> bool:
-    """Return True if the managenamespace fixture is needed to share names."""
-    for block in blocks:
-        if block.role == Role.CODE:
-            if has_names_directive(block):
-                return True
-    return False
-
-
-def add_pytest_mark_decorator(writer: StringIO, block: FencedBlock) -> None:
+def add_pytest_mark_decorator(
+    writer: StringIO, block: FencedBlock, minor_number: int, group: str = ""
+) -> None:
     """If block has a -mark. directive add the pytest.mark decorator.
 
     If the block has a mark.skip directive, write pytest.mark.skip.
     If the block has a mark.skipif directive, write pytest.mark.skipif.
+    minor_number is the block's parsed mark.skipif value or zero.
+    If there is a pytest-xdist group write pytest.mark.xdist_group.
     """
+    for mark in pytest_marks(block, minor_number, group):
+        writer.write("\n")
+        writer.write("@" + mark)
+
+
+def pytest_marks(block: FencedBlock, minor_number: int, group: str = "") -> List[str]:
+    """The pytest.mark expressions for the block's -mark. directives.
+
+    minor_number is the block's parsed mark.skipif value or zero.
+    group is the block's pytest-xdist group name or empty string.
+    """
+    marks = []
     for directive in block.directives:
         if directive.type == Marker.PYTEST_SKIP:
-            writer.write("\n")
-            writer.write("@pytest.mark.skip()")
-
+            marks.append("pytest.mark.skip()")
     mark_format = (
-        "@pytest.mark.skipif(sys.version_info < (3, {0}), "
+        "pytest.mark.skipif(sys.version_info < (3, {0}), "
         'reason="requires >=py3.{0}")'
     )
-    minor_number = get_skipif_minor_number(block)
     if minor_number:
-        writer.write("\n")
-        writer.write(mark_format.format(minor_number))
+        marks.append(mark_format.format(minor_number))
+    if group:
+        marks.append(xdist_group_mark(group))
+    return marks
 
 
-def test_case(block: FencedBlock, used_names: Set[str]) -> str:
-    """Add a def test_ function with code and comparison logic.
+def xdist_group_mark(group: str) -> str:
+    """The pytest.mark expression that runs a group on one xdist worker."""
+    quoted = repr(group)
+    if '"' not in group:
+        quoted = '"' + quoted[1:-1] + '"'
+    return "pytest.mark.xdist_group(name={})".format(quoted)
 
-    Generate a function that has code as its body and
-    includes logic to capture and compare the printed output.
-    The function is named to be collected by pytest as a test case.
-    """
-    assert block.role == Role.CODE, "must be a Python code block."
-    text = StringIO()
+
+def function_name_and_code(block: FencedBlock, used_names: Set[str]) -> Tuple[str, str]:
+    """Name of the code block's test function and code with inline commands."""
     # The function_name comes from a label directive or is
     # generated from line numbers of the code and output blocks.
     function_name = make_label_unique(get_label_name(block), block.line, used_names)
@@ -233,41 +202,99 @@ def test_case(block: FencedBlock, used_names: Set[str]) -> str:
     code, num_commented_out_sections = apply_inline_commands(block.contents)
     if num_commented_out_sections:
         function_name += "_{}".format(num_commented_out_sections)
+    return function_name, code
+
+
+def test_case(
+    block: FencedBlock, used_names: Set[str], stream_output: bool = False
+) -> str:
+    """Add a def test_ function with code and comparison logic.
+
+    Generate a function that has code as its body and
+    includes logic to capture and compare the printed output.
+    The function is named to be collected by pytest as a test case.
+    With stream_output the printed output is compared as it is printed.
+    """
+    assert block.role == Role.CODE, "must be a Python code block."
+    function_name, code = function_name_and_code(block, used_names)
     expected_output = block.get_output_contents()
     # A 'managed' block has the share-names or clear-names directive.
     managed = has_names_directive(block)
-    text.write("\n")
-    if expected_output:
-        if managed:
-            src = inspect.getsource(functions.test_managed_code_and_output)
-            src = src.replace("test_managed_code_and_output", function_name, 1)
-            src += call_namespace_manager(block)
-        else:
-            src = inspect.getsource(functions.test_code_and_output)
-            src = src.replace("test_code_and_output", function_name, 1)
-
+    template = templates.test_case(bool(expected_output), managed, stream_output)
+    values = {
+        templates.FUNCTION_NAME: function_name,
         # indent contents of code block and place at <put code here>.
-        indented_code = textwrap.indent(code, "    ")
-        src = src.replace("    # <put code here>\n", indented_code, 1)
-        src = src.replace("<<<replaced>>>", expected_output, 1)
-        text.write(src)
-    else:
-        # no expected output to check-
-        if managed:
-            src = inspect.getsource(functions.test_managed_code_only)
-            src = src.replace("test_managed_code_only", function_name, 1)
-            src += call_namespace_manager(block)
-        else:
-            src = inspect.getsource(functions.test_code_only)
-            src = src.replace("test_code_only", function_name, 1)
-        src = src.replace("    pass\n", "\n    # Caution- no assertions.\n")
+        templates.PUT_CODE: textwrap.indent(code, "    "),
+        templates.EXPECTED_OUTPUT: expected_output,
+    }
+    return "\n" + templates.fill(template, values) + call_namespace_manager(block)
+
+
+def compact_case(
+    block: FencedBlock,
+    minor_number: int,
+    used_names: Set[str],
+    group: str = "",
+    seconds: float = 0,
+) -> str:
+    """Add the code block to the _phm_cases table as a pytest.param.
 
-        # indent contents of code block and place at <put code here>.
-        indented_code = textwrap.indent(code, "    ")
-        src = src.replace("    # <put code here>\n", indented_code, 1)
-        text.write(src)
+    The test case id is the name test_case() gives the test function.
+    The row holds the line number, code, expected output, and
+    namespace operation.  minor_number is the block's parsed
+    mark.skipif value or zero.  group is the pytest-xdist group name.
+    seconds is the block's time limit. If not zero it ends the row.
+    """
+    assert block.role == Role.CODE, "must be a Python code block."
+    case_id, code = function_name_and_code(block, used_names)
+    if not case_id.startswith("test_"):
+        # pytest would not collect a test function with this name.
+        return ""
+    row = (
+        block.line,
+        code,
+        block.get_output_contents(),
+        namespace_operation(block),
+    )  # type: Tuple[Any, ...]
+    if seconds:
+        row += (seconds,)
+    fields = [repr(row), "id=" + repr(case_id)]
+    marks = pytest_marks(block, minor_number, group)
+    if len(marks) == 1:
+        fields.append("marks=" + marks[0])
+    elif marks:
+        fields.append("marks=[" + ", ".join(marks) + "]")
+    return "\n\n_phm_cases.append(pytest.param({}))\n".format(", ".join(fields))
+
+
+def session_function_name(
+    block: FencedBlock, session_counter: Iterator[int], used_names: Set[str]
+) -> str:
+    """Name of the function that has the session as its docstring."""
+    # The function_name comes from a label directive or is
+    # generated from line number of the interactive session block.
+    function_name = make_label_unique(get_label_name(block), block.line, used_names)
+    if not function_name:
+        sequence_number = next(session_counter)
+        sequence_string = format(sequence_number, "05d")
+        function_name = "session_{}_line_{}".format(sequence_string, block.line)
+    return function_name
 
-    return text.getvalue()
+
+def test_function_names(blocks: List[FencedBlock]) -> Dict[FencedBlock, str]:
+    """Names build_test_cases() gives the code and session block functions.
+
+    With --compact the code block name is the test case id.
+    """
+    used_names = set()  # type: Set[str]
+    session_counter = itertools.count(1)
+    names = {}  # type: Dict[FencedBlock, str]
+    for block in blocks:
+        if block.role == Role.CODE:
+            names[block], _ = function_name_and_code(block, used_names)
+        elif block.role == Role.SESSION:
+            names[block] = session_function_name(block, session_counter, used_names)
+    return names
 
 
 def interactive_session(
@@ -282,16 +309,9 @@ def interactive_session(
     """
     assert block.role == Role.SESSION, "must be interactive session block."
 
-    # The function_name comes from a label directive or is
-    # generated from line number of the interactive session block.
-    function_name = make_label_unique(get_label_name(block), block.line, used_names)
-    if not function_name:
-        sequence_number = next(session_counter)
-        sequence_string = format(sequence_number, "05d")
-        function_def = "def session_{}_line_{}():\n".format(sequence_string, block.line)
-    else:
-        function_def = "def " + function_name + "():\n"
-
+    function_def = "def {}():\n".format(
+        session_function_name(block, session_counter, used_names)
+    )
     indented_session = textwrap.indent(block.contents, "    ")
     text = StringIO()
     text.write("\n")
@@ -302,62 +322,248 @@ def interactive_session(
     return text.getvalue()
 
 
-def build_test_cases(args: Args, blocks: List[FencedBlock]) -> str:
-    """Generate test code from the Python fenced code blocks."""
-
-    # Keeps track of test case function names set by label directives.
-    used_names = set()  # type: Set[str]
-
-    # Sequence number to order sessions.
-    session_counter = itertools.count(1)
-
-    # collect the generated code in a single string
+def module_docstring(args: Args) -> str:
+    """Generate the docstring line at the top of the test file."""
     # repr escapes back slashes from win filesystem paths
     # so it can be part of the generated test module docstring.
     quoted_markdown_path = repr(click.format_filename(args.markdown_file))
     markdown_path = quoted_markdown_path[1:-1]
     docstring_text = "pytest file built from {}".format(markdown_path)
-    generated = StringIO()
-    generated.write('"""' + docstring_text + '"""\n')
+    if args.shard is not None:
+        docstring_text += " shard {}/{}".format(*args.shard)
+    docstring = '"""' + docstring_text + '"""\n'
+    if args.stamp:
+        return phmdoctest.stamp.stamp_line(args) + docstring
+    return docstring
+
+
+def block_test_code(
+    block: FencedBlock,
+    analysis: Analysis,
+    session_counter: Iterator[int],
+    used_names: Set[str],
+    stream_output: bool = False,
+    compact: bool = False,
+    group: str = "",
+    timeout: Optional[float] = None,
+    measure: bool = False,
+) -> str:
+    """Generate the test function for a Python code or session block.
 
-    setup_block = get_block_with_role(blocks, Role.SETUP)
-    teardown_block = get_block_with_role(blocks, Role.TEARDOWN)
+    With compact a code block is a row of the _phm_cases table instead.
+    group is the pytest-xdist group name of a code block or empty string.
+    timeout is the --timeout seconds for code blocks without a
+    timeout directive.  With measure the test function is measured
+    by the module's _phm_recorder.
+    """
+    text = StringIO()
+    if block.role == Role.CODE and compact:
+        minor_number = analysis.skipif_minor_number(block)
+        seconds = analysis.time_limit(block, timeout)
+        text.write(compact_case(block, minor_number, used_names, group, seconds))
+    elif block.role == Role.CODE:
+        text.write("\n")
+        minor_number = analysis.skipif_minor_number(block)
+        add_pytest_mark_decorator(text, block, minor_number, group)
+        if measure:
+            text.write("\n")
+            text.write("@_phm_recorder.block({})".format(block.line))
+        seconds = analysis.time_limit(block, timeout)
+        if seconds:
+            text.write("\n")
+            text.write("@_phm_time_limit({!r}, {})".format(seconds, block.line))
+        text.write(test_case(block, used_names, stream_output))
+    elif block.role == Role.SESSION:
+        text.write("\n")
+        text.write(interactive_session(block, session_counter, used_names))
+    return text.getvalue()
 
-    needs_setup_or_teardown = (setup_block or teardown_block) is not None
-    needs_output_check = get_block_with_role(blocks, Role.OUTPUT) is not None
 
-    generated.write(
-        compose_import_lines(blocks, needs_setup_or_teardown, needs_output_check)
+def top_of_test_file(
+    args: Args,
+    analysis: Analysis,
+    setup_block: Optional[FencedBlock],
+    teardown_block: Optional[FencedBlock],
+    session_group: str = "",
+    has_groups: bool = False,
+) -> str:
+    """Generate the docstring, imports, and fixtures at the top of the test file.
+
+    session_group is the pytest-xdist group name of the sessions
+    or empty string.  has_groups is True if any block has a group.
+    """
+    text = StringIO()
+    text.write(module_docstring(args))
+    needs_setup_or_teardown = (setup_block or teardown_block) is not None
+    has_table = args.compact and analysis.has_collected_code
+    needs_recorder = has_recorder(args, analysis)
+    text.write(
+        import_lines(
+            needs_sys_import=analysis.needs_sys_import,
+            needs_fixture=needs_setup_or_teardown or analysis.needs_names_fixture,
+            needs_import_pytest=(
+                analysis.needs_import_pytest or has_table or has_groups
+            ),
+            needs_output_checking=analysis.needs_output_checking,
+            stream_output=args.stream_output,
+            compact=has_table,
+            needs_time_limit=analysis.needs_time_limit or bool(args.timeout),
+            measure=needs_recorder,
+        )
     )
 
     # fixture to handle setup and/or teardown and code for setup doctest
     if needs_setup_or_teardown:
-        generated.write(
+        text.write(
             setup_and_teardown_fixture(
                 setup_block=setup_block,
                 teardown_block=teardown_block,
                 setup_doctest=args.setup_doctest,
             )
         )
+    if session_group:
+        # The module marks are the closest marks of the sessions.
+        text.write(
+            "\n\npytestmark = [pytestmark, {}]\n".format(
+                xdist_group_mark(session_group)
+            )
+        )
+    if needs_recorder:
+        text.write(recorder_assignment(args))
+    if has_table:
+        text.write("\n\n_phm_cases = []\n")
+    return text.getvalue()
 
-    number_of_test_cases = 0
-    for block in blocks:
-        if block.role == Role.CODE:
-            generated.write("\n")
-            add_pytest_mark_decorator(generated, block)
-            generated.write(test_case(block, used_names))
-            number_of_test_cases += 1
 
-        elif block.role == Role.SESSION:
-            generated.write("\n")
-            generated.write(interactive_session(block, session_counter, used_names))
-            number_of_test_cases += 1
-
-    if number_of_test_cases == 0:
-        if args.fail_nocode:
-            nocode_func = functions.test_nothing_fails
-        else:
-            nocode_func = functions.test_nothing_passes
-        generated.write("\n\n")
-        generated.write(inspect.getsource(nocode_func))
+def has_recorder(args: Args, analysis: Analysis) -> bool:
+    """True if the test file measures its code blocks."""
+    return args.measure and analysis.role_counts[Role.CODE] > 0
+
+
+def recorder_assignment(args: Args) -> str:
+    """Assign _phm_recorder the Recorder of the code block measurements.
+
+    Its fixture writes the measurements when the module's tests finish.
+    """
+    markdown_file = repr(click.format_filename(args.markdown_file))
+    cprofile_argument = ", cprofile=True" if args.measure_cprofile else ""
+    return (
+        "\n\n_phm_recorder = _phm_measure({}, __file__{})\n".format(
+            markdown_file, cprofile_argument
+        )
+        + "_phm_write_measurements = _phm_recorder.fixture()\n"
+    )
+
+
+def bottom_of_test_file(args: Args, analysis: Analysis) -> str:
+    """Generate the test functions that follow the blocks' test code."""
+    text = StringIO()
+    if args.compact and analysis.has_collected_code:
+        arguments = ""
+        if args.stream_output:
+            arguments += ", stream_output=True"
+        if has_recorder(args, analysis):
+            arguments += ", recorder=_phm_recorder"
+        text.write("\n\n")
+        text.write(phmdoctest.functions.compact_test_block_str.format(arguments))
+    if analysis.number_of_test_cases() == 0:
+        text.write(nothing_to_test(args))
+    return text.getvalue()
+
+
+def fingerprint_table(
+    args: Args, blocks: List[FencedBlock], only: Optional[Set[FencedBlock]] = None
+) -> str:
+    """Assign _phm_fingerprints the names and fingerprints of the test cases.
+
+    There is a list of (name, fingerprint) tuples for each group of
+    blocks that depend on each other.  The pytest plugin reads it
+    for the --phmdoctest-results option.
+    """
+    names = test_function_names(blocks)
+    text = StringIO()
+    text.write("\n\n_phm_fingerprints = [\n")
+    for unit in phmdoctest.chains.fingerprint_units(blocks, args.setup_doctest):
+        rows = [
+            (names[block], fingerprint)
+            for block, fingerprint in unit
+            if (only is None or block in only)
+            and (block.role == Role.SESSION or names[block].startswith("test_"))
+        ]
+        if rows:
+            text.write("    [\n")
+            for row in rows:
+                text.write("        {!r},\n".format(row))
+            text.write("    ],\n")
+    text.write("]\n")
+    return text.getvalue()
+
+
+def nothing_to_test(args: Args) -> str:
+    """Generate the test function used when there are no test cases."""
+    return templates.nothing_to_test(args.fail_nocode)
+
+
+def build_test_cases(
+    args: Args,
+    blocks: List[FencedBlock],
+    analysis: Optional[Analysis] = None,
+    only: Optional[Set[FencedBlock]] = None,
+) -> str:
+    """Generate test code from the Python fenced code blocks.
+
+    analysis is phmdoctest.analysis.analyze(blocks) if the caller has it.
+    If only is given just its code and session blocks are tested.
+    They get the same names as when all the blocks are tested.
+    """
+
+    # Keeps track of test case function names set by label directives.
+    used_names = set()  # type: Set[str]
+
+    # Sequence number to order sessions.
+    session_counter = itertools.count(1)
+
+    # collect the generated code in a single string
+    generated = StringIO()
+
+    if analysis is None:
+        analysis = phmdoctest.analysis.analyze(blocks)
+    analysis.raise_directive_error()
+    setup_block = analysis.first_block(Role.SETUP)
+    teardown_block = analysis.first_block(Role.TEARDOWN)
+    groups = {}  # type: Dict[FencedBlock, str]
+    if args.xdist_groups:
+        groups = phmdoctest.chains.xdist_groups(
+            args.markdown_file, blocks, args.setup_doctest
+        )
+    if only is not None:
+        groups = {b: name for b, name in groups.items() if b in only}
+    session_groups = [name for b, name in groups.items() if b.role == Role.SESSION]
+    session_group = session_groups[0] if session_groups else ""
+    generated.write(
+        top_of_test_file(
+            args, analysis, setup_block, teardown_block, session_group, bool(groups)
+        )
+    )
+
+    for block in blocks:
+        if block.role in [Role.CODE, Role.SESSION]:
+            with phmdoctest.timings.stage("cases.block", line=block.line):
+                text = block_test_code(
+                    block,
+                    analysis,
+                    session_counter,
+                    used_names,
+                    args.stream_output,
+                    args.compact,
+                    groups.get(block, ""),
+                    args.timeout,
+                    args.measure,
+                )
+            if only is None or block in only:
+                generated.write(text)
+
+    generated.write(bottom_of_test_file(args, analysis))
+    if args.fingerprints:
+        generated.write(fingerprint_table(args, blocks, only))
     return generated.getvalue()
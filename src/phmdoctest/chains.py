@@ -0,0 +1,125 @@
+"""Find the blocks that must run in order in the same process.
+
+- Code blocks from a share-names block up to and including the next
+  clear-names block share names.
+- With a setup block a clear-names block deletes the names assigned
+  by the setup code so the code blocks after it are kept with it.
+- With --setup-doctest the sessions may change objects created
+  by the setup code so they are kept together.
+
+Other code and session blocks don't depend on each other.
+The setup code runs in a module fixture so each test file or
+pytest-xdist worker gets its own setup objects.  A code block that
+needs the changes an earlier code block made to them should be in
+a share-names chain with it.
+
+The fingerprint of a block covers the blocks it depends on.
+"""
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import click
+
+from phmdoctest.direct import Marker
+from phmdoctest.fenced import Role, FencedBlock
+
+
+def dependency_units(
+    blocks: List[FencedBlock], setup_doctest: bool
+) -> List[List[FencedBlock]]:
+    """Group code and session blocks that must run in the same test file.
+
+    The groups are in the order of their first block.
+    """
+    has_setup = any(block.role == Role.SETUP for block in blocks)
+    units = []  # type: List[List[FencedBlock]]
+    chain = None  # type: Optional[List[FencedBlock]]
+    cleared = None  # type: Optional[List[FencedBlock]]
+    setup_sessions = []  # type: List[FencedBlock]
+    for block in blocks:
+        if block.role == Role.CODE:
+            if cleared is not None:
+                unit = cleared
+            elif chain is not None:
+                unit = chain
+            elif block.has_directive(Marker.SHARE_NAMES):
+                chain = []
+                unit = chain
+                units.append(unit)
+            else:
+                unit = []
+                units.append(unit)
+            unit.append(block)
+            # share-names wins if the block has both directives.
+            if block.has_directive(Marker.CLEAR_NAMES) and not block.has_directive(
+                Marker.SHARE_NAMES
+            ):
+                chain = None
+                if has_setup:
+                    cleared = unit
+        elif block.role == Role.SESSION:
+            if has_setup and setup_doctest:
+                if not setup_sessions:
+                    units.append(setup_sessions)
+                setup_sessions.append(block)
+            else:
+                units.append([block])
+    return units
+
+
+def xdist_groups(
+    markdown_file: str, blocks: List[FencedBlock], setup_doctest: bool
+) -> Dict[FencedBlock, str]:
+    """pytest-xdist group name of each block that depends on other blocks.
+
+    The name is the Markdown file and the line of the group's first
+    block so it is unique in the pytest session.
+    Blocks that don't depend on other blocks are not in the dict.
+    """
+    groups = {}  # type: Dict[FencedBlock, str]
+    for unit in dependency_units(blocks, setup_doctest):
+        if len(unit) > 1:
+            name = "{}:{}".format(click.format_filename(markdown_file), unit[0].line)
+            for block in unit:
+                groups[block] = name
+    return groups
+
+
+def block_digest(block: Optional[FencedBlock]) -> bytes:
+    """Hash of the block's contents, output, and directives. No line numbers."""
+    h = hashlib.sha256()
+    if block is not None:
+        h.update(block.contents.encode("utf-8"))
+        h.update(b"\0")
+        h.update(block.get_output_contents().encode("utf-8"))
+        for directive in block.directives:
+            h.update("\0{}\0{}".format(directive.type.name, directive.value).encode())
+    return h.digest()
+
+
+def fingerprint_units(
+    blocks: List[FencedBlock], setup_doctest: bool
+) -> List[List[Tuple[FencedBlock, str]]]:
+    """dependency_units() with a fingerprint hex digest for each block.
+
+    The fingerprint covers the block, the blocks before it in its unit,
+    and the setup and teardown blocks if the block uses them.
+    """
+    setup = teardown = None
+    for block in blocks:
+        if block.role == Role.SETUP and setup is None:
+            setup = block
+        elif block.role == Role.TEARDOWN and teardown is None:
+            teardown = block
+    fixture_digest = block_digest(setup) + block_digest(teardown)
+    units = []  # type: List[List[Tuple[FencedBlock, str]]]
+    for unit in dependency_units(blocks, setup_doctest):
+        h = hashlib.sha256()
+        fingerprinted = []
+        for block in unit:
+            if block.role == Role.CODE or setup_doctest:
+                h.update(fixture_digest)
+            h.update(block_digest(block))
+            fingerprinted.append((block, h.hexdigest()))
+        units.append(fingerprinted)
+    return units
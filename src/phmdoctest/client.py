@@ -0,0 +1,155 @@
+"""Send phmdoctest commands to a running phmdoctest-server.
+
+Only the standard library is imported so the client starts fast.
+Messages are UTF-8 JSON objects.  Each message is preceded by its
+length in bytes as a 4 byte big endian unsigned integer.
+
+Command line usage:
+
+``python -m phmdoctest.client SOCKET [PHMDOCTEST ARGS]...``
+
+runs the phmdoctest command on the server.  If no server is
+listening on SOCKET the command runs in this process.
+"""
+import io
+import json
+import os
+import socket
+import struct
+import sys
+from typing import Any, Dict, List, Optional
+
+HEADER = struct.Struct("!I")
+"""Message length prefix."""
+
+ENV_PREFIX = "PHMDOCTEST_"
+"""Environment variables with this prefix are sent with the requests."""
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    """Write a length prefixed JSON message to the socket."""
+    data = json.dumps(message).encode("utf-8")
+    sock.sendall(HEADER.pack(len(data)) + data)
+
+
+def receive_exactly(sock: socket.socket, size: int) -> Optional[bytes]:
+    """Read size bytes. Return None if the socket closes first."""
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 65536))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def receive_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """Read a length prefixed JSON message. None if the socket is closed."""
+    header = receive_exactly(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    data = receive_exactly(sock, size)
+    if data is None:
+        raise ConnectionError("phmdoctest- connection closed mid message")
+    message = json.loads(data.decode("utf-8"))  # type: Dict[str, Any]
+    return message
+
+
+def request(socket_path: str, message: Dict[str, Any]) -> Dict[str, Any]:
+    """Send one request to the server at socket_path and return the reply.
+
+    The reply has the key "error" if the server could not do the request.
+    Raises OSError if no server is listening.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        send_message(sock, message)
+        reply = receive_message(sock)
+    if reply is None:
+        raise ConnectionError("phmdoctest- server closed the connection")
+    return reply
+
+
+def phmdoctest_environment() -> Dict[str, str]:
+    """The environment variables sent with a request."""
+    return {k: v for k, v in os.environ.items() if k.startswith(ENV_PREFIX)}
+
+
+def run(
+    socket_path: str, args: List[str], input: Optional[str] = None
+) -> Dict[str, Any]:
+    """Run the phmdoctest command line args on the server.
+
+    Relative paths are relative to the current working directory.
+    The PHMDOCTEST_ environment variables are the client's.
+    input is the standard input for the command.
+    Returns a dict with keys exit_code, stdout, and stderr.
+    """
+    message = {
+        "op": "run",
+        "args": args,
+        "cwd": os.getcwd(),
+        "env": phmdoctest_environment(),
+        "input": input,
+    }
+    return request(socket_path, message)
+
+
+def run_and_pytest(
+    socket_path: str,
+    well_formed_command: str,
+    pytest_options: Optional[List[str]] = None,
+    junit_family: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Call phmdoctest.simulator.run_and_pytest() on the server.
+
+    pytest runs in the server process.
+    Returns a dict with keys exit_code, stdout, outfile,
+    pytest_exit_code, pytest_output, and junit_xml.
+    """
+    message = {
+        "op": "test",
+        "command": well_formed_command,
+        "pytest_options": pytest_options,
+        "junit_family": junit_family,
+        "cwd": os.getcwd(),
+        "env": phmdoctest_environment(),
+    }
+    return request(socket_path, message)
+
+
+def stop(socket_path: str) -> None:
+    """Ask the server to exit."""
+    request(socket_path, {"op": "stop"})
+
+
+def main(argv: List[str]) -> int:
+    """Run a phmdoctest command on the server. Return the exit code."""
+    if not argv:
+        sys.stderr.write("usage: python -m phmdoctest.client SOCKET [ARGS]...\n")
+        return 2
+    socket_path, args = argv[0], argv[1:]
+    input = sys.stdin.read() if args[:1] == ["-"] else None
+    try:
+        reply = run(socket_path, args, input)
+    except OSError:
+        # No server. Run the command here. Exits with the command's exit code.
+        from phmdoctest.main import entry_point
+
+        if input is not None:
+            sys.stdin = io.StringIO(input)
+        entry_point.main(args, prog_name="phmdoctest")
+        return 0
+    if "error" in reply:
+        sys.stderr.write("Error: {}\n".format(reply["error"]))
+        return 1
+    sys.stdout.write(reply["stdout"])
+    sys.stderr.write(reply["stderr"])
+    exit_code = reply["exit_code"]  # type: int
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
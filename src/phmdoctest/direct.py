@@ -13,6 +13,7 @@ class Marker(Enum):
     PYTEST_SKIP = "<!--phmdoctest-mark.skip-->"
     PYTEST_SKIPIF = "<!--phmdoctest-mark.skipif<3."  # No space, no "-->".
     LABEL = "<!--phmdoctest-label "  # Note trailing space, no "-->".
+    TIMEOUT = "<!--phmdoctest-timeout "  # Note trailing space, no "-->".
     SETUP = "<!--phmdoctest-setup-->"
     TEARDOWN = "<!--phmdoctest-teardown-->"
     SHARE_NAMES = "<!--phmdoctest-share-names-->"
@@ -66,6 +67,13 @@ def find_one_directive(node: commonmark.node) -> Optional[Directive]:
                 line=node.sourcepos[0][0],
                 literal=node.literal,
             )
+        elif node.literal.startswith(Marker.TIMEOUT.value):
+            return Directive(
+                type=Marker.TIMEOUT,
+                value=extract_value(node.literal, Marker.TIMEOUT),
+                line=node.sourcepos[0][0],
+                literal=node.literal,
+            )
     return None
 
 
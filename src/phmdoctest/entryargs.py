@@ -13,6 +13,28 @@ Args = namedtuple(
         "setup",
         "teardown",
         "setup_doctest",
+        "stamp",
+        "stream_output",
+        "compact",
+        "shard",
+        "xdist_groups",
+        "fingerprints",
+        "timeout",
+        "measure",
+        "measure_cprofile",
     ],
 )
 """Command line arguments with some renames."""
+
+# The options added after setup_doctest are off unless given.
+Args.__new__.__defaults__ = (
+    False,
+    False,
+    False,
+    None,
+    False,
+    False,
+    None,
+    False,
+    False,
+)
@@ -7,6 +7,7 @@ import click
 from phmdoctest.direct import Marker
 from phmdoctest.entryargs import Args
 from phmdoctest.fenced import Role, FencedBlock
+from phmdoctest.matcher import SkipMatcher
 
 
 PYTHON_FLAVORS = ["python", "py3", "python3"]
@@ -26,20 +27,14 @@ def identify_code_output_session_blocks(blocks: List[FencedBlock]) -> None:
     and the first line of the block starts with the session prompt '>>> '.
     """
     for block in blocks:
-        for flavor in PYTHON_FLAVORS:
-            if block.type.startswith(flavor):
-                block.set(Role.CODE)
-        if block.contents.startswith(">>> ") and block.type.startswith("py"):
-            block.set(Role.SESSION)
+        identify_code_session_block(block)
 
     # When we find an output block we update the preceding
     # code block with a link to it.
     previous_block = None
     for block in blocks:
         if previous_block is not None:
-            if not block.type and previous_block.role == Role.CODE:
-                block.set(Role.OUTPUT)
-                previous_block.set_link_to_output(block)
+            identify_output_block(previous_block, block)
         previous_block = block
     # If we didn't find an output block for a code block
     # it can still be run, but there will be no comparison
@@ -47,46 +42,74 @@ def identify_code_output_session_blocks(blocks: List[FencedBlock]) -> None:
     # be added to the code block.
 
 
+def identify_code_session_block(block: FencedBlock) -> None:
+    """Designate the block as Python code or session if it is one."""
+    for flavor in PYTHON_FLAVORS:
+        if block.type.startswith(flavor):
+            block.set(Role.CODE)
+    if block.contents.startswith(">>> ") and block.type.startswith("py"):
+        block.set(Role.SESSION)
+
+
+def identify_output_block(previous_block: FencedBlock, block: FencedBlock) -> None:
+    """Designate block as output and link it if it follows a code block."""
+    if not block.type and previous_block.role == Role.CODE:
+        block.set(Role.OUTPUT)
+        previous_block.set_link_to_output(block)
+
+
 def del_problem_blocks(blocks: List[FencedBlock]) -> None:
     """Re-designate blocks that can't be used."""
     # Rather than asserting and blowing up the caller, just set the
     # blocks we can't deal with aside for later discovery in the report.
-    empty_blocks = [b for b in blocks if not b.contents]
-    for block in empty_blocks:
-        if block.role == Role.CODE:
-            block.set(Role.DEL_CODE)
-            if block.output:
-                block.output.set(Role.DEL_OUTPUT)
-        elif block.role == Role.OUTPUT:
-            block.set(Role.DEL_OUTPUT)
+    for block in blocks:
+        del_problem_block(block)
+
+
+def del_problem_block(block: FencedBlock) -> None:
+    """Re-designate the block if it is empty. Call after output is linked."""
+    if block.contents:
+        return
+    if block.role == Role.CODE:
+        block.set(Role.DEL_CODE)
+        if block.output:
+            block.output.set(Role.DEL_OUTPUT)
+    elif block.role == Role.OUTPUT:
+        block.set(Role.DEL_OUTPUT)
 
 
 def apply_skips(args: Args, blocks: List[FencedBlock]) -> None:
     """Designate Python code/session blocks that are exempt from testing."""
     # Do skip requests from the command line.
-    for pattern in args.skips:
-        found = findall(pattern, blocks)
-        for block in found:
+    matcher = SkipMatcher(args.skips)
+    last_index = len(blocks) - 1
+    for index, block in enumerate(blocks):
+        for pattern in matcher.matches(block, index, index == last_index):
             block.skip(pattern)
     # Do skip requests marked as a skip directive on the block.
     for block in blocks:
-        for directive in block.directives:
+        apply_skip_directives(block)
+
+
+def apply_skip_directives(block: FencedBlock) -> None:
+    """Skip the block or its output block if it has a skip directive."""
+    for directive in block.directives:
+        if directive.type == Marker.SKIP:
+            block.skip()
+    # If the code block has an output block check if it has a skip
+    # directive. An empty output block has already been deleted.
+    if block.output and block.output.role != Role.DEL_OUTPUT:
+        for directive in block.output.directives:
             if directive.type == Marker.SKIP:
-                block.skip()
-        # If the code block has an output block check if it has a skip
-        # directive.
-        if block.output:
-            for directive in block.output.directives:
-                if directive.type == Marker.SKIP:
-                    block.output.skip()
+                block.output.skip()
 
 
 def findall(pattern: str, blocks: List[FencedBlock]) -> List[FencedBlock]:
     """Return list of blocks that contain search pattern."""
     found = []  # type: List[FencedBlock]
-    if pattern == "FIRST":
+    if pattern == "FIRST" and blocks:
         found.append(blocks[0])
-    elif pattern == "LAST":
+    elif pattern == "LAST" and blocks:
         found.append(blocks[-1])
     elif pattern == "SECOND" and len(blocks) > 1:
         found.append(blocks[1])
@@ -97,11 +120,32 @@ def findall(pattern: str, blocks: List[FencedBlock]) -> List[FencedBlock]:
     return found
 
 
+def is_match(pattern: str, block: FencedBlock, index: int, is_last: bool) -> bool:
+    """True if findall() would find the block at index in the list.
+
+    is_last is True if the block is the last one in the list.
+    """
+    if pattern == "FIRST":
+        return index == 0
+    elif pattern == "SECOND":
+        return index == 1
+    elif pattern == "LAST":
+        return is_last
+    return block.contents.find(pattern) > -1
+
+
 def find_only_one_by_pattern(
     pattern: str, blocks: List[FencedBlock], command_line_option_name: str
 ) -> Optional[FencedBlock]:
     """Find a single block containing pattern, die if more matches."""
     matches = findall(pattern, blocks)
+    return only_one_match(matches, command_line_option_name)
+
+
+def only_one_match(
+    matches: List[FencedBlock], command_line_option_name: str
+) -> Optional[FencedBlock]:
+    """Return the only block that matched the pattern, die if more matches."""
     if not matches:
         return None
     if len(matches) == 1:
@@ -126,6 +170,14 @@ def find_only_one_by_marker(
         for directive in block.directives:
             if directive.type == marker:
                 found.append(block)
+    return only_one_marked(found, marker)
+
+
+def only_one_marked(found: List[FencedBlock], marker: Marker) -> Optional[FencedBlock]:
+    """Return the only block with the directive, die if more.
+
+    A block appears in found once for each of its marker directives.
+    """
     if not found:
         return None
     if len(found) == 1:
@@ -170,6 +222,15 @@ def find_and_designate_setup(pattern: str, blocks: List[FencedBlock]) -> None:
     else:
         match = find_only_one_by_pattern(pattern, blocks, "--setup or -u")
     marked = find_only_one_by_marker(blocks, Marker.SETUP)
+    designate_setup(pattern, match, marked)
+
+
+def designate_setup(
+    pattern: Optional[str],
+    match: Optional[FencedBlock],
+    marked: Optional[FencedBlock],
+) -> None:
+    """Designate the block found by pattern or directive as setup."""
     if match is not None and marked is not None:
         check_for_error(match, marked, "setup")
     block = match or marked
@@ -203,6 +264,15 @@ def find_and_designate_teardown(pattern: str, blocks: List[FencedBlock]) -> None
     else:
         match = find_only_one_by_pattern(pattern, blocks, "--teardown or -d")
     marked = find_only_one_by_marker(blocks, Marker.TEARDOWN)
+    designate_teardown(pattern, match, marked)
+
+
+def designate_teardown(
+    pattern: Optional[str],
+    match: Optional[FencedBlock],
+    marked: Optional[FencedBlock],
+) -> None:
+    """Designate the block found by pattern or directive as teardown."""
     if match is not None and marked is not None:
         check_for_error(match, marked, "teardown")
     block = match or marked
@@ -212,3 +282,13 @@ def find_and_designate_teardown(pattern: str, blocks: List[FencedBlock]) -> None
         block.set(Role.TEARDOWN)
         if block.output is not None:
             block.output.set(Role.DEL_OUTPUT)
+
+
+def assign_roles(args: Args, blocks: List[FencedBlock]) -> None:
+    """Assign test roles to all the fenced code blocks in the file."""
+    identify_code_output_session_blocks(blocks)
+    del_problem_blocks(blocks)
+    code_and_session_blocks = [b for b in blocks if b.role in [Role.CODE, Role.SESSION]]
+    apply_skips(args, code_and_session_blocks)
+    find_and_designate_setup(args.setup, code_and_session_blocks)
+    find_and_designate_teardown(args.teardown, code_and_session_blocks)
@@ -1,6 +1,9 @@
-"""Pytest fixture imported by generated code."""
+"""Pytest fixtures imported by generated code."""
 import inspect
+import io
 import logging
+import os
+import sys
 
 import pytest
 
@@ -9,7 +12,13 @@ import pytest
 
 @pytest.fixture(scope="module")
 def managenamespace(request):
-    """Create and manipulate namespace implemented in the module."""
+    """Create and manipulate namespace implemented in the module.
+
+    Each update checks just the names it adds and each clear the
+    names it removes.  Set the environment variable
+    PHMDOCTEST_AUDIT_NAMESPACE to also compare all the attribute
+    names after each update.
+    """
     logging.debug("managenamespace-")
     already_exists = (
         "phmdoctest- Not allowed to replace module level name {} because\n"
@@ -18,8 +27,16 @@ def managenamespace(request):
     no_originals = "phmdoctest- no original module attributes allowed in namespace."
     no_extras = "phmdoctest- current attributes == original + namespace."
     m = request.module
-    original_attributes = set([name for name, _ in inspect.getmembers(m)])
+    audit = bool(os.environ.get("PHMDOCTEST_AUDIT_NAMESPACE"))
+    if audit:
+        original_attributes = set([name for name, _ in inspect.getmembers(m)])
+    else:
+        original_attributes = set(vars(m))
     namespace_names = set()
+    # The generation counts the updates and clears.  A mapping synced
+    # at the current generation already has the namespace.
+    generation = [0]
+    synced = {}
 
     def check_attribute_name(name):
         """Check that name was not an attribute of the original test module.
@@ -30,8 +47,19 @@ def managenamespace(request):
         if name in original_attributes:
             raise AttributeError(already_exists.format(name))
 
-    def check_integrity():
-        """Check module's attributes are original or in the namespace."""
+    def check_integrity(added):
+        """Check module's attributes are original or in the namespace.
+
+        added is the names the update added.  Unless auditing only they
+        are checked.  An attribute added or removed by anything else
+        changes the count.
+        """
+        if not audit:
+            if not original_attributes.isdisjoint(added):
+                raise AttributeError(no_originals)
+            if len(vars(m)) != len(original_attributes) + len(namespace_names):
+                raise AttributeError(no_extras)
+            return
         current_attributes = set([name for name, _ in inspect.getmembers(m)])
         if not original_attributes.isdisjoint(namespace_names):
             raise AttributeError(no_originals)
@@ -40,11 +68,26 @@ def managenamespace(request):
 
     def show_namespace():
         """Log the names currently in the namespace."""
-        names = ", ".join(namespace_names)
-        logging.debug("manager- namespace= %s", names)
+        if logging.getLogger().isEnabledFor(logging.DEBUG):
+            names = ", ".join(namespace_names)
+            logging.debug("manager- namespace= %s", names)
+
+    def sync(target):
+        """Copy the namespace to target if it changed since the last sync."""
+        _, synced_generation, synced_names = synced.get(id(target), (None, -1, ()))
+        if synced_generation == generation[0]:
+            logging.debug("manager- already synced")
+            return
+        logging.debug("manager- syncing")
+        for name in synced_names:
+            if name not in namespace_names:
+                _ = target.pop(name, None)
+        for name in namespace_names:
+            target[name] = getattr(m, name)
+        synced[id(target)] = (target, generation[0], set(namespace_names))
 
-    def manager(operation, additions=None):
-        """Maintain namespace with update, copy, and clear operations.
+    def manager(operation, additions=None, target=None):
+        """Maintain namespace with update, copy, sync, and clear operations.
 
         The namespace for the test cases is attributes assigned to the
         enclosing module object.  The attribute names are stored in the
@@ -55,19 +98,26 @@ def managenamespace(request):
             operation
                 - update add items to the namespace
                 - copy returns a shallow copy of the namespace.
+                - sync copies the namespace to target unless it has not
+                  changed since target was last synced.
                 - clear removes all items from the namespace.
 
             additions
                 Mapping of names and values of variables that should be
                 added to the namespace.
+
+            target
+                Mapping such as doctest_namespace to sync.
         """
         if operation == "clear":
-            names = ", ".join(list(namespace_names))
-            logging.debug("manager- clearing= %s", names)
+            if logging.getLogger().isEnabledFor(logging.DEBUG):
+                names = ", ".join(list(namespace_names))
+                logging.debug("manager- clearing= %s", names)
             for name in namespace_names:
                 check_attribute_name(name)
                 delattr(m, name)
             namespace_names.clear()
+            generation[0] += 1
             show_namespace()
             return None
         elif operation == "copy":
@@ -76,6 +126,11 @@ def managenamespace(request):
             for name in namespace_names:
                 shallow_copy[name] = getattr(m, name)
             return shallow_copy
+        elif operation == "sync":
+            if target is None:
+                raise ValueError("phmdoctest- need target to do a sync")
+            sync(target)
+            return None
         elif operation == "update":
             if additions is None:
                 raise ValueError("phmdoctest- need additions to do an update")
@@ -89,10 +144,14 @@ def managenamespace(request):
             #     capsys
             #     doctest_namespace
             #     _phm_expected_str
+            #     expectoutput
+            #     _phm_output_checker
             _ = additions.pop("managenamespace", None)
             _ = additions.pop("doctest_namespace", None)
             _ = additions.pop("capsys", None)
             _ = additions.pop("_phm_expected_str", None)
+            _ = additions.pop("expectoutput", None)
+            _ = additions.pop("_phm_output_checker", None)
             #
             # Items that can't be in the namespace are the imports:
             #     pytest
@@ -105,14 +164,15 @@ def managenamespace(request):
             _ = additions.pop("pytest", None)
             if "sys" in additions and "sys" in original_attributes:
                 _ = additions.pop("sys", None)
-            added_names = ", ".join(additions.keys())
-            if added_names:
+            if additions and logging.getLogger().isEnabledFor(logging.DEBUG):
+                added_names = ", ".join(additions.keys())
                 logging.debug("manager- adding= %s", added_names)
             for k, v in additions.items():
                 check_attribute_name(k)
                 setattr(m, k, v)
                 namespace_names.add(k)
-            check_integrity()
+            generation[0] += 1
+            check_integrity(additions.keys())
             show_namespace()
         else:
             raise ValueError(
@@ -120,3 +180,132 @@ def managenamespace(request):
             )
 
     return manager
+
+
+class OutputChecker(io.TextIOBase):
+    """Replacement for sys.stdout that checks lines as they are printed.
+
+    The printed text is not kept. Each line is compared to the expected
+    line when it is complete.  An AssertionError is raised as soon as a
+    line differs or there are more printed lines than expected.
+    """
+
+    max_shown = 200
+    """Characters of a line shown in the assertion message."""
+
+    def __init__(self, expected, original):
+        self.expected_lines = expected.splitlines()
+        self.original = original
+        self.line_number = 0
+        self.partial = ""
+        self.after_cr = False
+        self.failure = None
+
+    @property
+    def encoding(self):
+        return getattr(self.original, "encoding", "utf-8")
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        if self.failure is not None:
+            raise AssertionError(self.failure)
+        if self.after_cr and text.startswith("\n"):
+            # The \n of a \r\n line ending.
+            text = text[1:]
+        self.after_cr = False
+        if not text:
+            return 0
+        pieces = (self.partial + text).splitlines(keepends=True)
+        self.partial = ""
+        for piece in pieces:
+            line = piece.splitlines()[0]
+            if line == piece:
+                self.partial = piece
+                self.check_partial()
+            else:
+                self.check_line(line)
+                self.after_cr = piece.endswith("\r")
+        return len(text)
+
+    def check_line(self, line):
+        """Compare a complete printed line to the expected line."""
+        if self.line_number >= len(self.expected_lines):
+            self.fail(line)
+        if line != self.expected_lines[self.line_number]:
+            self.fail(line)
+        self.line_number += 1
+
+    def check_partial(self):
+        """Fail if the line printed so far can't be the expected line."""
+        if self.line_number >= len(self.expected_lines):
+            self.fail(self.partial)
+        if not self.expected_lines[self.line_number].startswith(self.partial):
+            self.fail(self.partial)
+
+    def fail(self, printed):
+        """Restore sys.stdout and raise AssertionError."""
+
+        def shorten(line):
+            text = repr(line)
+            if len(text) > self.max_shown:
+                text = text[: self.max_shown] + "..."
+            return text
+
+        number = self.line_number + 1
+        if self.line_number < len(self.expected_lines):
+            expected = shorten(self.expected_lines[self.line_number])
+        else:
+            expected = "no more lines"
+        self.failure = (
+            "Printed line {} is different from the expected output.\n"
+            "expected: {}\n"
+            "printed:  {}"
+        ).format(number, expected, shorten(printed))
+        self.restore()
+        raise AssertionError(self.failure)
+
+    def restore(self):
+        """Put back the original sys.stdout."""
+        if sys.stdout is self:
+            sys.stdout = self.original
+
+    def finish(self):
+        """Check the last line and that no expected lines are missing."""
+        self.restore()
+        if self.failure is not None:
+            raise AssertionError(self.failure)
+        if self.partial:
+            self.check_line(self.partial)
+            self.partial = ""
+        if self.line_number < len(self.expected_lines):
+            self.failure = (
+                "Printed {} lines. Expected {} lines.\n" "First missing line: {!r}"
+            ).format(
+                self.line_number,
+                len(self.expected_lines),
+                self.expected_lines[self.line_number],
+            )
+            raise AssertionError(self.failure)
+
+
+@pytest.fixture()
+def expectoutput():
+    """Check the test's printed output as it is printed.
+
+    Call with the expected output.  It returns the OutputChecker
+    now installed as sys.stdout.  Call its finish() method at the end
+    of the test.
+    """
+    checkers = []
+
+    def start(expected):
+        checker = OutputChecker(expected, sys.stdout)
+        checkers.append(checker)
+        sys.stdout = checker
+        return checker
+
+    yield start
+    for checker in reversed(checkers):
+        checker.restore()
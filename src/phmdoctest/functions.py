@@ -1,23 +1,224 @@
 """Functions customized and copied into generated code."""
+import contextlib
 import difflib
-from itertools import zip_longest
+import linecache
+import os
+import re
+import time
 
 import pytest
 
 # mypy: ignore_errors
 
+DIFF_CONTEXT_LINES = 3
+"""Unchanged lines shown around each difference."""
+
+MAX_DIFF_LINES = 200
+"""Most lines of diff printed. Set PHMDOCTEST_MAX_DIFF_LINES to change."""
+
+_HUNK_RE = re.compile(r"^@@ -(\d+)(,\d+)? \+(\d+)(,\d+)? @@$")
+
 
 # The function below is imported into the generated python source.
 def _phm_compare_exact(a, b):
-    """Line by line helper compare function with assertion for pytest."""
+    """Line by line helper compare function with assertion for pytest.
+
+    Prints a unified diff from expected a to printed b if they differ.
+    """
+    if a == b:
+        return
     a_lines = a.splitlines()
     b_lines = b.splitlines()
-    for a_line, b_line in zip_longest(a_lines, b_lines):
-        if a_line != b_line:
-            diffs = difflib.ndiff(a_lines, b_lines)
-            for line in diffs:
-                print(line)
-            assert False
+    if a_lines == b_lines:
+        return
+    max_lines = int(os.environ.get("PHMDOCTEST_MAX_DIFF_LINES", MAX_DIFF_LINES))
+    for line in _phm_diff(a_lines, b_lines, DIFF_CONTEXT_LINES, max_lines):
+        print(line)
+    assert False
+
+
+def _phm_diff(a_lines, b_lines, context, max_lines):
+    """Generate a unified diff of just the lines that differ.
+
+    Lines the same at the start and the end are not given to difflib
+    so the time depends on the size of the difference.  At most
+    max_lines of the changed lines and at most max_lines of diff
+    are generated.
+    """
+    start = 0
+    shortest = min(len(a_lines), len(b_lines))
+    while start < shortest and a_lines[start] == b_lines[start]:
+        start += 1
+    same_at_end = 0
+    while (
+        same_at_end < shortest - start
+        and a_lines[-1 - same_at_end] == b_lines[-1 - same_at_end]
+    ):
+        same_at_end += 1
+    low = max(0, start - context)
+    a_high = len(a_lines) - same_at_end
+    b_high = len(b_lines) - same_at_end
+    truncated = a_high - start > max_lines or b_high - start > max_lines
+    a_high = min(a_high + context, start + max_lines)
+    b_high = min(b_high + context, start + max_lines)
+    yield "First difference at line {}.".format(start + 1)
+    diff = difflib.unified_diff(
+        a_lines[low:a_high],
+        b_lines[low:b_high],
+        fromfile="expected",
+        tofile="printed",
+        n=context,
+        lineterm="",
+    )
+    for count, line in enumerate(diff):
+        if count == max_lines:
+            truncated = True
+            break
+        m = _HUNK_RE.match(line)
+        if m:
+            # Line numbers in the hunk header are relative to low.
+            line = "@@ -{}{} +{}{} @@".format(
+                int(m.group(1)) + low,
+                m.group(2) or "",
+                int(m.group(3)) + low,
+                m.group(4) or "",
+            )
+        yield line
+    if truncated:
+        yield "... diff truncated. Set PHMDOCTEST_MAX_DIFF_LINES to see more."
+
+
+class _PhmTimeLimitExceeded(BaseException):
+    """Raised in a thread by the watchdog of _phm_time_limit()."""
+
+
+# The function below is imported into generated python source
+# that has a --timeout or timeout directive.
+@contextlib.contextmanager
+def _phm_time_limit(seconds, line):
+    """Fail the test if the code block at Markdown line runs too long.
+
+    Also a decorator of the block's test function.  Zero seconds is
+    no limit.  On the main thread SIGALRM interrupts the code, even
+    when it is sleeping.  On other threads, or without SIGALRM, a
+    watchdog thread raises an exception in the test's thread.  It is
+    seen when the thread next runs Python bytecode.  Without ctypes
+    there is no limit on those threads.
+    """
+    __tracebackhide__ = True
+    # Imported here so test files without a time limit don't import them.
+    import ctypes
+    import signal
+    import threading
+
+    message = "Code block at Markdown line {} did not finish in {:g} seconds.".format(
+        line, seconds
+    )
+    if not seconds:
+        yield
+    elif (
+        hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    ):
+
+        def on_alarm(signum, frame):
+            __tracebackhide__ = True
+            pytest.fail(message, pytrace=False)
+
+        start = time.monotonic()
+        previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+        previous_delay, _ = signal.setitimer(signal.ITIMER_REAL, seconds)
+        try:
+            yield
+        finally:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+            if previous_delay:
+                # Restart an alarm set by the caller with the time it has left.
+                remaining = previous_delay - (time.monotonic() - start)
+                signal.setitimer(signal.ITIMER_REAL, max(remaining, 0.001))
+    elif not hasattr(ctypes, "pythonapi"):
+        yield
+    else:
+        thread_id = ctypes.c_ulong(threading.get_ident())
+
+        def set_async_exc(exc):
+            ctypes.pythonapi.PyThreadState_SetAsyncExc(thread_id, exc)
+
+        watchdog = threading.Timer(
+            seconds, set_async_exc, args=(ctypes.py_object(_PhmTimeLimitExceeded),)
+        )
+        watchdog.daemon = True
+        watchdog.start()
+        try:
+            yield
+        except _PhmTimeLimitExceeded:
+            pytest.fail(message, pytrace=False)
+        finally:
+            watchdog.cancel()
+            watchdog.join()
+            # Clear the exception if it was set but not raised yet.
+            set_async_exc(None)
+
+
+# The function below is imported into --measure generated python source.
+def _phm_measure(markdown_file, test_file, cprofile=False):
+    """Make the phmdoctest.measure.Recorder of the test module."""
+    # Imported here so test files without --measure don't import it.
+    import phmdoctest.measure
+
+    return phmdoctest.measure.Recorder(markdown_file, test_file, cprofile)
+
+
+# The function below is imported into --compact generated python source.
+def _phm_run_case(case, request, stream_output=False, recorder=None):
+    """Compile and run a code block from the _phm_cases table.
+
+    case is line number, code, expected output, and the namespace
+    operation "update", "clear", or "".  It may be followed by the
+    seconds the code can run.  The code runs in a copy of the test
+    module's globals.  Fixtures are looked up only if the block
+    needs them.  recorder is the test module's
+    phmdoctest.measure.Recorder or None.
+    """
+    __tracebackhide__ = True
+    line, code, expected_output, operation = case[:4]
+    seconds = case[4] if len(case) > 4 else 0
+    filename = "<code block line {}>".format(line)
+    # Tracebacks show the lines of the code block.
+    linecache.cache[filename] = (len(code), None, code.splitlines(True), filename)
+    code_object = compile(code, filename, "exec")
+    module_globals = vars(request.module)
+    namespace = dict(module_globals)
+    # ExitStack is a do-nothing context manager when not measuring.
+    measuring = recorder.block(line) if recorder else contextlib.ExitStack()
+    with measuring:
+        if not expected_output:
+            with _phm_time_limit(seconds, line):
+                exec(code_object, namespace)
+        elif stream_output:
+            output_checker = request.getfixturevalue("expectoutput")(expected_output)
+            with _phm_time_limit(seconds, line):
+                exec(code_object, namespace)
+            output_checker.finish()
+        else:
+            capsys = request.getfixturevalue("capsys")
+            with _phm_time_limit(seconds, line):
+                exec(code_object, namespace)
+            _phm_compare_exact(a=expected_output, b=capsys.readouterr().out)
+    if operation == "update":
+        # Share the names assigned by the code.
+        missing = object()
+        additions = {
+            k: v
+            for k, v in namespace.items()
+            if module_globals.get(k, missing) is not v
+        }
+        request.getfixturevalue("managenamespace")(
+            operation="update", additions=additions
+        )
+    elif operation == "clear":
+        request.getfixturevalue("managenamespace")(operation="clear")
 
 
 # The functions below are used as a template to generate python source
@@ -45,9 +246,7 @@ def _phm_setup_doctest_teardown(doctest_namespace, managenamespace):
 
     managenamespace(operation="update", additions=locals())
     # update doctest namespace
-    additions = managenamespace(operation="copy")
-    for k, v in additions.items():
-        doctest_namespace[k] = v
+    managenamespace(operation="sync", target=doctest_namespace)
     yield
     # <teardown code here>
 
@@ -80,6 +279,24 @@ def test_managed_code_only(managenamespace):
     pass
 
 
+def test_code_and_streamed_output(expectoutput):
+    _phm_expected_str = """\
+<<<replaced>>>"""
+    _phm_output_checker = expectoutput(_phm_expected_str)
+    # <put code here>
+
+    _phm_output_checker.finish()
+
+
+def test_managed_code_and_streamed_output(expectoutput, managenamespace):
+    _phm_expected_str = """\
+<<<replaced>>>"""
+    _phm_output_checker = expectoutput(_phm_expected_str)
+    # <put code here>
+
+    _phm_output_checker.finish()
+
+
 def test_nothing_fails():
     """Fail if no Python code blocks or sessions were processed."""
     assert False, "nothing to test"
@@ -94,13 +311,13 @@ def test_nothing_passes():
 # The fixture copies globals created by the --setup code
 # into the pytest namespace supplied to doctests when
 # doing pytest --doctest-modules.
+# It runs once per module.  The sync operation does no copying
+# if the namespace has not changed since the setup fixture synced it.
 # This code is included only if phmdoctest option --setup-doctest.
 populate_doctest_namespace_str = """\
-@pytest.fixture()
+@pytest.fixture(scope="module")
 def populate_doctest_namespace(doctest_namespace, managenamespace):
-    additions = managenamespace(operation="copy")
-    for k, v in additions.items():
-        doctest_namespace[k] = v
+    managenamespace(operation="sync", target=doctest_namespace)
 """
 
 
@@ -110,3 +327,12 @@ def session_00000():
     r"""
     >>> getfixture('populate_doctest_namespace')
     """
+
+
+# With --compact the code blocks are parametrized test cases
+# of this test function.
+compact_test_block_str = """\
+@pytest.mark.parametrize("_phm_case", _phm_cases)
+def test_block(_phm_case, request):
+    _phm_run_case(_phm_case, request{})
+"""
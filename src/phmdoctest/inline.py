@@ -3,23 +3,28 @@ import re
 from typing import List, Tuple
 
 
+COMMENT_RE = re.compile(r"^\s*#")
+INDENT_RE = re.compile(r"^(\s*)\S")
+BLANK_RE = re.compile(r"^\s*$")
+WHITESPACE_RE = re.compile(r"\s*")
+
+INLINE_COMMAND_PREFIX = "phmdoctest:"
+"""Every inline command ends the line with this followed by the command."""
+
+
 def starts_with_comment(line: str) -> bool:
     """True if string starts with zero or more whitespace then # char."""
-    return re.match(pattern=r"^\s*#", string=line) is not None
+    return COMMENT_RE.match(line) is not None
 
 
 def num_newlines_at_end(code: str) -> int:
     """Return the number of consecutive newlines at the end of the string."""
-    m = re.search(pattern=r"(\n*)$", string=code)
-    consecutive = 0
-    if m:
-        consecutive = len(m.group(1))
-    return consecutive
+    return len(code) - len(code.rstrip("\n"))
 
 
 def num_indented(line: str) -> int:
     """Number of spaces the string is indented if indented with only spaces."""
-    m = re.match(pattern=r"^(\s*)\S", string=line)
+    m = INDENT_RE.match(line)
     indentation = 0
     if m:
         indentation = len(m.group(1))
@@ -28,13 +33,12 @@ def num_indented(line: str) -> int:
 
 def isblank(line: str) -> bool:
     """True if the entire string is whitespace."""
-    m = re.match(pattern=r"^\s*$", string=line)
-    return m is not None
+    return BLANK_RE.match(line) is not None
 
 
 def is_empty_comment(line: str) -> bool:
     """True if the string is just one # and the rest whitespace."""
-    despaced = re.sub(r"\s*", "", string=line)
+    despaced = WHITESPACE_RE.sub("", line)
     return despaced == "#"
 
 
@@ -101,45 +105,47 @@ def apply_inline_commands(code: str) -> Tuple[str, int]:
 
     Return a tuple: Modified (or not) code, number of commented out sections.
     """
+    # Without an inline command the code is returned unchanged.
+    if INLINE_COMMAND_PREFIX not in code:
+        return code, 0
     rewritten = []
     num_commented_out_sections = 0
     commenter = None
-    lines = code.splitlines()
-    while lines:
-        line = lines.pop(0)
-        if commenter is None:
-            # Looking for inline commands.
-            if starts_with_comment(line):
-                rewritten.append(line)
-
-            elif has_inline_pass(line):
-                rewritten.append(prepend_pass_statement(line))
-                num_commented_out_sections += 1
-
-            elif has_inline_omit(line):
-                commenter = BlockCommenter(num_indented(line))
-                commenter.add(line)
-            else:
-                rewritten.append(line)
-        else:
+    for line in code.splitlines():
+        if commenter is not None:
             # A blank line has no indent level.
             # It may have some stray spaces.  These are removed.
             if isblank(line):
                 commenter.add("")
+                continue
 
-            # Check if the line is indented the same or less than the omit
-            # command's statement.
-            elif num_indented(line) <= commenter.colno:
-                # If so this line signals the end of the
-                # lines to be commented out.
-                # Put this line back in the lines to do
-                num_commented_out_sections += 1
-                rewritten.extend(commenter.comment_out())
-                commenter = None
-                lines.insert(0, line)
-            else:
-                # Collect this line to comment out later.
+            # Collect lines indented more than the omit command's
+            # statement to comment out later.
+            if num_indented(line) > commenter.colno:
                 commenter.add(line)
+                continue
+
+            # This line is indented the same or less than the omit
+            # command's statement.  It signals the end of the
+            # lines to be commented out.  Then look for inline
+            # commands on this line.
+            num_commented_out_sections += 1
+            rewritten.extend(commenter.comment_out())
+            commenter = None
+
+        # Looking for inline commands.
+        if starts_with_comment(line):
+            rewritten.append(line)
+
+        elif has_inline_pass(line):
+            rewritten.append(prepend_pass_statement(line))
+            num_commented_out_sections += 1
+
+        elif has_inline_omit(line):
+            commenter = BlockCommenter(num_indented(line))
+            commenter.add(line)
+        else:
+            rewritten.append(line)
 
     if commenter is not None:
         # End of input reached while collecting lines to comment out.
@@ -1,32 +1,28 @@
 """phmdoctest entry point."""
 
+import os
+import shutil
+import tempfile
+from typing import IO, List, Optional
+
 import click
 
 from phmdoctest.entryargs import Args
-from phmdoctest.fenced import Role
+import phmdoctest.analysis
+import phmdoctest.cache
 import phmdoctest.cases
 import phmdoctest.fenced
 import phmdoctest.fillrole
 import phmdoctest.report
+import phmdoctest.scanner
+import phmdoctest.shard
+import phmdoctest.stamp
+import phmdoctest.stream
+import phmdoctest.timings
 import phmdoctest.tool
 
 
-@click.command()
-@click.argument(
-    "markdown_file",
-    nargs=1,
-    type=click.Path(
-        exists=True,
-        dir_okay=False,
-        allow_dash=True,
-    ),
-)
-@click.option(
-    "--outfile",
-    nargs=1,
-    help=('Write generated test case file to path TEXT. "-"' " writes to stdout."),
-)
-@click.option(
+skip_option = click.option(
     "-s",
     "--skip",
     multiple=True,
@@ -42,10 +38,9 @@ import phmdoctest.tool
         " Markdown file is skipped."
     ),
 )
-@click.option(
-    "--report", is_flag=True, help="Show how the Markdown fenced code blocks are used."
-)
-@click.option(
+
+
+fail_nocode_option = click.option(
     "--fail-nocode",
     is_flag=True,
     help=(
@@ -59,7 +54,9 @@ import phmdoctest.tool
         " has test_nothing_passes() which will never fail."
     ),
 )
-@click.option(
+
+
+setup_option = click.option(
     "-u",
     "--setup",
     nargs=1,
@@ -78,7 +75,9 @@ import phmdoctest.tool
         " to the globals."
     ),
 )
-@click.option(
+
+
+teardown_option = click.option(
     "-d",
     "--teardown",
     nargs=1,
@@ -93,7 +92,9 @@ import phmdoctest.tool
         " --skip or --setup, or if it is a session block."
     ),
 )
-@click.option(
+
+
+setup_doctest_option = click.option(
     "--setup-doctest",
     is_flag=True,
     help=(
@@ -105,10 +106,267 @@ import phmdoctest.tool
         " This option is ignored if there is no --setup option."
     ),
 )
+
+
+stream_output_option = click.option(
+    "--stream-output",
+    is_flag=True,
+    help=(
+        "Generated tests check printed output line by line as it is"
+        " printed instead of after the code block finishes."
+        " A test fails at the first line that is different"
+        " or when more lines are printed than expected."
+    ),
+)
+
+
+compact_option = click.option(
+    "--compact",
+    is_flag=True,
+    help=(
+        "Generate a table of the Python code blocks and one parametrized"
+        " test function instead of a test function for each block."
+        " Each block is compiled when its test case runs."
+        " The test file is smaller and quicker for pytest to import"
+        " and collect. The code runs at module level instead of"
+        " in a function."
+    ),
+)
+
+
+shard_option = click.option(
+    "--shard",
+    metavar="INDEX/COUNT",
+    callback=phmdoctest.shard.parse_shard,
+    help=(
+        "Generate tests for one of COUNT shards of the Python code and"
+        " session blocks. INDEX is 1 to COUNT."
+        " Shards are balanced by the number of lines in the blocks."
+        " Blocks that depend on each other by share-names or clear-names"
+        " are in the same shard, as are the sessions with --setup-doctest."
+        " Each shard has its own setup and teardown code."
+    ),
+)
+
+
+split_option = click.option(
+    "--split",
+    type=click.IntRange(min=1),
+    metavar="COUNT",
+    help=(
+        "Write each of COUNT shards to its own test file."
+        " The shard number is added to the --outfile name,"
+        " for example test_doc_1.py."
+    ),
+)
+
+
+xdist_groups_option = click.option(
+    "--xdist-groups",
+    is_flag=True,
+    help=(
+        "Mark the test cases of blocks that depend on each other"
+        " with the same pytest-xdist group. Run pytest -n with"
+        " --dist loadgroup to run them in order on one worker while"
+        " the other test cases run concurrently."
+    ),
+)
+
+
+fingerprints_option = click.option(
+    "--fingerprints",
+    is_flag=True,
+    help=(
+        "End the test file with a table of fingerprints of the test cases"
+        " and the blocks they depend on. With the pytest option"
+        " --phmdoctest-results DIR, test cases that passed before"
+        " with the same fingerprint are deselected."
+    ),
+)
+
+
+timeout_option = click.option(
+    "--timeout",
+    type=click.FloatRange(min=0),
+    metavar="SECONDS",
+    help=(
+        "A Python code block's test fails if the code runs longer than"
+        " SECONDS. The failure shows the Markdown line of the block."
+        " A block's timeout directive overrides it. 0 is no limit."
+        " Session blocks are not limited."
+    ),
+)
+
+
+measure_option = click.option(
+    "--measure",
+    is_flag=True,
+    help=(
+        "Generated tests record the wall time, CPU time, and peak"
+        " memory allocated by each Python code block to a JSON file"
+        " next to the test file ending with .measure.json."
+        " Show the slowest blocks with python -m phmdoctest.measure PATHS."
+    ),
+)
+
+
+measure_cprofile_option = click.option(
+    "--measure-cprofile",
+    is_flag=True,
+    help=(
+        "Like --measure and also record the functions that took the"
+        " most time in each Python code block with cProfile."
+    ),
+)
+
+
+watch_option = click.option(
+    "--watch",
+    is_flag=True,
+    help=(
+        "Keep running. When the Markdown file changes write the test"
+        " file again and run pytest on the test cases whose block,"
+        " directives, or blocks they depend on changed."
+        " pytest runs on all the test cases at the start."
+        " Needs pytest. Stop with Ctrl-C."
+    ),
+)
+
+
+cache_dir_option = click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    envvar="PHMDOCTEST_CACHE_DIR",
+    help=(
+        "Directory to cache generated test files."
+        " A Markdown file that has not changed since it was generated"
+        " with the same options is not parsed again."
+        " Also set by the environment variable PHMDOCTEST_CACHE_DIR."
+        " There is no cache unless one of them is set."
+    ),
+)
+
+
+no_cache_option = click.option(
+    "--no-cache",
+    is_flag=True,
+    help=(
+        "Don't read or write the cache of generated test files"
+        " even if --cache-dir or PHMDOCTEST_CACHE_DIR is set."
+    ),
+)
+
+
+stamp_option = click.option(
+    "--stamp",
+    is_flag=True,
+    help=(
+        "Start the generated test file with a phmdoctest-stamp comment"
+        " line holding the phmdoctest version and hashes of the Markdown"
+        " file and options. Used by --check."
+    ),
+)
+
+
+check_option = click.option(
+    "--check",
+    is_flag=True,
+    help=(
+        "Don't write the test file. Exit with an error if the --outfile"
+        " test file was not generated with --stamp from the current"
+        " Markdown file, options, and phmdoctest version."
+        " Only the stamp is read. The Markdown file is not parsed."
+    ),
+)
+
+
+timings_option = click.option(
+    "--timings",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    help=(
+        "Write wall time, CPU time, and peak memory allocated by each"
+        " stage of test file generation as JSON to path PATH."
+        ' "-" writes to stderr.'
+    ),
+)
+
+
+timings_trace_option = click.option(
+    "--timings-trace",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    help=(
+        "Write the stage timings as a Chrome trace event file to path PATH."
+        ' "-" writes to stderr.'
+    ),
+)
+
+
+@click.command()
+@click.argument(
+    "markdown_file",
+    nargs=1,
+    type=click.Path(
+        exists=True,
+        dir_okay=False,
+        allow_dash=True,
+    ),
+)
+@click.option(
+    "--outfile",
+    nargs=1,
+    help=('Write generated test case file to path TEXT. "-"' " writes to stdout."),
+)
+@skip_option
+@click.option(
+    "--report", is_flag=True, help="Show how the Markdown fenced code blocks are used."
+)
+@fail_nocode_option
+@setup_option
+@teardown_option
+@setup_doctest_option
+@stream_output_option
+@compact_option
+@shard_option
+@split_option
+@xdist_groups_option
+@fingerprints_option
+@timeout_option
+@measure_option
+@measure_cprofile_option
+@watch_option
+@cache_dir_option
+@no_cache_option
+@stamp_option
+@check_option
+@timings_option
+@timings_trace_option
 @click.version_option()  # type: ignore
 # Note- docstring for entry point shows up in click's usage text.
 def entry_point(
-    markdown_file, outfile, skip, report, fail_nocode, setup, teardown, setup_doctest
+    markdown_file,
+    outfile,
+    skip,
+    report,
+    fail_nocode,
+    setup,
+    teardown,
+    setup_doctest,
+    stream_output,
+    compact,
+    shard,
+    split,
+    xdist_groups,
+    fingerprints,
+    timeout,
+    measure,
+    measure_cprofile,
+    watch,
+    cache_dir,
+    no_cache,
+    stamp,
+    check,
+    timings,
+    timings_trace,
 ):
     args = Args(
         markdown_file=markdown_file,
@@ -119,24 +377,168 @@ def entry_point(
         setup=setup,
         teardown=teardown,
         setup_doctest=setup_doctest,
+        stamp=stamp,
+        stream_output=stream_output,
+        compact=compact,
+        shard=shard,
+        xdist_groups=xdist_groups,
+        fingerprints=fingerprints,
+        timeout=timeout,
+        measure=measure or measure_cprofile,
+        measure_cprofile=measure_cprofile,
     )
+    if timings or timings_trace:
+        with phmdoctest.timings.recording() as recorder:
+            try:
+                run(args, choose_cache_dir(cache_dir, no_cache), check, split, watch)
+            finally:
+                phmdoctest.timings.write(recorder, timings, timings_trace)
+    else:
+        run(args, choose_cache_dir(cache_dir, no_cache), check, split, watch)
+
+
+def run(
+    args: Args,
+    cache_dir: Optional[str],
+    check: bool,
+    split: Optional[int] = None,
+    watch: bool = False,
+) -> None:
+    """Check or generate the test file or the split test files."""
+    if watch:
+        if check or split is not None or args.shard is not None:
+            raise click.ClickException(
+                "--watch can't be used with --check, --split, or --shard."
+            )
+        # import here since phmdoctest.watch imports phmdoctest.main
+        from phmdoctest.watch import watch as watch_files
+
+        watch_files([args], cache_dir)
+    elif split is not None:
+        if args.shard is not None:
+            raise click.ClickException("Use --split or --shard, not both.")
+        if not args.outfile or args.outfile == "-":
+            raise click.ClickException("--split needs an --outfile path.")
+        for index, outfile in enumerate(split_outfiles(args.outfile, split), 1):
+            shard_args = args._replace(
+                outfile=outfile,
+                shard=(index, split),
+                is_report=args.is_report and index == 1,
+            )
+            run(shard_args, cache_dir, check)
+    elif check:
+        with phmdoctest.timings.stage("stamp.check"):
+            phmdoctest.stamp.check(args)
+    else:
+        generate(args, cache_dir)
+
+
+def split_outfiles(outfile: str, count: int) -> List[str]:
+    """Test file paths for the shards. The shard number ends the name."""
+    root, ext = os.path.splitext(outfile)
+    return ["{}_{}{}".format(root, index, ext) for index in range(1, count + 1)]
+
+
+def choose_cache_dir(cache_dir: Optional[str], no_cache: bool) -> Optional[str]:
+    """Return the cache directory or None if not caching."""
+    if no_cache:
+        return None
+    return cache_dir
+
+
+def generate(args: Args, cache_dir: Optional[str] = None) -> None:
+    """Print the report and write --outfile for one Markdown file.
 
-    # Find markdown blocks and pair up code and output blocks.
+    If cache_dir is not None look for the test file in the cache.
+    The cache is not used for --report or when reading stdin.
+    """
+    if args.stamp and args.markdown_file == "-":
+        raise click.ClickException("--stamp needs a MARKDOWN_FILE path.")
+    with phmdoctest.timings.stage("generate", markdown_file=args.markdown_file):
+        if cache_dir is None or args.is_report or not args.outfile:
+            generate_uncached(args)
+        elif args.markdown_file == "-":
+            generate_uncached(args)
+        else:
+            generate_cached(args, cache_dir)
+
+
+def generate_cached(args: Args, cache_dir: str) -> None:
+    """Copy the test file from the cache. Generate it into the cache if missing."""
+    with phmdoctest.timings.stage("cache.lookup"):
+        markdown_digest = phmdoctest.cache.file_digest(args.markdown_file)
+        key = phmdoctest.cache.cache_key(args, markdown_digest)
+        text = phmdoctest.cache.lookup(cache_dir, key)
+    if text is None:
+        temp_path = phmdoctest.cache.new_temp_path(cache_dir)
+        try:
+            generate_uncached(args._replace(outfile=temp_path))
+            with phmdoctest.timings.stage("cache.publish"):
+                with open(temp_path, "r", encoding="utf-8") as fp:
+                    text = fp.read()
+                phmdoctest.cache.publish(cache_dir, temp_path, key)
+        finally:
+            phmdoctest.cache.remove(temp_path)
+    with phmdoctest.timings.stage("write outfile"):
+        with click.open_file(args.outfile, "w", encoding="utf-8") as ofp:
+            ofp.write(text)
+
+
+def generate_uncached(args: Args) -> None:
+    """Print the report and write --outfile for one Markdown file."""
+    # Generate the test file while reading the Markdown file.
+    # Markdown that needs the commonmark parser is parsed all at once.
+    # Shards, xdist groups, and fingerprints are found after all the
+    # blocks have their roles.
     with click.open_file(args.markdown_file, encoding="utf-8") as fp:
-        blocks = phmdoctest.fenced.convert_nodes(phmdoctest.tool.fenced_block_nodes(fp))
-    phmdoctest.fillrole.identify_code_output_session_blocks(blocks)
-    phmdoctest.fillrole.del_problem_blocks(blocks)
-    code_and_session_blocks = [b for b in blocks if b.role in [Role.CODE, Role.SESSION]]
-    phmdoctest.fillrole.apply_skips(args, code_and_session_blocks)
-    phmdoctest.fillrole.find_and_designate_setup(args.setup, code_and_session_blocks)
-    phmdoctest.fillrole.find_and_designate_teardown(
-        args.teardown, code_and_session_blocks
-    )
+        if args.markdown_file == "-" or not fp.seekable():
+            fp = spool_markdown(fp)
+        if args.shard is None and not (args.xdist_groups or args.fingerprints):
+            try:
+                with phmdoctest.timings.stage("stream.write_test_cases"):
+                    phmdoctest.stream.write_test_cases(args, fp)
+                return
+            except phmdoctest.scanner.NeedsCommonmark:
+                fp.seek(0)
+            with phmdoctest.timings.stage("tool.fenced_block_nodes"):
+                nodes = phmdoctest.tool.fenced_block_nodes(fp)
+        else:
+            with phmdoctest.timings.stage("scanner.fenced_block_nodes"):
+                nodes = phmdoctest.scanner.fenced_block_nodes(fp)
+        with phmdoctest.timings.stage("fenced.convert_nodes"):
+            blocks = phmdoctest.fenced.convert_nodes(nodes)
+    with phmdoctest.timings.stage("fillrole.assign_roles"):
+        phmdoctest.fillrole.assign_roles(args, blocks)
+    with phmdoctest.timings.stage("analysis.analyze"):
+        analysis = phmdoctest.analysis.analyze(blocks)
     if args.is_report:
-        phmdoctest.report.print_report(args, blocks)
+        with phmdoctest.timings.stage("report.print_report"):
+            phmdoctest.report.print_report(args, blocks, analysis)
 
     # build test cases and write to the --outfile path
     if args.outfile:
-        test_case_string = phmdoctest.cases.build_test_cases(args, blocks)
-        with click.open_file(args.outfile, "w", encoding="utf-8") as ofp:
-            ofp.write(test_case_string)
+        if args.shard is None:
+            with phmdoctest.timings.stage("cases.build_test_cases"):
+                test_case_string = phmdoctest.cases.build_test_cases(
+                    args, blocks, analysis
+                )
+        else:
+            with phmdoctest.timings.stage("shard.build_test_cases"):
+                test_case_string = phmdoctest.shard.build_test_cases(
+                    args, blocks, analysis
+                )
+        with phmdoctest.timings.stage("write outfile"):
+            with click.open_file(args.outfile, "w", encoding="utf-8") as ofp:
+                ofp.write(test_case_string)
+
+
+def spool_markdown(fp: IO[str]) -> IO[str]:
+    """Copy Markdown from stdin to a temporary file that can be re-read.
+
+    The stdin of click 8.2's CliRunner raises EOFError instead of
+    StopIteration at the end of the lines.
+    """
+    spool = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+    shutil.copyfileobj(fp, spool)
+    spool.seek(0)
+    return spool
@@ -0,0 +1,124 @@
+"""Match all the --skip patterns against a block in one pass.
+
+The substring patterns are compiled into an Aho-Corasick automaton
+once per run.  Each block's contents are scanned once no matter
+how many patterns there are.
+"""
+from collections import deque
+from typing import Iterable, List, Sequence, Set
+from typing import Dict  # noqa: F401
+
+from phmdoctest.fenced import FencedBlock
+
+POSITIONS = ["FIRST", "SECOND", "LAST"]
+"""Patterns that match a block by its position instead of its contents."""
+
+MIN_AUTOMATON_PATTERNS = 8
+"""With fewer substring patterns str.find() is faster than the automaton."""
+
+
+def position_match(pattern: str, index: int, is_last: bool) -> bool:
+    """True if the positional pattern matches the block at index."""
+    if pattern == "FIRST":
+        return index == 0
+    elif pattern == "SECOND":
+        return index == 1
+    return is_last
+
+
+class Automaton:
+    """Aho-Corasick automaton that finds which patterns occur in text."""
+
+    def __init__(self, patterns: Iterable[str]) -> None:
+        self.patterns = list(dict.fromkeys(patterns))
+        # State 0 is the root. Each state has its transitions, failure
+        # link, and the patterns that end there or at a state on
+        # its chain of failure links.
+        self.goto = [{}]  # type: List[Dict[str, int]]
+        self.fail = [0]
+        self.output = [[]]  # type: List[List[str]]
+        for pattern in self.patterns:
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.output[state].append(pattern)
+        self._link()
+
+    def _link(self) -> None:
+        """Set the failure links breadth first and merge the outputs."""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = (
+                    self.output[next_state] + self.output[self.fail[next_state]]
+                )
+
+    def search(self, text: str) -> Set[str]:
+        """Return the patterns that occur in text."""
+        found = set(self.output[0])  # the empty pattern
+        if len(found) == len(self.patterns):
+            return found
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+                if len(found) == len(self.patterns):
+                    break
+        return found
+
+
+class SkipMatcher:
+    """Find the --skip patterns that match each code or session block.
+
+    The results are the same as calling phmdoctest.fillrole.is_match()
+    for each pattern.
+    """
+
+    def __init__(self, patterns: Sequence[str]) -> None:
+        self.patterns = list(patterns)
+        # Where each pattern is in the --skip list. A pattern can repeat.
+        self.indexes = {}  # type: Dict[str, List[int]]
+        for index, pattern in enumerate(self.patterns):
+            self.indexes.setdefault(pattern, []).append(index)
+        self.positional = [p for p in self.indexes if p in POSITIONS]
+        self.substrings = [p for p in self.indexes if p not in POSITIONS]
+        self.automaton = None
+        if len(self.substrings) >= MIN_AUTOMATON_PATTERNS:
+            self.automaton = Automaton(self.substrings)
+
+    def matches(self, block: FencedBlock, index: int, is_last: bool) -> List[str]:
+        """Patterns that match the block in --skip order, repeats included.
+
+        index is the position of the block in the list of code and
+        session blocks.  is_last is True if it is the last one.
+        """
+        if self.automaton is not None:
+            found = self.automaton.search(block.contents)
+        else:
+            found = {p for p in self.substrings if block.contents.find(p) > -1}
+        for pattern in self.positional:
+            if position_match(pattern, index, is_last):
+                found.add(pattern)
+        if not found:
+            return []
+        order = sorted(i for pattern in found for i in self.indexes[pattern])
+        return [self.patterns[i] for i in order]
@@ -0,0 +1,289 @@
+"""Measure the time and memory used by code blocks while their tests run.
+
+The test file generated with --measure has a Recorder that measures
+each Python code block's test: wall time, CPU time, and the peak
+memory allocated as seen by tracemalloc.  With --measure-cprofile the
+functions that took the most time are recorded too.  tracemalloc and
+cProfile slow the code down, so compare the blocks to each other
+rather than to runs without --measure.
+Before Python 3.9 tracemalloc can't reset its peak between blocks,
+so peak_bytes is null in the sidecar and blank in the report.
+
+The measurements are written to a JSON sidecar file next to the test
+file when its tests finish.  test_doc.py has the sidecar
+test_doc.measure.json.
+Under pytest-xdist each worker writes its own sidecar, for example
+test_doc.gw0.measure.json.
+
+merge() reads the sidecars of many test files and
+slowest_blocks_report() makes a table of the slowest blocks.
+From the command line:
+
+``python -m phmdoctest.measure PATHS...``
+
+PATHS are sidecar files or directories searched for them.
+"""
+from collections import namedtuple
+import contextlib
+import cProfile
+import glob
+import json
+import os
+import pstats
+import tracemalloc
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from typing import Dict  # noqa: F401
+
+import click
+import monotable
+
+import phmdoctest
+import phmdoctest.timings
+
+SIDECAR_SUFFIX = ".measure.json"
+"""End of the sidecar file name that replaces .py."""
+
+PROFILE_FUNCTIONS = 10
+"""Number of functions recorded with --measure-cprofile."""
+
+BlockMeasurement = namedtuple(
+    "BlockMeasurement",
+    [
+        "markdown_file",
+        "line",
+        "test_file",
+        "outcome",  # "passed", "failed", or "skipped"
+        "wall",
+        "cpu",
+        "peak_bytes",  # None before Python 3.9
+        "profile",  # List of function, calls, tottime, cumtime
+    ],
+)
+"""Time in seconds and memory used by the test of one code block."""
+
+
+def sidecar_path(test_file: str) -> str:
+    """Path of the JSON sidecar of the test file."""
+    root = os.path.splitext(test_file)[0]
+    worker = os.environ.get("PYTEST_XDIST_WORKER")
+    if worker:
+        root += "." + worker
+    return root + SIDECAR_SUFFIX
+
+
+def profile_rows(profiler: cProfile.Profile, count: int) -> List[List[object]]:
+    """Function, calls, tottime, and cumtime of the slowest functions."""
+    stats = pstats.Stats(profiler).stats  # type: ignore
+    slowest = sorted(stats.items(), key=lambda item: -item[1][3])[:count]
+    return [
+        [pstats.func_std_string(func), calls, tottime, cumtime]  # type: ignore
+        for func, (_, calls, tottime, cumtime, _) in slowest
+    ]
+
+
+class Recorder:
+    """Measures the code blocks of one test module and writes its sidecar.
+
+    The sidecar is written by the module scoped fixture made by fixture().
+    """
+
+    def __init__(self, markdown_file: str, test_file: str, cprofile: bool) -> None:
+        self.markdown_file = markdown_file
+        self.test_file = os.path.basename(test_file)
+        self.path = sidecar_path(test_file)
+        self.cprofile = cprofile
+        self.blocks = {}  # type: Dict[int, BlockMeasurement]
+
+    @contextlib.contextmanager
+    def block(self, line: int) -> Iterator[None]:
+        """Measure the code block at Markdown line.
+
+        Used as a with statement or as a decorator of the test function.
+        Starts tracemalloc if it is not already tracing.
+        pytest.skip() and pytest.xfail() are recorded as skipped.
+        """
+        import pytest
+
+        timings = phmdoctest.timings.Recorder()
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        profiler = cProfile.Profile() if self.cprofile else None
+        outcome = "failed"
+        try:
+            with timings.stage("block"):
+                if profiler is not None:
+                    profiler.enable()
+                try:
+                    yield
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+            outcome = "passed"
+        except (pytest.skip.Exception, pytest.xfail.Exception):
+            outcome = "skipped"
+            raise
+        finally:
+            if started_tracing:
+                tracemalloc.stop()
+            (record,) = timings.records
+            self.add(
+                BlockMeasurement(
+                    markdown_file=self.markdown_file,
+                    line=line,
+                    test_file=self.test_file,
+                    outcome=outcome,
+                    wall=record.wall,
+                    cpu=record.cpu,
+                    peak_bytes=record.peak_bytes,
+                    profile=(
+                        profile_rows(profiler, PROFILE_FUNCTIONS)
+                        if profiler is not None
+                        else []
+                    ),
+                )
+            )
+
+    def add(self, measurement: BlockMeasurement) -> None:
+        """Keep the measurement."""
+        self.blocks[measurement.line] = measurement
+
+    def fixture(self) -> Any:
+        """Autouse module scoped fixture that writes the sidecar at teardown.
+
+        Assign it to _phm_write_measurements in the test module.
+        """
+        import pytest
+
+        @pytest.fixture(scope="module", autouse=True)
+        def _phm_write_measurements() -> Iterator[None]:
+            yield
+            self.write()
+
+        return _phm_write_measurements
+
+    def write(self) -> None:
+        """Replace the sidecar with the measurements so far."""
+        data = dict(
+            version=phmdoctest.__version__,
+            markdown_file=self.markdown_file,
+            test_file=self.test_file,
+            blocks=[m._asdict() for _, m in sorted(self.blocks.items())],
+        )
+        temporary_path = self.path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, indent=2)
+        os.replace(temporary_path, self.path)
+
+
+def read_sidecar(path: str) -> List[BlockMeasurement]:
+    """Measurements from one sidecar file."""
+    with open(path, "r", encoding="utf-8") as fp:
+        data = json.load(fp)
+    return [BlockMeasurement(**block) for block in data["blocks"]]
+
+
+def find_sidecars(paths: Iterable[str]) -> List[str]:
+    """The sidecar files and the sidecars found in the directories."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            pattern = os.path.join(path, "**", "*" + SIDECAR_SUFFIX)
+            found.extend(sorted(glob.glob(pattern, recursive=True)))
+        else:
+            found.append(path)
+    return found
+
+
+def merge(paths: Iterable[str]) -> List[BlockMeasurement]:
+    """Measurements from the sidecars ordered by Markdown file and line.
+
+    paths are sidecar files or directories searched for them.
+    If a block is in more than one sidecar the slowest is kept.
+    """
+    merged = {}  # type: Dict[Tuple[str, int], BlockMeasurement]
+    for path in find_sidecars(paths):
+        for measurement in read_sidecar(path):
+            key = measurement.markdown_file, measurement.line
+            kept = merged.get(key)
+            if kept is None or measurement.wall > kept.wall:
+                merged[key] = measurement
+    return [merged[key] for key in sorted(merged)]
+
+
+def to_json(measurements: List[BlockMeasurement]) -> str:
+    """The merged measurements as a JSON string."""
+    data = dict(
+        version=phmdoctest.__version__,
+        blocks=[m._asdict() for m in measurements],
+    )
+    return json.dumps(data, indent=2)
+
+
+def slowest_blocks_report(
+    measurements: List[BlockMeasurement], count: int = 20, title: str = ""
+) -> str:
+    """Table of the count code blocks with the most wall time."""
+    slowest = sorted(measurements, key=lambda m: -m.wall)[:count]
+    table = monotable.MonoTable()
+    headings = [
+        "Markdown\nfile",
+        "line\nnumber",
+        "wall\nseconds",
+        "CPU\nseconds",
+        "peak\nKiB",
+        "outcome",
+    ]
+    formats = ["", "", ".3f", ".3f", ",.0f", ""]
+    cell_grid = [
+        [
+            click.format_filename(m.markdown_file),
+            m.line,
+            m.wall,
+            m.cpu,
+            m.peak_bytes / 1024 if m.peak_bytes is not None else None,
+            m.outcome,
+        ]
+        for m in slowest
+    ]
+    text = table.table(headings, formats, cell_grid, title)  # type: str
+    return text
+
+
+@click.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option(
+    "--count",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+    help="Number of blocks shown.",
+)
+@click.option(
+    "--json",
+    "json_path",
+    metavar="PATH",
+    type=click.Path(dir_okay=False, allow_dash=True),
+    help='Also write the merged measurements as JSON to PATH. "-" writes to stdout.',
+)
+# Note- docstring for entry point shows up in click's usage text.
+def report_entry_point(
+    paths: Tuple[str, ...], count: int, json_path: Optional[str]
+) -> None:
+    """Print the slowest code blocks measured by tests generated with --measure.
+
+    PATHS are .measure.json sidecar files or directories searched for them.
+    """
+    measurements = merge(paths)
+    if json_path is not None:
+        with click.open_file(json_path, "w", encoding="utf-8") as fp:
+            fp.write(to_json(measurements) + "\n")
+    if json_path != "-":
+        click.echo(
+            slowest_blocks_report(measurements, count, title="slowest code blocks")
+        )
+        click.echo("{} code blocks measured.".format(len(measurements)))
+
+
+if __name__ == "__main__":
+    report_entry_point(prog_name="python -m phmdoctest.measure")
@@ -0,0 +1,295 @@
+"""pytest plugin that collects Markdown files without writing a test file.
+
+The plugin is registered with the pytest11 entry point.
+Collection is turned on by the pytest option --phmdoctest
+or the ini option phmdoctest = true.
+
+With the option --phmdoctest-results DIR test cases of test modules
+that have the phmdoctest --fingerprints table and passed before with
+the same fingerprint are deselected.  See phmdoctest.results.
+
+The test file source is built in memory by
+phmdoctest.cases.build_test_cases(), compiled once, and executed in
+a new module object.  Python code blocks are collected as pytest test
+functions.  Session blocks are collected as doctest items.
+Before pytest 7 the collection hook gets a py.path path and nodes
+are made with fspath.
+"""
+import doctest
+import linecache
+import types
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Union
+from typing import Set  # noqa: F401
+
+import pytest
+
+import phmdoctest.results
+
+PYTEST_7 = int(pytest.__version__.split(".")[0]) >= 7
+"""True if pytest nodes have pathlib path attributes."""
+
+
+def pytest_addoption(parser: Any) -> None:
+    group = parser.getgroup("phmdoctest")
+    group.addoption(
+        "--phmdoctest",
+        action="store_true",
+        default=False,
+        help="Collect Markdown .md files as phmdoctest test modules.",
+    )
+    group.addoption(
+        "--phmdoctest-results",
+        metavar="DIR",
+        default=None,
+        help=(
+            "Deselect phmdoctest test cases that passed before with the same"
+            " fingerprint. Passes are recorded in directory DIR."
+            " The test file must be generated with phmdoctest --fingerprints."
+        ),
+    )
+    group.addoption(
+        "--phmdoctest-env",
+        metavar="TEXT",
+        default="",
+        help=(
+            "Passes recorded by --phmdoctest-results only count with the same"
+            " TEXT. For example a hash of the installed packages."
+        ),
+    )
+    parser.addini(
+        "phmdoctest",
+        type="bool",
+        default=False,
+        help="Collect Markdown .md files as phmdoctest test modules.",
+    )
+
+
+def pytest_configure(config: Any) -> None:
+    results_dir = config.getoption("phmdoctest_results")
+    if results_dir:
+        environment = phmdoctest.results.environment_text(
+            config.getoption("phmdoctest_env")
+        )
+        config.pluginmanager.register(
+            ResultsPlugin(results_dir, environment), "phmdoctest-results"
+        )
+
+
+def is_collected(file_path: Path, parent: pytest.Collector) -> bool:
+    """True if the file is Markdown and collection is turned on."""
+    config = parent.config
+    if file_path.suffix != ".md":
+        return False
+    return bool(config.getoption("phmdoctest") or config.getini("phmdoctest"))
+
+
+if PYTEST_7:
+
+    def pytest_collect_file(file_path: Path, parent: pytest.Collector) -> Optional[Any]:
+        if not is_collected(file_path, parent):
+            return None
+        return MarkdownModule.from_parent(parent, path=file_path)
+
+else:
+
+    def pytest_collect_file(  # type: ignore
+        path: Any, parent: pytest.Collector
+    ) -> Optional[Any]:
+        if not is_collected(Path(str(path)), parent):
+            return None
+        return MarkdownModule.from_parent(parent, fspath=path)
+
+
+def build_source(markdown_file: str) -> str:
+    """Return the test file that phmdoctest writes for the Markdown file."""
+    import click
+
+    from phmdoctest.entryargs import Args
+    import phmdoctest.cases
+    import phmdoctest.fenced
+    import phmdoctest.fillrole
+    import phmdoctest.scanner
+
+    args = Args(
+        markdown_file=markdown_file,
+        outfile=None,
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=True,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=True,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    with click.open_file(markdown_file, encoding="utf-8") as fp:
+        nodes = phmdoctest.scanner.fenced_block_nodes(fp)
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    phmdoctest.fillrole.assign_roles(args, blocks)
+    return phmdoctest.cases.build_test_cases(args, blocks)
+
+
+class MarkdownModule(pytest.Module):
+    """Test module built from a Markdown file."""
+
+    @property
+    def markdown_path(self) -> Path:
+        """Path of the Markdown file."""
+        if PYTEST_7:
+            return Path(self.path)
+        return Path(str(self.fspath))
+
+    def _getobj(self) -> types.ModuleType:
+        import click
+
+        markdown_path = self.markdown_path
+        try:
+            source = build_source(str(markdown_path))
+        except click.ClickException as exc:
+            raise self.CollectError(
+                "phmdoctest {}\n{}".format(markdown_path, exc.format_message())
+            )
+        # The file name shows up in tracebacks. The source lines
+        # are put in the linecache so the tracebacks show the code.
+        filename = "{}.py".format(markdown_path)
+        linecache.cache[filename] = (
+            len(source),
+            None,
+            source.splitlines(keepends=True),
+            filename,
+        )
+        code = compile(source, filename, "exec")
+        module = types.ModuleType(
+            "phmdoctest_" + markdown_path.stem.replace("-", "_").replace(".", "_")
+        )
+        module.__file__ = filename
+        exec(code, module.__dict__)
+        return module
+
+    def collect(self) -> Iterable[Union[pytest.Item, pytest.Collector]]:
+        # pytest's doctest support is private, so it is imported only
+        # when a Markdown file is collected.
+        from _pytest.doctest import (
+            DoctestItem,
+            _get_checker,
+            _get_continue_on_failure,
+            _get_runner,
+            get_optionflags,
+        )
+
+        yield from super().collect()
+        # The session blocks are the docstrings of functions in the module.
+        module = self.obj
+        finder = doctest.DocTestFinder()
+        try:
+            optionflags = get_optionflags(self.config)
+        except AttributeError:
+            # Older pytest versions pass the node to get_optionflags().
+            optionflags = get_optionflags(self)  # type: ignore
+        runner = _get_runner(
+            verbose=False,
+            optionflags=optionflags,
+            checker=_get_checker(),
+            continue_on_failure=_get_continue_on_failure(self.config),
+        )
+        for test in finder.find(module, module.__name__):
+            if test.examples:
+                yield DoctestItem.from_parent(
+                    self,  # type: ignore
+                    name=test.name,
+                    runner=runner,
+                    dtest=test,
+                )
+
+
+def test_case_name(item: pytest.Item) -> str:
+    """Name of the test case in the _phm_fingerprints table."""
+    from _pytest.doctest import DoctestItem
+
+    if isinstance(item, DoctestItem):
+        return item.name.rsplit(".", 1)[-1]
+    callspec = getattr(item, "callspec", None)
+    if callspec is not None and getattr(item, "originalname", "") == "test_block":
+        # --compact test case
+        return str(callspec.id)
+    return item.name
+
+
+class ResultsPlugin:
+    """Deselect test cases that passed before. Record the passes."""
+
+    def __init__(self, results_dir: str, environment: str) -> None:
+        self.results_dir = results_dir
+        self.environment = environment
+        self.keys = {}  # type: Dict[str, str]
+        self.call_passed = set()  # type: Set[str]
+
+    def key(self, fingerprint: str) -> str:
+        return phmdoctest.results.result_key(fingerprint, self.environment)
+
+    def passed(self, fingerprint: str) -> bool:
+        return phmdoctest.results.has_passed(self.results_dir, self.key(fingerprint))
+
+    def module_cases(
+        self, module: Optional[pytest.Module]
+    ) -> Optional[Dict[str, Optional[str]]]:
+        """Fingerprint of each test case in the module's _phm_fingerprints table.
+
+        The fingerprint is None if the test case can be deselected.
+        Returns None if the module has no table.
+        """
+        if module is None:
+            return None
+        try:
+            units = getattr(module.obj, "_phm_fingerprints", None)
+        except Exception:
+            return None
+        if units is None:
+            return None
+        to_run = phmdoctest.results.names_to_run(units, self.passed)
+        cases = {}  # type: Dict[str, Optional[str]]
+        for unit in units:
+            for name, fingerprint in unit:
+                cases[name] = fingerprint if name in to_run else None
+        return cases
+
+    def pytest_collection_modifyitems(self, config: Any, items: List[Any]) -> None:
+        by_module = {}  # type: Dict[Any, Optional[Dict[str, Optional[str]]]]
+        selected = []
+        deselected = []
+        for item in items:
+            module = item.getparent(pytest.Module)
+            if module not in by_module:
+                by_module[module] = self.module_cases(module)
+            cases = by_module[module]
+            name = test_case_name(item)
+            if cases is None or name not in cases:
+                selected.append(item)
+                continue
+            fingerprint = cases[name]
+            if fingerprint is None:
+                deselected.append(item)
+            else:
+                self.keys[item.nodeid] = self.key(fingerprint)
+                selected.append(item)
+        if deselected:
+            config.hook.pytest_deselected(items=deselected)
+            items[:] = selected
+
+    def pytest_runtest_logreport(self, report: Any) -> None:
+        key = self.keys.get(report.nodeid)
+        if key is None:
+            return
+        if report.when == "call" and report.passed:
+            self.call_passed.add(report.nodeid)
+        elif report.when == "teardown" and report.passed:
+            if report.nodeid in self.call_passed:
+                phmdoctest.results.record_pass(self.results_dir, key)
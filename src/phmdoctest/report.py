@@ -1,17 +1,23 @@
 """Print report about fenced code blocks and how they are used."""
 
-from collections import Counter
-from typing import List
+from typing import List, Optional
 
 import click
 import monotable
 
+from phmdoctest.analysis import Analysis
 from phmdoctest.entryargs import Args
-from phmdoctest.fenced import FencedBlock
+from phmdoctest.fenced import Role, FencedBlock
+import phmdoctest.analysis
 
 
-def print_report(args: Args, blocks: List[FencedBlock]) -> None:
-    """Print Markdown fenced block report and skips report."""
+def print_report(
+    args: Args, blocks: List[FencedBlock], analysis: Optional[Analysis] = None
+) -> None:
+    """Print Markdown fenced block report and skips report.
+
+    analysis is phmdoctest.analysis.analyze(blocks) if the caller has it.
+    """
     report = []
     filename = click.format_filename(args.markdown_file)
     title1 = filename + " fenced blocks"
@@ -19,24 +25,25 @@ def print_report(args: Args, blocks: List[FencedBlock]) -> None:
         text1 = fenced_block_report(blocks, title=title1)
         report.append(text1)
 
-    roles = [b.role.name for b in blocks]
-    counts = Counter(roles)
+    if analysis is None:
+        analysis = phmdoctest.analysis.analyze(blocks)
+    counts = analysis.role_counts
 
-    number_of_test_cases = counts["CODE"] + counts["SESSION"]
+    number_of_test_cases = analysis.number_of_test_cases()
     report.append("{} test cases.".format(number_of_test_cases))
-    if counts["SKIP_CODE"] > 0:
-        report.append("{} skipped code blocks.".format(counts["SKIP_CODE"]))
-    if counts["SKIP_SESSION"] > 0:
+    if counts[Role.SKIP_CODE] > 0:
+        report.append("{} skipped code blocks.".format(counts[Role.SKIP_CODE]))
+    if counts[Role.SKIP_SESSION] > 0:
         report.append(
-            "{} skipped interactive session blocks.".format(counts["SKIP_SESSION"])
+            "{} skipped interactive session blocks.".format(counts[Role.SKIP_SESSION])
         )
 
-    num_missing_output = counts["CODE"] - counts["OUTPUT"]
+    num_missing_output = counts[Role.CODE] - counts[Role.OUTPUT]
     if num_missing_output:
         report.append("{} code blocks with no output block.".format(num_missing_output))
 
     # del blocks are blocks that will be ignored.
-    num_del = counts["DEL_CODE"] + counts["DEL_OUTPUT"]
+    num_del = counts[Role.DEL_CODE] + counts[Role.DEL_OUTPUT]
     if num_del:
         report.append('{} blocks marked "del-". They are not tested.'.format(num_del))
 
@@ -46,20 +53,20 @@ def print_report(args: Args, blocks: List[FencedBlock]) -> None:
     #     no --setup option
     #     setup block was not found
     #     setup block was skipped
-    if args.setup_doctest and not counts["SETUP"]:
+    if args.setup_doctest and not counts[Role.SETUP]:
         report.append("No setup block found, not honoring --setup-doctest.")
     else:
-        if args.setup and not counts["SETUP"]:
+        if args.setup and not counts[Role.SETUP]:
             report.append("No setup block found.")
 
     # Note if caller wanted --teardown and its not happening.
-    if args.teardown and not counts["TEARDOWN"]:
+    if args.teardown and not counts[Role.TEARDOWN]:
         report.append("No teardown block found.")
 
     if args.skips:
         report.append("")
         title2 = "skip pattern matches (blank means no match)"
-        text2 = skips_report(args.skips, blocks, title=title2)
+        text2 = skips_report(args.skips, analysis, title=title2)
         report.append(text2)
     print("\n".join(report))
 
@@ -92,7 +99,7 @@ def fenced_block_report(blocks: List[FencedBlock], title: str = "") -> str:
     return text
 
 
-def skips_report(skips: List[str], blocks: List[FencedBlock], title: str = "") -> str:
+def skips_report(skips: List[str], analysis: Analysis, title: str = "") -> str:
     """Generate text report about the disposition of --skip options."""
     # Blocks with role OUTPUT and SKIP_OUTPUT will always have an
     # empty skip_reasons list even if the linking code block is skipped.
@@ -101,11 +108,7 @@ def skips_report(skips: List[str], blocks: List[FencedBlock], title: str = "") -
     table.more_marker = "..."
     cell_grid = []
     for skip in skips:
-        code_lines = []
-        for block in blocks:
-            if skip in block.patterns:
-                code_lines.append(str(block.line))
-
+        code_lines = [str(line) for line in analysis.matching_lines(skip)]
         cell_grid.append([skip, ", ".join(code_lines)])
     headings = ["skip pattern", "matching code block line number(s)"]
     formats = ["", "(width=36;wrap)"]
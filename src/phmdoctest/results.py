@@ -0,0 +1,63 @@
+"""Remember the fingerprints of test cases that passed.
+
+Used by the pytest plugin option --phmdoctest-results DIR.
+The test file generated with --fingerprints has the table
+_phm_fingerprints.  A test case whose fingerprint passed before in
+the same environment is deselected.  DIR has an empty file for
+each passed fingerprint and environment named by their SHA-256 hash.
+Delete DIR to forget the results.
+"""
+import hashlib
+import os
+import sys
+from typing import Callable, List, Set, Tuple
+
+import phmdoctest
+
+ENTRY_SUFFIX = ".pass"
+
+
+def environment_text(extra: str) -> str:
+    """The phmdoctest and Python versions and the user's environment text."""
+    return "\n".join([phmdoctest.__version__, sys.version, extra])
+
+
+def result_key(fingerprint: str, environment: str) -> str:
+    """Name of the file recording that the test case passed."""
+    text = environment + "\n" + fingerprint
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def entry_path(results_dir: str, key: str) -> str:
+    """Path of the file recording the pass."""
+    return os.path.join(results_dir, key + ENTRY_SUFFIX)
+
+
+def has_passed(results_dir: str, key: str) -> bool:
+    """True if the pass was recorded."""
+    return os.path.exists(entry_path(results_dir, key))
+
+
+def record_pass(results_dir: str, key: str) -> None:
+    """Record that the test case passed."""
+    os.makedirs(results_dir, exist_ok=True)
+    open(entry_path(results_dir, key), "w").close()
+
+
+def names_to_run(
+    units: List[List[Tuple[str, str]]], passed: Callable[[str], bool]
+) -> Set[str]:
+    """Names of the test cases that need to run.
+
+    units is the _phm_fingerprints table.  A test case runs if its
+    fingerprint has not passed.  The test cases before it in its
+    unit run too since they may create names it uses.
+    """
+    names = set()  # type: Set[str]
+    for unit in units:
+        needed = [
+            i for i, (_, fingerprint) in enumerate(unit) if not passed(fingerprint)
+        ]
+        if needed:
+            names.update(name for name, _ in unit[: needed[-1] + 1])
+    return names
@@ -0,0 +1,548 @@
+"""Line oriented scanner for Markdown fenced code blocks.
+
+The scanner finds fenced code blocks, their info strings, line numbers
+and the HTML comments placed immediately before them without building
+the full commonmark document tree.  It produces Node objects that carry
+the subset of commonmark.node.Node fields read by
+phmdoctest.fenced.FencedBlock and phmdoctest.direct.get_directives().
+
+Only top level blocks are tracked exactly.  Inside block quotes and
+list items the scanner gives up as soon as it sees something that might
+be a fenced code block or an HTML block.  It raises NeedsCommonmark
+and the caller falls back to the commonmark parser.
+"""
+import io
+import re
+from collections import deque
+from typing import Iterable, Iterator, List, Tuple
+from typing import Deque, Optional  # noqa: F401
+
+CODE_INDENT = 4
+MAX_DIRECTIVE_LOOKBEHIND = 100
+"""Same limit as the loop in phmdoctest.direct.get_directives()."""
+
+# These patterns are copied from the commonmark 0.9.1 package module
+# commonmark.blocks.  They are applied to the line after the indentation.
+TAGNAME = "[A-Za-z][A-Za-z0-9-]*"
+ATTRIBUTENAME = "[a-zA-Z_:][a-zA-Z0-9:._-]*"
+UNQUOTEDVALUE = "[^\"'=<>`\\x00-\\x20]+"
+SINGLEQUOTEDVALUE = "'[^']*'"
+DOUBLEQUOTEDVALUE = '"[^"]*"'
+ATTRIBUTEVALUE = (
+    "(?:" + UNQUOTEDVALUE + "|" + SINGLEQUOTEDVALUE + "|" + DOUBLEQUOTEDVALUE + ")"
+)
+ATTRIBUTEVALUESPEC = "(?:" + "\\s*=" + "\\s*" + ATTRIBUTEVALUE + ")"
+ATTRIBUTE = "(?:" + "\\s+" + ATTRIBUTENAME + ATTRIBUTEVALUESPEC + "?)"
+OPENTAG = "<" + TAGNAME + ATTRIBUTE + "*" + "\\s*/?>"
+CLOSETAG = "</" + TAGNAME + "\\s*[>]"
+
+HTML_BLOCK_OPEN = [
+    re.compile(r"."),  # dummy for 0
+    re.compile(r"^<(?:script|pre|style)(?:\s|>|$)", re.IGNORECASE),
+    re.compile(r"^<!--"),
+    re.compile(r"^<[?]"),
+    re.compile(r"^<![A-Z]"),
+    re.compile(r"^<!\[CDATA\["),
+    re.compile(
+        r"^<[/]?(?:address|article|aside|base|basefont|blockquote|body|"
+        r"caption|center|col|colgroup|dd|details|dialog|dir|div|dl|dt|"
+        r"fieldset|figcaption|figure|footer|form|frame|frameset|h1|head|"
+        r"header|hr|html|iframe|legend|li|link|main|menu|menuitem|"
+        r"nav|noframes|ol|optgroup|option|p|param|section|source|title|"
+        r"summary|table|tbody|td|tfoot|th|thead|title|tr|track|ul)"
+        r"(?:\s|[/]?[>]|$)",
+        re.IGNORECASE,
+    ),
+    re.compile("^(?:" + OPENTAG + "|" + CLOSETAG + ")\\s*$", re.IGNORECASE),
+]
+HTML_BLOCK_CLOSE = [
+    re.compile(r"."),  # dummy for 0
+    re.compile(r"<\/(?:script|pre|style)>", re.IGNORECASE),
+    re.compile(r"-->"),
+    re.compile(r"\?>"),
+    re.compile(r">"),
+    re.compile(r"\]\]>"),
+]
+THEMATIC_BREAK = re.compile(
+    r"^(?:(?:\*[ \t]*){3,}|(?:_[ \t]*){3,}|(?:-[ \t]*){3,})[ \t]*$"
+)
+ATX_HEADING = re.compile(r"^#{1,6}(?:[ \t]+|$)")
+CODE_FENCE = re.compile(r"^`{3,}(?!.*`)|^~{3,}")
+CLOSING_CODE_FENCE = re.compile(r"^(?:`{3,}|~{3,})(?= *$)")
+SETEXT_HEADING_LINE = re.compile(r"^(?:=+|-+)[ \t]*$")
+CONTAINER_MARKER = re.compile(r"^(?:>|[*+-](?=[ \t]|$)|\d{1,9}[.)](?=[ \t]|$))")
+LINK_REFERENCE_START = re.compile(r"^\[")
+LINE_ENDING = re.compile(r"\r\n|\r")
+TRAILING_BLANK_LINES = re.compile(r"(\n *)+$")
+
+
+class NeedsCommonmark(Exception):
+    """The Markdown has a construct the scanner does not handle exactly."""
+
+
+class Node:
+    """The commonmark.node.Node fields used by phmdoctest.
+
+    Attributes:
+        t
+            Node type. Either "code_block" or "html_block".
+        info
+            Fenced code block info string.
+        literal
+            Fenced code block contents or HTML block text.
+        sourcepos
+            [[start line, start column], [end line, end column]]
+        is_fenced
+            True for a fenced code block.
+        html_block_type
+            The commonmark HTML block start condition number 1 to 7.
+        prv
+            Adjacent preceding HTML comment Node or None.
+    """
+
+    __slots__ = (
+        "t",
+        "info",
+        "literal",
+        "sourcepos",
+        "is_fenced",
+        "html_block_type",
+        "prv",
+    )
+
+    def __init__(self, t: str, line: int, column: int) -> None:
+        self.t = t
+        self.info = ""
+        self.literal = ""
+        self.sourcepos = [[line, column], [line, 0]]
+        self.is_fenced = t == "code_block"
+        self.html_block_type = 0
+        self.prv = None  # type: Optional[Node]
+
+    def __repr__(self) -> str:
+        return "Node(t={}, line={})".format(self.t, self.sourcepos[0][0])
+
+
+def split_lines(lines: Iterable[str]) -> Iterator[str]:
+    """Remove line endings from lines. Split lines with embedded CR."""
+    for raw in lines:
+        if raw.endswith("\n"):
+            raw = raw[:-1]
+        if raw.endswith("\r"):
+            raw = raw[:-1]
+        if "\r" in raw:
+            for piece in LINE_ENDING.split(raw):
+                yield piece
+        else:
+            yield raw
+
+
+def measure_indent(line: str) -> Tuple[int, int]:
+    """Return index of first non space character and its column."""
+    column = 0
+    index = 0
+    for c in line:
+        if c == " ":
+            column += 1
+        elif c == "\t":
+            column += 4 - (column % 4)
+        else:
+            break
+        index += 1
+    return index, column
+
+
+def container_remainder(line: str) -> str:
+    """Strip leading block quote and list item markers from the line."""
+    rest = line
+    while True:
+        rest = rest.lstrip(" \t")
+        m = CONTAINER_MARKER.match(rest)
+        if not m:
+            return rest
+        rest = rest[m.end() :]
+
+
+def html_block_type(rest: str, in_paragraph: bool) -> int:
+    """Return HTML block start condition number or 0 if none."""
+    if not rest.startswith("<"):
+        return 0
+    for block_type in range(1, 8):
+        if HTML_BLOCK_OPEN[block_type].search(rest):
+            if block_type < 7 or not in_paragraph:
+                return block_type
+            return 0
+    return 0
+
+
+def unescape_info(info: str) -> str:
+    """Apply commonmark backslash escapes and entities to info string."""
+    if "\\" in info or "&" in info:
+        # Rare. Defer to commonmark for the exact rules.
+        from commonmark.common import unescape_string  # type: ignore
+
+        return unescape_string(info)  # type: ignore
+    return info
+
+
+# Block states.
+NONE = 0
+PARAGRAPH = 1
+INDENTED_CODE = 2
+HTML = 3
+FENCE = 4
+CONTAINER = 5
+
+
+class Scanner:
+    """Find fenced code blocks and the HTML comments before them.
+
+    Feed lines to scan_line() in order then call finish().
+    Each returns a list of the fenced code block Nodes completed
+    by that line.
+    """
+
+    def __init__(self) -> None:
+        self.line_number = 0
+        self.state = NONE
+        # Fenced code block or HTML block under construction.
+        self.node = None  # type: Optional[Node]
+        self.parts = []  # type: List[str]
+        self.fence_char = ""
+        self.fence_length = 0
+        self.fence_offset = 0
+        # Paragraph starting with [ might be only link reference definitions.
+        # commonmark removes such paragraphs from the document.
+        self.maybe_references = False
+        # For CONTAINER, was the previous line blank.
+        self.after_blank = False
+        # Adjacent preceding HTML comments.
+        self.comments = deque(maxlen=MAX_DIRECTIVE_LOOKBEHIND)  # type: Deque[Node]
+        self.comments_hidden = False
+
+    def scan_line(self, line: str) -> List[Node]:
+        """Process one line of Markdown. The line has no line ending."""
+        self.line_number += 1
+        if "\0" in line:
+            line = line.replace("\0", "\ufffd")
+        completed = []  # type: List[Node]
+        if self.state == FENCE:
+            self.continue_fence(line, completed)
+        elif self.state == HTML:
+            self.continue_html(line)
+        elif self.state == INDENTED_CODE:
+            index, column = measure_indent(line)
+            if column < CODE_INDENT and index < len(line):
+                self.state = NONE
+                self.start_block(line, completed)
+        elif self.state == PARAGRAPH:
+            self.continue_paragraph(line, completed)
+        elif self.state == CONTAINER:
+            self.continue_container(line, completed)
+        else:
+            self.start_block(line, completed)
+        return completed
+
+    def finish(self) -> List[Node]:
+        """Close any open block at the end of the document."""
+        completed = []  # type: List[Node]
+        if self.state == FENCE:
+            self.close_fence(completed)
+        elif self.state == HTML:
+            self.close_html()
+        self.state = NONE
+        return completed
+
+    def other_block(self) -> None:
+        """A block that is not an HTML comment separates comments from code."""
+        self.comments.clear()
+        self.comments_hidden = False
+
+    def start_block(self, line: str, completed: List[Node]) -> None:
+        """Start a new top level block or skip a blank line."""
+        index, column = measure_indent(line)
+        if index == len(line):
+            return  # blank line
+        if column >= CODE_INDENT:
+            self.other_block()
+            self.state = INDENTED_CODE
+            return
+        if self.try_start_leaf(line, index, column, completed, False):
+            return
+        rest = line[index:]
+        if ATX_HEADING.match(rest) or THEMATIC_BREAK.match(rest):
+            self.other_block()
+            return
+        if CONTAINER_MARKER.match(rest):
+            self.start_container(line)
+            return
+        self.start_paragraph(rest)
+
+    def try_start_leaf(
+        self,
+        line: str,
+        index: int,
+        column: int,
+        completed: List[Node],
+        in_paragraph: bool,
+    ) -> bool:
+        """Start a fenced code block or HTML block if the line opens one."""
+        rest = line[index:]
+        m = CODE_FENCE.match(rest)
+        if m:
+            self.start_fence(line, index, column, len(m.group()))
+            return True
+        block_type = html_block_type(rest, in_paragraph)
+        if block_type:
+            self.start_html(line, index, block_type)
+            return True
+        return False
+
+    def start_fence(self, line: str, index: int, column: int, length: int) -> None:
+        """Open a fenced code block."""
+        if self.comments_hidden:
+            # The comments might be adjacent once commonmark removes
+            # the link reference definitions.
+            raise NeedsCommonmark("link reference definitions before code block")
+        node = Node("code_block", self.line_number, column + 1)
+        node.info = unescape_info(line[index + length :].strip())
+        if self.comments:
+            node.prv = self.comments[-1]
+        self.node = node
+        self.parts = []
+        self.fence_char = line[index]
+        self.fence_length = length
+        self.fence_offset = column
+        self.state = FENCE
+        # The fenced code block is not an HTML comment.
+        self.other_block()
+
+    def continue_fence(self, line: str, completed: List[Node]) -> None:
+        """Add a line to the open fenced code block or close it."""
+        index, column = measure_indent(line)
+        if column <= 3 and index < len(line) and line[index] == self.fence_char:
+            m = CLOSING_CODE_FENCE.match(line[index:])
+            if m and len(m.group()) >= self.fence_length:
+                self.close_fence(completed)
+                self.state = NONE
+                return
+        if self.fence_offset:
+            # Remove up to fence_offset spaces of indentation.
+            strip = 0
+            while strip < self.fence_offset and strip < len(line):
+                c = line[strip]
+                if c == "\t":
+                    raise NeedsCommonmark("tab indented line in indented fence")
+                if c != " ":
+                    break
+                strip += 1
+            line = line[strip:]
+        self.parts.append(line)
+        self.parts.append("\n")
+
+    def close_fence(self, completed: List[Node]) -> None:
+        """Finish the fenced code block."""
+        assert self.node is not None, "must have an open fence"
+        self.node.literal = "".join(self.parts)
+        self.node.sourcepos[1][0] = self.line_number
+        completed.append(self.node)
+        self.node = None
+        self.parts = []
+
+    def start_html(self, line: str, index: int, block_type: int) -> None:
+        """Open an HTML block. The indentation is part of the block."""
+        node = Node("html_block", self.line_number, index + 1)
+        node.html_block_type = block_type
+        self.node = node
+        self.parts = []
+        self.state = HTML
+        self.continue_html(line)
+
+    def continue_html(self, line: str) -> None:
+        """Add a line to the open HTML block or close it."""
+        assert self.node is not None, "must have an open HTML block"
+        block_type = self.node.html_block_type
+        if block_type >= 6:
+            index, _ = measure_indent(line)
+            if index == len(line):
+                self.close_html()
+                self.state = NONE
+                return
+        self.parts.append(line)
+        self.parts.append("\n")
+        if block_type <= 5 and HTML_BLOCK_CLOSE[block_type].search(line):
+            self.close_html()
+            self.state = NONE
+
+    def close_html(self) -> None:
+        """Finish the HTML block. Keep it if it is an HTML comment."""
+        assert self.node is not None, "must have an open HTML block"
+        node = self.node
+        node.literal = TRAILING_BLANK_LINES.sub("", "".join(self.parts))
+        node.sourcepos[1][0] = self.line_number
+        self.node = None
+        self.parts = []
+        if node.html_block_type == 2:
+            if self.comments:
+                node.prv = self.comments[-1]
+            self.comments.append(node)
+            # Comments beyond the look behind limit are never examined.
+            self.comments[0].prv = None
+        else:
+            self.other_block()
+
+    def start_paragraph(self, rest: str) -> None:
+        """Start a paragraph."""
+        self.maybe_references = LINK_REFERENCE_START.match(rest) is not None
+        if not self.maybe_references:
+            self.other_block()
+        self.state = PARAGRAPH
+
+    def end_paragraph(self) -> None:
+        """The paragraph ended."""
+        if self.maybe_references:
+            # Keep the comments. Only a following fence needs to know.
+            self.comments_hidden = bool(self.comments)
+        else:
+            self.other_block()
+        self.state = NONE
+
+    def continue_paragraph(self, line: str, completed: List[Node]) -> None:
+        """Continue the paragraph unless the line interrupts it."""
+        index, column = measure_indent(line)
+        if index == len(line):
+            self.end_paragraph()
+            return
+        if column >= CODE_INDENT:
+            return  # paragraph continuation text
+        rest = line[index:]
+        if CODE_FENCE.match(rest) or html_block_type(rest, True):
+            self.end_paragraph()
+            self.try_start_leaf(line, index, column, completed, False)
+        elif SETEXT_HEADING_LINE.match(rest):
+            if self.maybe_references:
+                # commonmark does not make a heading from a paragraph
+                # of only link reference definitions.
+                raise NeedsCommonmark(
+                    "setext heading line at line {}".format(self.line_number)
+                )
+            self.end_paragraph()
+        elif THEMATIC_BREAK.match(rest):
+            self.maybe_references = False
+            self.end_paragraph()
+        elif ATX_HEADING.match(rest):
+            self.maybe_references = False
+            self.end_paragraph()
+        elif CONTAINER_MARKER.match(rest):
+            # Some list items can't interrupt a paragraph. Treating them
+            # as a container is safe since container contents are not
+            # tracked.
+            self.maybe_references = False
+            self.end_paragraph()
+            self.start_container(line)
+
+    def start_container(self, line: str) -> None:
+        """Block quote or list item. The contents are not tracked."""
+        self.other_block()
+        self.check_container_line(line)
+        self.state = CONTAINER
+        self.after_blank = False
+
+    def check_container_line(self, line: str) -> None:
+        """Give up if the line might start a block inside the container."""
+        rest = container_remainder(line)
+        if CODE_FENCE.match(rest):
+            raise NeedsCommonmark(
+                "fenced code block in a container at line {}".format(self.line_number)
+            )
+
+    def continue_container(self, line: str, completed: List[Node]) -> None:
+        """Find the end of a block quote or list."""
+        index, column = measure_indent(line)
+        if index == len(line):
+            self.after_blank = True
+            return
+        rest = line[index:]
+        if column == 0 and not CONTAINER_MARKER.match(rest):
+            # The line is not part of a list item.
+            # Block starts end the container.
+            if CODE_FENCE.match(rest):
+                self.state = NONE
+                self.start_block(line, completed)
+                return
+            block_type = html_block_type(rest, False)
+            if block_type == 7:
+                raise NeedsCommonmark(
+                    "HTML block after a container at line {}".format(self.line_number)
+                )
+            if block_type:
+                self.state = NONE
+                self.start_block(line, completed)
+                return
+            if ATX_HEADING.match(rest) or THEMATIC_BREAK.match(rest):
+                self.state = NONE
+                self.start_block(line, completed)
+                return
+            if self.after_blank:
+                self.state = NONE
+                self.start_block(line, completed)
+                return
+            # Lazy continuation line.
+            return
+        # The line may belong to a list item or block quote.
+        if column == 0:
+            self.check_container_line(line)
+        else:
+            stripped = container_remainder(line)
+            if stripped.startswith("<") or CODE_FENCE.match(stripped):
+                raise NeedsCommonmark(
+                    "indented block after a container at line {}".format(
+                        self.line_number
+                    )
+                )
+        self.after_blank = False
+
+
+def scan(lines: Iterable[str]) -> Iterator[Node]:
+    """Generate fenced code block Nodes from lines of Markdown.
+
+    Raises NeedsCommonmark if the Markdown needs the commonmark parser.
+
+    Args:
+        lines
+            Iterable of lines of Markdown. Usually the file object
+            returned by open().
+
+    Returns:
+        Iterator of Node objects, one for each fenced code block.
+    """
+    scanner = Scanner()
+    for line in split_lines(lines):
+        for node in scanner.scan_line(line):
+            yield node
+    for node in scanner.finish():
+        yield node
+
+
+def fenced_block_nodes(fp: Iterable[str]) -> List[Node]:
+    """Get Markdown fenced code blocks as a list of Node objects.
+
+    The fast line oriented scanner is tried first.  If the Markdown has
+    constructs that it does not handle exactly, the commonmark
+    parser is used instead.
+
+    Args:
+        fp
+            file object returned by open().
+
+    Returns:
+        List of scanner.Node or commonmark.node.Node objects.
+    """
+    doc = "".join(fp)
+    try:
+        return list(scan(io.StringIO(doc)))
+    except NeedsCommonmark:
+        # import here so commonmark is only loaded when needed
+        import phmdoctest.tool
+
+        return phmdoctest.tool.fenced_block_nodes(io.StringIO(doc))
@@ -0,0 +1,167 @@
+"""Long lived server that runs phmdoctest commands sent by phmdoctest.client.
+
+The server keeps phmdoctest, click, commonmark, monotable,
+and pytest imported so requests don't pay for Python startup.
+It listens on a Unix domain socket and handles one request at a
+time since the commands change the working directory and sys.stdout.
+
+Requests and replies are the messages described in phmdoctest.client.
+Requests may have "env", the client's environment variables that
+start with PHMDOCTEST_.  They replace the server's PHMDOCTEST_
+variables while the request runs.
+The key "op" selects the request:
+
+- "run" runs phmdoctest with the command line "args" in the directory
+  "cwd".  "input" is the standard input.  The reply has exit_code,
+  stdout, and stderr.
+- "test" calls phmdoctest.simulator.run_and_pytest() with "command",
+  "pytest_options", and "junit_family" in the directory "cwd".
+  pytest runs in the server process.  The reply has exit_code,
+  stdout, outfile, pytest_exit_code, pytest_output, and junit_xml.
+- "stop" replies with an empty object and exits the server.
+
+An invalid request gets a reply with the key "error".
+"""
+import contextlib
+import io
+import os
+import socket
+import socketserver
+from typing import Any, Dict
+
+import click
+
+import phmdoctest.client
+import phmdoctest.main
+import phmdoctest.simulator
+
+
+def run_command(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Do a "run" request."""
+    runner = phmdoctest.simulator.cli_runner()
+    result = runner.invoke(
+        cli=phmdoctest.main.entry_point,
+        args=list(message["args"]),
+        input=message.get("input"),
+        prog_name="phmdoctest",
+    )
+    return {
+        "exit_code": result.exit_code,
+        "stdout": result.stdout,
+        "stderr": result.stderr,
+    }
+
+
+def run_and_pytest_command(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Do a "test" request."""
+    pytest_output = io.StringIO()
+    with contextlib.redirect_stdout(pytest_output):
+        status = phmdoctest.simulator.run_and_pytest(
+            message["command"],
+            pytest_options=message.get("pytest_options"),
+            junit_family=message.get("junit_family"),
+            in_process=True,
+        )
+    return {
+        "exit_code": status.runner_status.exit_code,
+        "stdout": status.runner_status.stdout,
+        "outfile": status.outfile,
+        "pytest_exit_code": status.pytest_exit_code,
+        "pytest_output": pytest_output.getvalue(),
+        "junit_xml": status.junit_xml,
+    }
+
+
+HANDLERS = {"run": run_command, "test": run_and_pytest_command}
+
+
+def reply_to(message: Dict[str, Any]) -> Dict[str, Any]:
+    """Do the request in the directory message["cwd"]. Return the reply."""
+    handler = HANDLERS.get(message.get("op", ""))
+    if handler is None:
+        return {"error": "unknown op {!r}".format(message.get("op"))}
+    saved_cwd = os.getcwd()
+    saved_environ = dict(os.environ)
+    try:
+        if "env" in message:
+            for name in list(os.environ):
+                if name.startswith(phmdoctest.client.ENV_PREFIX):
+                    del os.environ[name]
+            os.environ.update(message["env"])
+        os.chdir(message.get("cwd", saved_cwd))
+        return handler(message)
+    except Exception as exc:
+        return {"error": "{}: {}".format(type(exc).__name__, exc)}
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+    """Reply to the requests on a connection until the client closes it."""
+
+    def handle(self) -> None:
+        while True:
+            message = phmdoctest.client.receive_message(self.request)
+            if message is None:
+                return
+            if message.get("op") == "stop":
+                self.server.stopping = True  # type: ignore
+                phmdoctest.client.send_message(self.request, {})
+                return
+            phmdoctest.client.send_message(self.request, reply_to(message))
+
+
+def is_listening(socket_path: str) -> bool:
+    """True if a server accepts connections on socket_path."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            return False
+    return True
+
+
+def serve(socket_path: str) -> None:
+    """Handle requests on the Unix domain socket until a stop request.
+
+    A socket file left by a server that is no longer running is replaced.
+    The socket file is removed when the server exits.
+    """
+    if not hasattr(socket, "AF_UNIX"):
+        raise click.ClickException("phmdoctest-server needs Unix domain sockets.")
+    if os.path.exists(socket_path):
+        if is_listening(socket_path):
+            raise click.ClickException(
+                "A server is already listening on {}.".format(socket_path)
+            )
+        os.remove(socket_path)
+    server = socketserver.UnixStreamServer(socket_path, RequestHandler)
+    server.stopping = False  # type: ignore
+    try:
+        while not server.stopping:  # type: ignore
+            server.handle_request()
+    finally:
+        server.server_close()
+        os.remove(socket_path)
+
+
+@click.command()
+@click.argument("socket_path", metavar="SOCKET", type=click.Path(dir_okay=False))
+@click.version_option()  # type: ignore
+# Note- docstring for entry point shows up in click's usage text.
+def server_entry_point(socket_path):
+    """Run phmdoctest commands sent to the Unix domain socket SOCKET.
+
+    Send commands with python -m phmdoctest.client SOCKET [ARGS]...
+    The server keeps phmdoctest and pytest imported so each
+    command starts fast.  Stop the server with Ctrl-C or a
+    stop request from phmdoctest.client.stop().
+    """
+    import pytest  # noqa: F401 imported so the first test request is fast.
+
+    try:
+        serve(socket_path)
+    except KeyboardInterrupt:
+        pass
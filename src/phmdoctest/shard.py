@@ -0,0 +1,87 @@
+"""Partition the code and session blocks into balanced shards.
+
+Blocks that depend on each other as found by
+phmdoctest.chains.dependency_units() are kept in the same shard.
+Every shard gets the setup and teardown fixture.
+"""
+import re
+from typing import List, Optional, Set, Tuple
+
+import click
+
+from phmdoctest.entryargs import Args
+from phmdoctest.fenced import Role, FencedBlock
+import phmdoctest.analysis
+import phmdoctest.cases
+import phmdoctest.chains
+
+
+def parse_shard(
+    ctx: click.Context, param: click.Parameter, value: Optional[str]
+) -> Optional[Tuple[int, int]]:
+    """Click callback to convert INDEX/COUNT to a tuple of ints."""
+    if value is None:
+        return None
+    m = re.match(r"^(\d+)/(\d+)$", value)
+    if m:
+        index, count = int(m.group(1)), int(m.group(2))
+        if 1 <= index <= count:
+            return index, count
+    raise click.BadParameter(
+        "must be INDEX/COUNT with 1 <= INDEX <= COUNT, for example 2/4."
+    )
+
+
+def block_weight(block: FencedBlock) -> int:
+    """Estimate of the time to test the block from its number of lines."""
+    weight = block.contents.count("\n") + 1
+    if block.output is not None:
+        weight += block.output.contents.count("\n")
+    return weight
+
+
+def partition(units: List[List[FencedBlock]], count: int) -> List[Set[FencedBlock]]:
+    """Assign the units to count shards balancing the total weight.
+
+    The heaviest unit goes to the lightest shard first.
+    Ties go to the earlier unit and the lower numbered shard so the
+    result only depends on the blocks.
+    """
+    weights = [sum(block_weight(block) for block in unit) for unit in units]
+    order = sorted(range(len(units)), key=lambda i: (-weights[i], i))
+    loads = [0] * count
+    shards = [set() for _ in range(count)]  # type: List[Set[FencedBlock]]
+    for i in order:
+        lightest = loads.index(min(loads))
+        loads[lightest] += weights[i]
+        shards[lightest].update(units[i])
+    return shards
+
+
+def build_test_cases(
+    args: Args,
+    blocks: List[FencedBlock],
+    analysis: Optional[phmdoctest.analysis.Analysis] = None,
+) -> str:
+    """Generate the test file for shard args.shard of the blocks.
+
+    Test function names are the same as in the test file for
+    all the blocks.
+    """
+    assert args.shard is not None, "need the shard INDEX/COUNT"
+    index, count = args.shard
+    if analysis is None:
+        analysis = phmdoctest.analysis.analyze(blocks)
+    analysis.raise_directive_error()
+    units = phmdoctest.chains.dependency_units(blocks, args.setup_doctest)
+    selected = partition(units, count)[index - 1]
+    kept = [
+        b for b in blocks if b.role not in (Role.CODE, Role.SESSION) or b in selected
+    ]
+    if not selected and analysis.number_of_test_cases():
+        # The Markdown file has code, just not in this shard.
+        args = args._replace(fail_nocode=False)
+    shard_analysis = phmdoctest.analysis.analyze(kept)
+    return phmdoctest.cases.build_test_cases(
+        args, blocks, shard_analysis, only=selected
+    )
@@ -7,12 +7,17 @@ temporary directory.
 Optionally run pytest on the temporary file.
 """
 
+import concurrent.futures
+import functools
+import inspect
+import os
 from pathlib import Path
 import re
 import subprocess
 import sys
 from tempfile import TemporaryDirectory
-from typing import List, Optional, NamedTuple
+from typing import Any, Iterable, List, Optional, NamedTuple
+from typing import Dict  # noqa: F401
 
 import click.testing
 
@@ -30,11 +35,82 @@ SimulatorStatus = NamedTuple(
 )
 """run_and_pytest() return value."""
 
+DISABLE_PLUGIN_AUTOLOAD = "PYTEST_DISABLE_PLUGIN_AUTOLOAD"
+"""Environment variable that stops pytest loading plugins from entry points."""
+
+
+def cli_runner() -> click.testing.CliRunner:
+    """CliRunner whose results have stderr separate from stdout.
+
+    click 8.2 removed the mix_stderr argument and always keeps them apart.
+    """
+    kwargs = {}  # type: Dict[str, Any]
+    if "mix_stderr" in inspect.signature(click.testing.CliRunner).parameters:
+        kwargs["mix_stderr"] = False
+    return click.testing.CliRunner(**kwargs)
+
+
+def pytest_paths(args: List[str]) -> List[str]:
+    """Absolute paths of the files and directories in the pytest args."""
+    paths = []
+    for arg in args:
+        path = arg.split("::")[0]
+        if not arg.startswith("-") and os.path.exists(path):
+            paths.append(os.path.abspath(path))
+    return paths
+
+
+def is_test_module(module: Any, paths: List[str]) -> bool:
+    """True if the module is a test file in paths or a package of one."""
+    module_file = getattr(module, "__file__", None)
+    if not module_file:
+        return False
+    module_file = os.path.abspath(module_file)
+    if os.path.basename(module_file) == "__init__.py":
+        package = os.path.dirname(module_file)
+        return any(p == package or p.startswith(package + os.sep) for p in paths)
+    return any(module_file == p or module_file.startswith(p + os.sep) for p in paths)
+
+
+def run_pytest_in_process(args: List[str], module_name: str = "") -> int:
+    """Call pytest.main() and return the exit code.
+
+    The test modules imported from the files and directories in args
+    and their packages are removed from sys.modules afterwards and
+    sys.path is restored.  A module called module_name is hidden
+    during the run so the test file is imported instead.
+    pytest's cache plugin and plugin autoloading are disabled.
+    Load plugins with -p in args.
+    """
+    import pytest
+
+    saved_modules = dict(sys.modules)
+    saved_path = list(sys.path)
+    saved_autoload = os.environ.get(DISABLE_PLUGIN_AUTOLOAD)
+    os.environ[DISABLE_PLUGIN_AUTOLOAD] = "1"
+    if module_name:
+        sys.modules.pop(module_name, None)
+    try:
+        exit_code = pytest.main(["-p", "no:cacheprovider"] + args)
+    finally:
+        if saved_autoload is None:
+            del os.environ[DISABLE_PLUGIN_AUTOLOAD]
+        else:
+            os.environ[DISABLE_PLUGIN_AUTOLOAD] = saved_autoload
+        paths = pytest_paths(args)
+        for name, module in list(sys.modules.items()):
+            if name not in saved_modules and is_test_module(module, paths):
+                del sys.modules[name]
+        sys.modules.update(saved_modules)
+        sys.path[:] = saved_path
+    return int(exit_code)
+
 
 def run_and_pytest(
     well_formed_command: str,
     pytest_options: Optional[List[str]] = None,
     junit_family: Optional[str] = None,
+    in_process: bool = False,
 ) -> SimulatorStatus:
     """
     Simulate a phmdoctest command, optionally run pytest.
@@ -44,7 +120,8 @@ def run_and_pytest(
     path to a temporary directory and a synthesized filename.
 
     To run pytest on an ``--outfile``, pass a list of zero or
-    more pytest_options.  pytest is run in a subprocess.
+    more pytest_options.  pytest is run in a subprocess unless
+    in_process is True.
 
     The PYPI package pytest must be installed separately
     since pytest is not required to install phmdoctest.
@@ -55,6 +132,7 @@ def run_and_pytest(
 
     If an outfile is streamed to stdout a copy of it
     is found in simulator_status.runner_status.stdout.
+    Error messages are in simulator_status.runner_status.stderr.
 
     If calling run_and_pytest() from a pytest file, try adding the
     pytest option ``--capture=tee-sys`` to the command running
@@ -89,6 +167,14 @@ def run_and_pytest(
             Pytest configuration option of the same name.
             Set to None or the empty string to skip XML generation.
 
+        in_process
+            Run pytest by calling pytest.main() in this process
+            instead of starting a Python interpreter.  Saves the
+            interpreter startup time.  Modules imported by the
+            test file are removed from sys.modules afterwards.
+            Since pytest.main() is not thread safe, do not call from
+            more than one thread at a time.
+
     Returns:
         SimulatorStatus containing runner_status, outfile,
         pytest_exit_code, and generated JUnit XML.
@@ -107,7 +193,7 @@ def run_and_pytest(
         "--outfile=-"
     )
     no_outfile = "--outfile" not in command1
-    runner = click.testing.CliRunner()
+    runner = cli_runner()
     if wants_help or wants_version or stream_outfile or no_outfile:
         return SimulatorStatus(
             runner_status=runner.invoke(cli=entry_point, args=command1),
@@ -184,14 +270,19 @@ def run_and_pytest(
                 junit_xml="",
             )
         else:
-            commandline = [sys.executable, "-m", "pytest"] + pytest_options
+            pytest_args = list(pytest_options)
             if junit_family:
                 junit_name = outfile_name.replace(".py", ".xml")
                 junit_path = Path(tmpdir) / junit_name
-                commandline.append("--junitxml=" + str(junit_path))
-                commandline.append("-o junit_family=" + junit_family)
-            commandline.append(tmpdir)
-            completed = subprocess.run(commandline)
+                pytest_args.append("--junitxml=" + str(junit_path))
+                pytest_args.extend(["-o", "junit_family=" + junit_family])
+            pytest_args.append(tmpdir)
+            if in_process:
+                module_name = outfile_name.replace(".py", "")
+                pytest_exit_code = run_pytest_in_process(pytest_args, module_name)
+            else:
+                commandline = [sys.executable, "-m", "pytest"] + pytest_args
+                pytest_exit_code = subprocess.run(commandline).returncode
 
             xml = ""
             if junit_family:
@@ -201,6 +292,58 @@ def run_and_pytest(
             return SimulatorStatus(
                 runner_status=runner_status,
                 outfile=outfile_text,
-                pytest_exit_code=completed.returncode,
+                pytest_exit_code=pytest_exit_code,
                 junit_xml=xml,
             )
+
+
+def _run_in_worker(
+    well_formed_command: str,
+    pytest_options: Optional[List[str]],
+    junit_family: Optional[str],
+    in_process: bool,
+) -> SimulatorStatus:
+    """Call run_and_pytest() in a worker process of run_many()."""
+    status = run_and_pytest(
+        well_formed_command,
+        pytest_options=pytest_options,
+        junit_family=junit_family,
+        in_process=in_process,
+    )
+    # The traceback can't be sent back to the parent process.
+    status.runner_status.exc_info = None
+    return status
+
+
+def run_many(
+    commands: Iterable[str],
+    pytest_options: Optional[List[str]] = None,
+    junit_family: Optional[str] = None,
+    in_process: bool = False,
+    workers: int = 1,
+) -> List[SimulatorStatus]:
+    """
+    Call run_and_pytest() for each command. Can run concurrently.
+
+    The arguments after commands are passed to each
+    run_and_pytest() call.  With workers greater than 1 the commands
+    run in that many worker processes.  Each worker process
+    runs many commands so in_process=True saves starting a Python
+    interpreter for each command.  In a worker process
+    SimulatorStatus.runner_status.exc_info is set to None.
+
+    Returns:
+        List of SimulatorStatus in the same order as commands.
+    """
+    if workers < 1:
+        raise ValueError("phmdoctest- workers must be 1 or more")
+    run = functools.partial(
+        _run_in_worker if workers > 1 else run_and_pytest,
+        pytest_options=pytest_options,
+        junit_family=junit_family,
+        in_process=in_process,
+    )
+    if workers == 1:
+        return [run(command) for command in commands]
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run, commands))
@@ -0,0 +1,57 @@
+"""Stamp the test file with hashes of the inputs that generated it.
+
+With --stamp the first line of the test file is a comment like this:
+
+``# phmdoctest-stamp version=1.2.1 markdown=<sha256> options=<sha256>``
+
+markdown is the SHA-256 of the Markdown file bytes and options is the
+SHA-256 of the options that change the test file.
+--check compares the stamp to the current inputs without parsing
+the Markdown file.
+"""
+from typing import Optional
+
+import click
+
+import phmdoctest
+from phmdoctest.entryargs import Args
+import phmdoctest.cache
+
+STAMP_PREFIX = "# phmdoctest-stamp "
+
+
+def stamp_line(args: Args) -> str:
+    """Generate the stamp comment line for the test file."""
+    return "{}version={} markdown={} options={}\n".format(
+        STAMP_PREFIX,
+        phmdoctest.__version__,
+        phmdoctest.cache.file_digest(args.markdown_file),
+        phmdoctest.cache.options_digest(args),
+    )
+
+
+def read_stamp(path: str) -> Optional[str]:
+    """Return the stamp line of the test file or None if not stamped."""
+    try:
+        with open(path, "r", encoding="utf-8") as fp:
+            line = fp.readline()
+    except OSError:
+        return None
+    if line.startswith(STAMP_PREFIX):
+        return line
+    return None
+
+
+def check(args: Args) -> None:
+    """Raise an exception if --outfile was not generated from the inputs."""
+    if args.markdown_file == "-" or not args.outfile or args.outfile == "-":
+        raise click.ClickException(
+            "--check needs a MARKDOWN_FILE path and an --outfile path."
+        )
+    found = read_stamp(args.outfile)
+    if found is None:
+        message = "{} has no phmdoctest-stamp. Generate it with --stamp."
+        raise click.ClickException(message.format(args.outfile))
+    if found != stamp_line(args._replace(stamp=True)):
+        message = "{} is out of date. Generate it again from {}."
+        raise click.ClickException(message.format(args.outfile, args.markdown_file))
@@ -0,0 +1,308 @@
+"""Generate the test file while reading the Markdown file.
+
+Fenced code blocks are processed as the scanner finds them. Roles are
+assigned looking behind at most one block, so memory use depends on the
+size of the largest block rather than the size of the Markdown file.
+With --report every block is kept until the report is printed.
+
+Test functions are written to a temporary file as each block gets
+its final role.  The import lines and fixtures at the top of the test
+file depend on the whole Markdown file.  They are written to --outfile
+followed by a copy of the temporary file.
+"""
+import itertools
+import shutil
+import tempfile
+from typing import IO, Callable, Iterable, Iterator, List, Optional, Tuple
+from typing import Set  # noqa: F401
+
+import click
+
+from phmdoctest.direct import Marker
+from phmdoctest.entryargs import Args
+from phmdoctest.fenced import Role, FencedBlock
+from phmdoctest.matcher import SkipMatcher
+import phmdoctest.analysis
+import phmdoctest.cases
+import phmdoctest.fillrole
+import phmdoctest.report
+import phmdoctest.scanner
+import phmdoctest.timings
+
+SPOOL_MAX_SIZE = 1024 * 1024
+"""Generated test functions are kept in memory up to this many characters."""
+
+
+def fenced_blocks(lines: Iterable[str]) -> Iterator[FencedBlock]:
+    """Generate FencedBlock objects as the scanner finds them.
+
+    Raises phmdoctest.scanner.NeedsCommonmark if the Markdown
+    needs the commonmark parser.
+    """
+    for node in phmdoctest.scanner.scan(lines):
+        yield FencedBlock(node)
+
+
+def paired_blocks(blocks: Iterable[FencedBlock]) -> Iterator[FencedBlock]:
+    """Identify code, output, and session blocks. Delete empty blocks.
+
+    A block is generated once the next block shows if it is its output.
+    """
+    previous_block = None
+    for block in blocks:
+        phmdoctest.fillrole.identify_code_session_block(block)
+        if previous_block is not None:
+            phmdoctest.fillrole.identify_output_block(previous_block, block)
+            phmdoctest.fillrole.del_problem_block(previous_block)
+            yield previous_block
+        previous_block = block
+    if previous_block is not None:
+        phmdoctest.fillrole.del_problem_block(previous_block)
+        yield previous_block
+
+
+def positioned_blocks(
+    blocks: Iterable[FencedBlock],
+) -> Iterator[Tuple[FencedBlock, int, bool]]:
+    """Generate code and session blocks with index and is last flag.
+
+    The index and is last flag are used to match the FIRST,
+    SECOND, LAST command line TEXT values.
+    """
+    held = None  # type: Optional[FencedBlock]
+    index = 0
+    for block in blocks:
+        if block.role in [Role.CODE, Role.SESSION]:
+            if held is not None:
+                yield held, index, False
+                index += 1
+            held = block
+    if held is not None:
+        yield held, index, True
+
+
+class Designation:
+    """Find the setup or teardown block one block at a time.
+
+    The first block found is designated right away.  If more blocks
+    are found finish() raises the same exception as
+    phmdoctest.fillrole.find_and_designate_setup() or
+    find_and_designate_teardown().
+    """
+
+    def __init__(
+        self,
+        pattern: Optional[str],
+        marker: Marker,
+        command_line_option_name: str,
+        name: str,
+        designate: Callable[
+            [Optional[str], Optional[FencedBlock], Optional[FencedBlock]], None
+        ],
+    ) -> None:
+        self.pattern = pattern
+        self.marker = marker
+        self.command_line_option_name = command_line_option_name
+        self.name = name
+        self.designate = designate
+        self.matches = []  # type: List[FencedBlock]
+        self.marked = []  # type: List[FencedBlock]
+        self.block = None  # type: Optional[FencedBlock]
+
+    def check(self, block: FencedBlock, index: int, is_last: bool) -> None:
+        """Designate the block if it is the first one found."""
+        found = not self.matches and not self.marked
+        match = None
+        if self.pattern is not None:
+            if phmdoctest.fillrole.is_match(self.pattern, block, index, is_last):
+                match = block
+                self.matches.append(block)
+        marked = None
+        for directive in block.directives:
+            if directive.type == self.marker:
+                marked = block
+                self.marked.append(block)
+        if found and (match or marked):
+            self.block = block
+            self.designate(self.pattern, match, marked)
+
+    def finish(self) -> None:
+        """Raise an exception if more than one block was found."""
+        match = phmdoctest.fillrole.only_one_match(
+            self.matches, self.command_line_option_name
+        )
+        marked = phmdoctest.fillrole.only_one_marked(self.marked, self.marker)
+        if match is not None and marked is not None:
+            phmdoctest.fillrole.check_for_error(match, marked, self.name)
+
+    def designated_block(self, role: Role) -> Optional[FencedBlock]:
+        """Return the block if it was designated with role."""
+        if self.block is not None and self.block.role == role:
+            return self.block
+        return None
+
+
+class RoleAssigner:
+    """Assign roles to blocks as they are found in the Markdown file."""
+
+    def __init__(self, args: Args) -> None:
+        self.args = args
+        self.skips = SkipMatcher(args.skips)
+        self.setup = Designation(
+            args.setup,
+            Marker.SETUP,
+            "--setup or -u",
+            "setup",
+            phmdoctest.fillrole.designate_setup,
+        )
+        self.teardown = Designation(
+            args.teardown,
+            Marker.TEARDOWN,
+            "--teardown or -d",
+            "teardown",
+            phmdoctest.fillrole.designate_teardown,
+        )
+
+    def assign(self, blocks: Iterable[FencedBlock]) -> Iterator[FencedBlock]:
+        """Generate code and session blocks once their roles are final."""
+        for block, index, is_last in positioned_blocks(paired_blocks(blocks)):
+            for pattern in self.skips.matches(block, index, is_last):
+                block.skip(pattern)
+            phmdoctest.fillrole.apply_skip_directives(block)
+            self.setup.check(block, index, is_last)
+            self.teardown.check(block, index, is_last)
+            yield block
+
+    def finish(self) -> None:
+        """Raise an exception if more than one setup or teardown block."""
+        self.setup.finish()
+        self.teardown.finish()
+
+
+class TestFileWriter:
+    """Write test functions to a file as blocks get their final role.
+
+    Only code and session blocks are added.  The analysis has the facts
+    needed for the top of the test file.
+    Exceptions raised while generating a test function are held until
+    all the blocks are processed.  This keeps the same exception
+    precedence as phmdoctest.cases.build_test_cases().
+    """
+
+    def __init__(
+        self,
+        writer: IO[str],
+        stream_output: bool,
+        compact: bool = False,
+        timeout: Optional[float] = None,
+        measure: bool = False,
+    ) -> None:
+        self.writer = writer
+        self.stream_output = stream_output
+        self.compact = compact
+        self.timeout = timeout
+        self.measure = measure
+        self.analysis = phmdoctest.analysis.Analysis()
+        self.used_names = set()  # type: Set[str]
+        self.session_counter = itertools.count(1)
+        self.error = None  # type: Optional[click.ClickException]
+
+    def add(self, block: FencedBlock) -> None:
+        """Write the test function for the code or session block."""
+        self.analysis.add(block)
+        if block.role not in (Role.CODE, Role.SESSION):
+            return
+        if self.analysis.directive_error is not None or self.error is not None:
+            return
+        try:
+            text = phmdoctest.cases.block_test_code(
+                block,
+                self.analysis,
+                self.session_counter,
+                self.used_names,
+                self.stream_output,
+                self.compact,
+                timeout=self.timeout,
+                measure=self.measure,
+            )
+        except click.ClickException as exc:
+            self.error = exc
+            return
+        self.writer.write(text)
+
+    def raise_error(self) -> None:
+        """Raise an exception held while generating test functions."""
+        self.analysis.raise_directive_error()
+        if self.error is not None:
+            raise self.error
+
+
+def write_test_cases(args: Args, lines: Iterable[str]) -> None:
+    """Print the report and write --outfile from lines of Markdown.
+
+    Raises phmdoctest.scanner.NeedsCommonmark if the Markdown
+    needs the commonmark parser.  Nothing is printed or written
+    when the exception is raised.
+
+    Args:
+        args
+            Command line arguments.
+
+        lines
+            Iterable of lines of Markdown. Usually the file object
+            returned by open().
+    """
+    report_blocks = []  # type: List[FencedBlock]
+    blocks = phmdoctest.timings.timed(fenced_blocks(lines), "scanner.scan")
+    if args.is_report:
+        blocks = keep_blocks(blocks, report_blocks)
+    roles = RoleAssigner(args)
+    with tempfile.SpooledTemporaryFile(
+        max_size=SPOOL_MAX_SIZE, mode="w+", encoding="utf-8"
+    ) as spool:
+        test_file = TestFileWriter(
+            spool, args.stream_output, args.compact, args.timeout, args.measure
+        )
+        for block in phmdoctest.timings.timed(roles.assign(blocks), "fillrole.assign"):
+            if args.outfile:
+                with phmdoctest.timings.stage("cases.block", line=block.line):
+                    test_file.add(block)
+        roles.finish()
+
+        if args.is_report:
+            with phmdoctest.timings.stage("report.print_report"):
+                phmdoctest.report.print_report(args, report_blocks)
+
+        if args.outfile:
+            test_file.raise_error()
+            spool.seek(0)
+            with phmdoctest.timings.stage("write outfile"):
+                with click.open_file(args.outfile, "w", encoding="utf-8") as ofp:
+                    write_test_file(args, roles, test_file, spool, ofp)
+
+
+def keep_blocks(
+    blocks: Iterable[FencedBlock], kept: List[FencedBlock]
+) -> Iterator[FencedBlock]:
+    """Append each block to kept as it passes through."""
+    for block in blocks:
+        kept.append(block)
+        yield block
+
+
+def write_test_file(
+    args: Args,
+    roles: RoleAssigner,
+    test_file: TestFileWriter,
+    test_functions: IO[str],
+    ofp: IO[str],
+) -> None:
+    """Write the top of the test file then copy the test functions."""
+    setup_block = roles.setup.designated_block(Role.SETUP)
+    teardown_block = roles.teardown.designated_block(Role.TEARDOWN)
+    analysis = test_file.analysis
+    ofp.write(
+        phmdoctest.cases.top_of_test_file(args, analysis, setup_block, teardown_block)
+    )
+    shutil.copyfileobj(test_functions, ofp)
+    ofp.write(phmdoctest.cases.bottom_of_test_file(args, analysis))
@@ -0,0 +1,115 @@
+"""Code templates from phmdoctest.functions split into fixed segments.
+
+The source of each template function is looked up and split at its
+placeholders once per process.  A generated test function is then
+the template's segments joined with the block's values.
+Placeholders can be in any order in the source.
+"""
+from collections import namedtuple
+import functools
+import inspect
+from typing import Dict, Sequence
+
+from phmdoctest import functions
+
+FUNCTION_NAME = "<function name>"
+PUT_CODE = "    # <put code here>\n"
+EXPECTED_OUTPUT = "<<<replaced>>>"
+SETUP_CODE = "    # <setup code here>\n"
+TEARDOWN_CODE = "    # <teardown code here>\n"
+CODE_ONLY_PASS = "    pass\n"
+NO_ASSERTIONS = "\n    # Caution- no assertions.\n"
+
+Template = namedtuple("Template", ["segments", "placeholders"])
+"""Fixed text segments and the placeholders between them in source order."""
+
+
+def split(source: str, placeholders: Sequence[str]) -> Template:
+    """Split source at the first occurrence of each placeholder.
+
+    The template has one more segment than there are placeholders.
+    """
+    positions = {}
+    for placeholder in placeholders:
+        index = source.find(placeholder)
+        assert index > -1, "template has no {!r}".format(placeholder)
+        positions[placeholder] = index
+    ordered = sorted(placeholders, key=positions.__getitem__)
+    segments = []
+    rest = source
+    for placeholder in ordered:
+        before, _, rest = rest.partition(placeholder)
+        segments.append(before)
+    segments.append(rest)
+    return Template(tuple(segments), tuple(ordered))
+
+
+def fill(template: Template, values: Dict[str, str]) -> str:
+    """Join the segments with the value of each placeholder between them."""
+    parts = [template.segments[0]]
+    for placeholder, segment in zip(template.placeholders, template.segments[1:]):
+        parts.append(values[placeholder])
+        parts.append(segment)
+    return "".join(parts)
+
+
+@functools.lru_cache(maxsize=None)
+def test_case(has_output: bool, managed: bool, stream_output: bool) -> Template:
+    """Template of a test function.
+
+    The placeholders are FUNCTION_NAME, PUT_CODE and if has_output
+    EXPECTED_OUTPUT.
+    """
+    if has_output:
+        if stream_output:
+            function_name = "test_code_and_streamed_output"
+        else:
+            function_name = "test_code_and_output"
+        placeholders = [FUNCTION_NAME, PUT_CODE, EXPECTED_OUTPUT]
+    else:
+        function_name = "test_code_only"
+        placeholders = [FUNCTION_NAME, PUT_CODE]
+    if managed:
+        function_name = function_name.replace("test_", "test_managed_", 1)
+    source = inspect.getsource(getattr(functions, function_name))
+    source = source.replace(function_name, FUNCTION_NAME, 1)
+    if not has_output:
+        source = source.replace(CODE_ONLY_PASS, NO_ASSERTIONS)
+    return split(source, placeholders)
+
+
+@functools.lru_cache(maxsize=None)
+def setup_and_teardown_fixture(setup_doctest: bool) -> Template:
+    """Template of the setup and teardown fixture.
+
+    The placeholders are SETUP_CODE and TEARDOWN_CODE.
+    """
+    src = "\n\n"
+    if setup_doctest:
+        src += inspect.getsource(functions._phm_setup_doctest_teardown)
+    else:
+        src += inspect.getsource(functions._phm_setup_teardown)
+    src += "\n\n"
+    markspec = 'pytestmark = pytest.mark.usefixtures("{}")\n'
+    if setup_doctest:
+        src += markspec.format("_phm_setup_doctest_teardown")
+        # Add in more fixtures.
+        # 1. Populate the doctest namespace with values from the setup code.
+        # 2. session_00000 makes the names visible to the doctests.
+        src += "\n\n"
+        src += functions.populate_doctest_namespace_str
+        src += "\n\n"
+        src += inspect.getsource(functions.session_00000)
+    else:
+        src += markspec.format("_phm_setup_teardown")
+    return split(src, [SETUP_CODE, TEARDOWN_CODE])
+
+
+@functools.lru_cache(maxsize=None)
+def nothing_to_test(fail_nocode: bool) -> str:
+    """The test function used when there are no test cases."""
+    if fail_nocode:
+        nocode_func = functions.test_nothing_fails
+    else:
+        nocode_func = functions.test_nothing_passes
+    return "\n\n" + inspect.getsource(nocode_func)
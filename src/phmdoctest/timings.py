@@ -0,0 +1,245 @@
+"""Record time and memory used by each stage of test file generation.
+
+Recording is turned on by --timings and --timings-trace or by the
+recording() context manager.  When recording is off stage() returns
+a shared do-nothing context manager.
+
+Each stage records wall time, CPU time, and the peak memory
+allocated above the memory in use when the stage started.
+Memory is measured with tracemalloc.  Before Python 3.9 tracemalloc
+can't reset its peak, so peak_bytes is None.
+Stages can be nested.
+A nested stage's time is included in the enclosing stage.
+
+Example::
+
+    with phmdoctest.timings.recording() as recorder:
+        phmdoctest.main.generate(args)
+    print(recorder.totals())
+"""
+from collections import namedtuple
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar
+from typing import List  # noqa: F401
+
+import phmdoctest
+
+T = TypeVar("T")
+
+StageRecord = namedtuple(
+    "StageRecord", ["name", "depth", "start", "wall", "cpu", "peak_bytes", "details"]
+)
+"""Measurements of one stage. Times are in seconds from start of recording."""
+
+
+class _OpenStage:
+    """Measurements taken when a stage starts.
+
+    peak is None if the stage's peak memory can't be measured.
+    """
+
+    def __init__(self, trace_memory: bool) -> None:
+        self.wall = time.perf_counter()
+        self.cpu = time.process_time()
+        self.memory = 0
+        self.peak = 0  # type: Optional[int]
+        if trace_memory:
+            self.memory = tracemalloc.get_traced_memory()[0]
+            # Since there is only one tracemalloc peak, the enclosing
+            # stages remember theirs before it is reset for this one.
+            if hasattr(tracemalloc, "reset_peak"):
+                tracemalloc.reset_peak()
+                self.peak = self.memory
+            else:
+                self.peak = None
+
+
+class Recorder:
+    """Collects a StageRecord for each stage."""
+
+    def __init__(self, trace_memory: bool = True) -> None:
+        self.trace_memory = trace_memory
+        self.records = []  # type: List[StageRecord]
+        self.started = time.perf_counter()
+        self._open = []  # type: List[_OpenStage]
+
+    @contextlib.contextmanager
+    def stage(self, name: str, **details: Any) -> Iterator[None]:
+        """Record the time and memory used by the with block."""
+        if self.trace_memory and self._open:
+            enclosing = self._open[-1]
+            if enclosing.peak is not None:
+                enclosing.peak = max(enclosing.peak, tracemalloc.get_traced_memory()[1])
+        opened = _OpenStage(self.trace_memory)
+        self._open.append(opened)
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - opened.wall
+            cpu = time.process_time() - opened.cpu
+            self._open.pop()
+            peak = opened.peak
+            if self.trace_memory and peak is not None:
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+                if self._open:
+                    enclosing = self._open[-1]
+                    if enclosing.peak is not None:
+                        enclosing.peak = max(enclosing.peak, peak)
+                peak -= opened.memory
+            self.records.append(
+                StageRecord(
+                    name=name,
+                    depth=len(self._open),
+                    start=opened.wall - self.started,
+                    wall=wall,
+                    cpu=cpu,
+                    peak_bytes=peak,
+                    details=details,
+                )
+            )
+
+    def totals(self) -> Dict[str, Dict[str, Any]]:
+        """Count, total wall and CPU time, and maximum peak for each stage name.
+
+        The peak is None if a stage with the name has a None peak.
+        """
+        totals = {}  # type: Dict[str, Dict[str, Any]]
+        for record in self.records:
+            total = totals.setdefault(
+                record.name, dict(count=0, wall=0.0, cpu=0.0, peak_bytes=0)
+            )
+            total["count"] += 1
+            total["wall"] += record.wall
+            total["cpu"] += record.cpu
+            if record.peak_bytes is None or total["peak_bytes"] is None:
+                total["peak_bytes"] = None
+            else:
+                total["peak_bytes"] = max(total["peak_bytes"], record.peak_bytes)
+        return totals
+
+    def to_json(self) -> str:
+        """The records and totals as a JSON string."""
+        data = dict(
+            version=phmdoctest.__version__,
+            trace_memory=self.trace_memory,
+            totals=self.totals(),
+            stages=[r._asdict() for r in sorted(self.records, key=start_order)],
+        )
+        return json.dumps(data, indent=2)
+
+    def to_chrome_trace(self) -> str:
+        """The records as Chrome trace event format JSON string.
+
+        Load the file in chrome://tracing or https://ui.perfetto.dev.
+        """
+        pid = os.getpid()
+        events = []
+        for record in sorted(self.records, key=start_order):
+            args = dict(record.details)
+            args.update(cpu=record.cpu, peak_bytes=record.peak_bytes)
+            events.append(
+                dict(
+                    name=record.name,
+                    ph="X",
+                    ts=record.start * 1e6,
+                    dur=record.wall * 1e6,
+                    pid=pid,
+                    tid=0,
+                    args=args,
+                )
+            )
+        return json.dumps(dict(traceEvents=events, displayTimeUnit="ms"))
+
+
+def start_order(record: StageRecord) -> Any:
+    """Sort key to put enclosing stages before nested stages."""
+    return record.start, record.depth
+
+
+class _NoStage:
+    """Do-nothing context manager used when not recording."""
+
+    def __enter__(self) -> None:
+        return None
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NO_STAGE = _NoStage()
+
+_recorder = None  # type: Optional[Recorder]
+
+
+def stage(name: str, **details: Any) -> Any:
+    """Context manager that records the with block if recording is on."""
+    if _recorder is None:
+        return _NO_STAGE
+    return _recorder.stage(name, **details)
+
+
+def timed(iterable: Iterable[T], name: str) -> Iterator[T]:
+    """Record the time taken to get each item from the iterable."""
+    if _recorder is None:
+        yield from iterable
+        return
+    iterator = iter(iterable)
+    index = 0
+    while True:
+        with stage(name, index=index):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+        index += 1
+
+
+def current() -> Optional[Recorder]:
+    """The Recorder that is recording or None."""
+    return _recorder
+
+
+@contextlib.contextmanager
+def recording(trace_memory: bool = True) -> Iterator[Recorder]:
+    """Record the stages run in the with block.
+
+    Starts tracemalloc if trace_memory is True and it is not
+    already tracing.
+    """
+    global _recorder
+    previous = _recorder
+    started_tracing = False
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        started_tracing = True
+    recorder = Recorder(trace_memory=trace_memory)
+    _recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _recorder = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+
+def write(
+    recorder: Recorder, timings_path: Optional[str], trace_path: Optional[str]
+) -> None:
+    """Write the JSON and Chrome trace files. "-" writes to stderr."""
+    for path, text in [
+        (timings_path, recorder.to_json),
+        (trace_path, recorder.to_chrome_trace),
+    ]:
+        if path is None:
+            continue
+        if path == "-":
+            sys.stderr.write(text() + "\n")
+        else:
+            with open(path, "w", encoding="utf-8") as fp:
+                fp.write(text() + "\n")
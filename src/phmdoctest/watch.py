@@ -0,0 +1,185 @@
+"""Regenerate test files when the Markdown changes and rerun changed tests.
+
+The Markdown files are polled with os.stat().  When a file changes
+its test file is generated again and each test case gets a
+fingerprint of its block's code, output, and directives, and of the
+blocks it depends on.  pytest runs just the test cases with a
+fingerprint that the previous version of the file did not have,
+and the test cases before them in their dependency units.
+"""
+from collections import namedtuple
+import glob
+import os
+import time
+from typing import List, Optional, Tuple
+
+import click
+
+from phmdoctest.entryargs import Args
+from phmdoctest.fenced import Role, FencedBlock
+import phmdoctest.cases
+import phmdoctest.chains
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.main
+import phmdoctest.results
+import phmdoctest.scanner
+import phmdoctest.simulator
+
+POLL_SECONDS = 0.5
+"""Time between checks of the Markdown files."""
+
+WatchedFile = namedtuple("WatchedFile", ["args", "stat", "fingerprints"])
+"""A Markdown file's args, os.stat() values and test case fingerprints.
+
+fingerprints has the node ids and fingerprints by dependency unit.
+"""
+
+
+def file_stat(path: str) -> Tuple[int, int]:
+    """Modification time and size that tell if the file changed."""
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def read_blocks(args: Args) -> List[FencedBlock]:
+    """Fenced code blocks of the Markdown file with roles assigned."""
+    with open(args.markdown_file, "r", encoding="utf-8") as fp:
+        nodes = phmdoctest.scanner.fenced_block_nodes(fp)
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    phmdoctest.fillrole.assign_roles(args, blocks)
+    return blocks
+
+
+def node_id(args: Args, block: FencedBlock, name: str) -> Optional[str]:
+    """pytest node id of the block's test case. None if not collected."""
+    if block.role == Role.SESSION:
+        module_name = os.path.splitext(os.path.basename(args.outfile))[0]
+        return "{}::{}.{}".format(args.outfile, module_name, name)
+    if not name.startswith("test_"):
+        return None
+    if args.compact:
+        return "{}::test_block[{}]".format(args.outfile, name)
+    return "{}::{}".format(args.outfile, name)
+
+
+def fingerprints(args: Args, blocks: List[FencedBlock]) -> List[List[Tuple[str, str]]]:
+    """pytest node id and fingerprint of each test case by dependency unit."""
+    names = phmdoctest.cases.test_function_names(blocks)
+    units = []  # type: List[List[Tuple[str, str]]]
+    for unit in phmdoctest.chains.fingerprint_units(blocks, args.setup_doctest):
+        found = []  # type: List[Tuple[str, str]]
+        for block, fingerprint in unit:
+            node = node_id(args, block, names[block])
+            if node is not None:
+                found.append((node, fingerprint))
+        units.append(found)
+    return units
+
+
+def changed_nodes(
+    old: List[List[Tuple[str, str]]], new: List[List[Tuple[str, str]]]
+) -> List[str]:
+    """Node ids of test cases to run after the change from old to new.
+
+    A test case runs if its fingerprint is not found in old.
+    A test case that only moved to different lines is not changed.
+    The test cases before it in its dependency unit run too since
+    they may create names it uses.
+    """
+    old_fingerprints = {fingerprint for unit in old for _, fingerprint in unit}
+    to_run = phmdoctest.results.names_to_run(
+        new, lambda fingerprint: fingerprint in old_fingerprints
+    )
+    return [node for unit in new for node, _ in unit if node in to_run]
+
+
+def generate(args: Args, cache_dir: Optional[str]) -> WatchedFile:
+    """Write the test file and fingerprint its test cases."""
+    stat = file_stat(args.markdown_file)
+    phmdoctest.main.generate(args, cache_dir)
+    return WatchedFile(args, stat, fingerprints(args, read_blocks(args)))
+
+
+def remove_bytecode(outfile: str) -> None:
+    """Remove cached bytecode of the test file.
+
+    pytest checks the cached bytecode by modification time in
+    seconds and size, which may not change when the file is quickly
+    regenerated with an edit that keeps the size the same.
+    """
+    folder, name = os.path.split(outfile)
+    stem = os.path.splitext(name)[0]
+    for path in glob.glob(os.path.join(folder, "__pycache__", stem + ".*.pyc")):
+        os.remove(path)
+
+
+def run_pytest(watched: List[WatchedFile], nodes: List[str]) -> int:
+    """Run pytest on the node ids in this process."""
+    for item in watched:
+        remove_bytecode(item.args.outfile)
+    return phmdoctest.simulator.run_pytest_in_process(["--doctest-modules"] + nodes)
+
+
+def poll(watched: List[WatchedFile], cache_dir: Optional[str]) -> List[str]:
+    """Regenerate the changed Markdown files. Return the changed node ids.
+
+    watched is updated in place.
+    """
+    nodes = []  # type: List[str]
+    for i, item in enumerate(watched):
+        markdown_file = item.args.markdown_file
+        try:
+            if file_stat(markdown_file) == item.stat:
+                continue
+            new_item = generate(item.args, cache_dir)
+        except OSError:
+            # The editor may be replacing the file.
+            continue
+        except click.ClickException as exc:
+            click.echo("Error: {}".format(exc.format_message()), err=True)
+            watched[i] = item._replace(stat=file_stat(markdown_file))
+            continue
+        changed = changed_nodes(item.fingerprints, new_item.fingerprints)
+        click.echo(
+            "{} changed: {} test cases to run.".format(markdown_file, len(changed))
+        )
+        nodes.extend(changed)
+        watched[i] = new_item
+    return nodes
+
+
+def watch(
+    args_list: List[Args],
+    cache_dir: Optional[str],
+    poll_seconds: float = POLL_SECONDS,
+    max_polls: Optional[int] = None,
+) -> None:
+    """Write the test files, run pytest, then rerun changed test cases.
+
+    Runs until Ctrl-C or max_polls checks for changes.
+    pytest runs in this process with the --doctest-modules option.
+    More pytest options can be set by the environment variable
+    PYTEST_ADDOPTS.  Plugins are not autoloaded, load them with -p.
+    """
+    for args in args_list:
+        if not args.outfile or args.outfile == "-" or args.markdown_file == "-":
+            raise click.ClickException(
+                "--watch needs MARKDOWN_FILE and --outfile paths."
+            )
+    try:
+        import pytest  # noqa: F401
+    except ImportError:
+        raise click.ClickException("--watch needs pytest. pip install pytest")
+    watched = [generate(args, cache_dir) for args in args_list]
+    run_pytest(watched, [item.args.outfile for item in watched])
+    polls = 0
+    try:
+        while max_polls is None or polls < max_polls:
+            time.sleep(poll_seconds)
+            polls += 1
+            nodes = poll(watched, cache_dir)
+            if nodes:
+                run_pytest(watched, nodes)
+    except KeyboardInterrupt:
+        pass
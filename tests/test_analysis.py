@@ -0,0 +1,114 @@
+"""pytest test cases for the single pass block analysis."""
+import io
+
+import click
+import pytest
+
+from phmdoctest.entryargs import Args
+from phmdoctest.fenced import Role
+import phmdoctest.analysis
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.tool
+
+
+def assigned_blocks(markdown, setup=None):
+    """Blocks in the Markdown with their roles assigned."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    args = Args(
+        markdown_file="x.md",
+        outfile="-",
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=setup,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    phmdoctest.fillrole.assign_roles(args, blocks)
+    return blocks
+
+
+MARKDOWN = """\
+```python
+a = 1
+```
+
+<!--phmdoctest-mark.skipif<3.7-->
+```python
+print(a)
+```
+```
+1
+```
+
+<!--phmdoctest-share-names-->
+```python
+b = 2
+```
+
+```py
+>>> 1 + 1
+2
+```
+"""
+
+
+def test_analyze():
+    """One pass finds the roles, skipif values and needed imports."""
+    blocks = assigned_blocks(MARKDOWN, setup="FIRST")
+    analysis = phmdoctest.analysis.analyze(blocks)
+    assert analysis.first_block(Role.SETUP) is blocks[0]
+    assert analysis.first_block(Role.TEARDOWN) is None
+    assert analysis.role_counts[Role.CODE] == 2
+    assert analysis.number_of_test_cases() == 3
+    assert analysis.skipif_minor_number(blocks[1]) == 7
+    assert analysis.skipif_minor_number(blocks[3]) == 0
+    assert analysis.needs_sys_import
+    assert analysis.needs_import_pytest
+    assert analysis.needs_names_fixture
+    assert analysis.needs_output_checking
+    assert analysis.has_collected_code
+    analysis.raise_directive_error()
+
+
+def test_nothing_needed():
+    """No directives and no output blocks need no imports."""
+    analysis = phmdoctest.analysis.analyze(assigned_blocks("```python\na = 1\n```\n"))
+    assert not analysis.needs_sys_import
+    assert not analysis.needs_import_pytest
+    assert not analysis.needs_names_fixture
+    assert not analysis.needs_output_checking
+
+
+def test_skipif_error_is_held():
+    """The first invalid skipif directive is raised on request."""
+    markdown = (
+        "<!--phmdoctest-mark.skipif<3.x-->\n```python\na = 1\n```\n"
+        "<!--phmdoctest-mark.skipif<3.y-->\n```python\nb = 1\n```\n"
+    )
+    analysis = phmdoctest.analysis.analyze(assigned_blocks(markdown))
+    assert analysis.number_of_test_cases() == 2
+    with pytest.raises(click.ClickException) as exc_info:
+        analysis.raise_directive_error()
+    assert "3.x" in exc_info.value.message
+
+
+def test_has_collected_code():
+    """Code blocks labeled without the test_ prefix are not collected."""
+    markdown = "<!--phmdoctest-label example-->\n```python\na = 1\n```\n"
+    analysis = phmdoctest.analysis.analyze(assigned_blocks(markdown))
+    assert not analysis.has_collected_code
+    markdown += "<!--phmdoctest-label test_example-->\n```python\nb = 1\n```\n"
+    analysis = phmdoctest.analysis.analyze(assigned_blocks(markdown))
+    assert analysis.has_collected_code
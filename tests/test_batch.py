@@ -0,0 +1,101 @@
+"""pytest test cases for phmdoctest-batch."""
+import os
+
+import click
+import pytest
+
+import phmdoctest.batch
+import phmdoctest.simulator
+import verify
+
+
+def invoke_batch(args):
+    """Run phmdoctest-batch with click.testing.CliRunner."""
+    runner = phmdoctest.simulator.cli_runner()
+    return runner.invoke(cli=phmdoctest.batch.batch_entry_point, args=args)
+
+
+def test_test_file_name():
+    """Test file names are made from the relative path."""
+    assert phmdoctest.batch.test_file_name("example2.md") == "test_example2.py"
+    path = os.path.join("sub", "my-file.v2.md")
+    assert phmdoctest.batch.test_file_name(path) == "test_sub_my_file_v2.py"
+    path = os.path.join(".", ".github", "x.md")
+    assert phmdoctest.batch.test_file_name(path) == "test__github_x.py"
+
+
+def test_find_markdown_files():
+    """Directories, files, and globs. Duplicates removed."""
+    found = phmdoctest.batch.find_markdown_files(
+        ["doc", "doc/example1.md", "tests/one_*.md"]
+    )
+    assert list(found) == sorted(found)
+    assert found[os.path.normpath("doc/example1.md")] == "test_example1.py"
+    assert found[os.path.normpath("tests/one_mark_skip.md")] == "test_one_mark_skip.py"
+    assert "README.md" not in found
+
+
+def test_no_files_for_glob():
+    """A glob that matches nothing is an error."""
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.batch.find_markdown_files(["nowhere/*.md"])
+    assert "No Markdown files found for nowhere/*.md." in str(exc_info.value)
+
+
+def test_same_test_file_name():
+    """Two Markdown files that would write the same test file."""
+    markdown_files = {"a/x.md": "test_x.py", "b/x.md": "test_x.py"}
+    with pytest.raises(click.ClickException) as exc_info:
+        phmdoctest.batch.check_unique_names(markdown_files)
+    assert "test_x.py is built from a/x.md, b/x.md." in str(exc_info.value)
+
+
+@pytest.mark.parametrize("jobs", ["1", "2"])
+def test_same_as_phmdoctest(jobs, tmp_path):
+    """Batch writes the same test files as phmdoctest."""
+    outdir = tmp_path / "generated"
+    result = invoke_batch(
+        ["doc/example1.md", "doc/example2.md", "--outdir", str(outdir), "-j", jobs]
+    )
+    assert result.exit_code == 0
+    assert result.stdout == "2 Markdown files, 2 test files written, 0 failed.\n"
+    for name in ["example1", "example2"]:
+        want = verify.one_example(
+            "phmdoctest doc/{}.md --outfile discarded.py".format(name)
+        ).outfile
+        got = (outdir / "test_{}.py".format(name)).read_text(encoding="utf-8")
+        verify.a_and_b_are_the_same(want, got)
+
+
+def test_failed_files(tmp_path):
+    """Errors are shown and the exit status is the aggregate."""
+    outdir = tmp_path / "generated"
+    result = invoke_batch(
+        [
+            "tests/label_not_identifier.md",
+            "tests/one_mark_skip.md",
+            "--outdir",
+            str(outdir),
+            "--jobs",
+            "2",
+        ]
+    )
+    assert result.exit_code == 1
+    assert result.stdout == "2 Markdown files, 1 test files written, 1 failed.\n"
+    assert "label_not_identifier.md:\n<!--phmdoctest-label" in result.stderr
+    assert "Error: 1 of 2 Markdown files failed." in result.stderr
+    assert os.listdir(str(outdir)) == ["test_one_mark_skip.py"]
+
+
+def test_unreadable_file(tmp_path):
+    """A file that is not UTF-8 fails without stopping the others."""
+    bad = tmp_path / "bad.md"
+    bad.write_bytes(b"```python\nprint('\xff')\n```\n")
+    outdir = tmp_path / "generated"
+    result = invoke_batch(
+        [str(bad), "doc/example1.md", "--outdir", str(outdir), "--jobs", "2"]
+    )
+    assert result.exit_code == 1
+    assert result.stdout == "2 Markdown files, 1 test files written, 1 failed.\n"
+    assert "bad.md:\nUnicodeDecodeError: 'utf-8' codec" in result.stderr
+    assert os.listdir(str(outdir)) == ["test_example1.py"]
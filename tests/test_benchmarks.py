@@ -0,0 +1,42 @@
+"""pytest test cases for the benchmarks package."""
+import tempfile
+
+import pytest
+
+from benchmarks import bench
+from benchmarks.corpus import CORPORA, DEFAULT_SPEC, generate_markdown
+import phmdoctest.simulator
+
+
+def test_corpus_is_seeded():
+    """Same spec, same Markdown. Different seed, different Markdown."""
+    markdown = generate_markdown(DEFAULT_SPEC)
+    assert markdown == generate_markdown(DEFAULT_SPEC)
+    assert markdown != generate_markdown(DEFAULT_SPEC._replace(seed=1))
+    assert markdown.count("```python") > 40
+
+
+@pytest.mark.parametrize("corpus_name", ["small", "nested"])
+def test_corpus_test_file_passes(corpus_name, tmp_path):
+    """The generated Markdown makes a test file that passes."""
+    markdown_path = tmp_path / "corpus.md"
+    spec = CORPORA[corpus_name]._replace(blocks=30)
+    markdown_path.write_text(generate_markdown(spec), encoding="utf-8")
+    command = "phmdoctest {} --outfile test_corpus.py".format(markdown_path)
+    status = phmdoctest.simulator.run_and_pytest(command, pytest_options=["-q"])
+    assert status.runner_status.exit_code == 0
+    assert status.pytest_exit_code == 0
+
+
+def test_run_and_compare():
+    """Every benchmark runs. compare() flags the slower ones."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        base = bench.run_benchmarks(tmpdir, corpora=["small"], repeat=1, min_time=0)
+    assert sorted(base["results"]) == sorted(
+        "small/" + name for name in bench.BENCHMARKS
+    )
+    new = {"results": {k: dict(v) for k, v in base["results"].items()}}
+    new["results"]["small/cli"]["min"] *= 1.5
+    comparisons = bench.compare(base, new, threshold=0.1)
+    regressed = [c.name for c in comparisons if c.regressed]
+    assert regressed == ["small/cli"]
@@ -0,0 +1,146 @@
+"""pytest test cases for the cache of generated test files."""
+import os
+import time
+
+from click.testing import CliRunner
+
+from phmdoctest.entryargs import Args
+import phmdoctest.cache
+import phmdoctest.main
+
+
+def invoke(args):
+    runner = CliRunner()
+    return runner.invoke(cli=phmdoctest.main.entry_point, args=args)
+
+
+def make_args(**kwargs):
+    fields = dict(
+        markdown_file="doc/example1.md",
+        outfile="-",
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    fields.update(kwargs)
+    return Args(**fields)
+
+
+def test_hit_skips_parsing(tmp_path, monkeypatch):
+    """Second run copies the test file from the cache."""
+    cache_dir = str(tmp_path / "cache")
+    want = invoke(["doc/example2.md", "--outfile", "-", "--no-cache"])
+    first = invoke(["doc/example2.md", "--outfile", "-", "--cache-dir", cache_dir])
+    assert first.exit_code == 0
+    assert first.stdout == want.stdout
+    assert len(os.listdir(cache_dir)) == 1
+
+    def fail(args):
+        raise AssertionError("parsed the Markdown")
+
+    monkeypatch.setattr(phmdoctest.main, "generate_uncached", fail)
+    second = invoke(["doc/example2.md", "--outfile", "-", "--cache-dir", cache_dir])
+    assert second.exit_code == 0
+    assert second.stdout == want.stdout
+
+
+def test_cache_dir_from_environment(tmp_path, monkeypatch):
+    """PHMDOCTEST_CACHE_DIR sets the cache directory."""
+    cache_dir = tmp_path / "envcache"
+    monkeypatch.setenv("PHMDOCTEST_CACHE_DIR", str(cache_dir))
+    result = invoke(["doc/example1.md", "--outfile", "-"])
+    assert result.exit_code == 0
+    assert len(os.listdir(str(cache_dir))) == 1
+
+
+def test_off_by_default(tmp_path, monkeypatch):
+    """Without --cache-dir or PHMDOCTEST_CACHE_DIR nothing is cached."""
+    monkeypatch.delenv("PHMDOCTEST_CACHE_DIR", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "xdg"))
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))
+    assert phmdoctest.main.choose_cache_dir(None, False) is None
+    result = invoke(["doc/example1.md", "--outfile", str(tmp_path / "test_e.py")])
+    assert result.exit_code == 0
+    assert os.listdir(str(tmp_path)) == ["test_e.py"]
+
+
+def test_no_cache(tmp_path):
+    """--no-cache does not create the cache directory."""
+    cache_dir = tmp_path / "cache"
+    result = invoke(
+        [
+            "doc/example1.md",
+            "--outfile",
+            "-",
+            "--cache-dir",
+            str(cache_dir),
+            "--no-cache",
+        ]
+    )
+    assert result.exit_code == 0
+    assert not cache_dir.exists()
+
+
+def test_error_not_cached(tmp_path):
+    """Nothing is left in the cache when phmdoctest fails."""
+    cache_dir = tmp_path / "cache"
+    result = invoke(
+        [
+            "tests/label_not_identifier.md",
+            "--outfile",
+            "-",
+            "--cache-dir",
+            str(cache_dir),
+        ]
+    )
+    assert result.exit_code == 1
+    assert os.listdir(str(cache_dir)) == []
+
+
+def test_cache_key():
+    """The key changes with the options that change the test file."""
+    digest = phmdoctest.cache.file_digest("doc/example1.md")
+    key = phmdoctest.cache.cache_key(make_args(), digest)
+    assert key == phmdoctest.cache.cache_key(make_args(outfile="x.py"), digest)
+    assert key == phmdoctest.cache.cache_key(make_args(is_report=True), digest)
+    assert key != phmdoctest.cache.cache_key(make_args(skips=("FIRST",)), digest)
+    assert key != phmdoctest.cache.cache_key(make_args(fail_nocode=True), digest)
+    assert key != phmdoctest.cache.cache_key(make_args(shard=(1, 2)), digest)
+    assert key != phmdoctest.cache.cache_key(make_args(fingerprints=True), digest)
+    assert key != phmdoctest.cache.cache_key(
+        make_args(markdown_file="./doc/example1.md"), digest
+    )
+    other_digest = phmdoctest.cache.file_digest("doc/example2.md")
+    assert key != phmdoctest.cache.cache_key(make_args(), other_digest)
+
+
+def test_evict_least_recently_used(tmp_path):
+    """Oldest entries are deleted first. Stale temporary files are deleted."""
+    cache_dir = str(tmp_path)
+    now = time.time()
+    for age, name in enumerate(["c", "b", "a"]):
+        path = phmdoctest.cache.entry_path(cache_dir, name)
+        with open(path, "w") as fp:
+            fp.write("x" * 10)
+        os.utime(path, (now - age, now - age))
+    stale = os.path.join(cache_dir, "old" + phmdoctest.cache.TEMP_SUFFIX)
+    open(stale, "w").close()
+    old = now - phmdoctest.cache.STALE_TEMP_SECONDS - 1
+    os.utime(stale, (old, old))
+
+    # Mark a as recently used.
+    assert phmdoctest.cache.lookup(cache_dir, "a") == "x" * 10
+    phmdoctest.cache.evict(cache_dir, max_bytes=20)
+    assert sorted(os.listdir(cache_dir)) == ["a.py", "c.py"]
@@ -0,0 +1,220 @@
+"""pytest test cases for blocks that depend on each other."""
+import io
+
+from phmdoctest.entryargs import Args
+from phmdoctest.fenced import Role
+import phmdoctest.cases
+import phmdoctest.chains
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.simulator
+import phmdoctest.tool
+
+
+def make_args(**kwargs):
+    fields = dict(
+        markdown_file="doc.md",
+        outfile="-",
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    fields.update(kwargs)
+    return Args(**fields)
+
+
+def assigned_blocks(markdown, **kwargs):
+    """Blocks of the Markdown with their roles assigned."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    phmdoctest.fillrole.assign_roles(make_args(**kwargs), blocks)
+    return blocks
+
+
+def code_lines(units):
+    """The line numbers of the blocks in each unit."""
+    return [[block.line for block in unit] for unit in units]
+
+
+MARKDOWN = """\
+```python
+a = 1
+```
+
+<!--phmdoctest-share-names-->
+```python
+b = 2
+```
+
+```python
+print(b)
+```
+```
+2
+```
+
+<!--phmdoctest-clear-names-->
+```python
+c = 3
+```
+
+```python
+d = 4
+```
+
+```py
+>>> 1 + 1
+2
+```
+
+```py
+>>> 2 + 2
+4
+```
+"""
+
+
+GROUP_MARK = '@pytest.mark.xdist_group(name="doc.md:7")\n'
+
+
+def test_dependency_units():
+    """share-names through clear-names blocks are in one unit."""
+    blocks = assigned_blocks(MARKDOWN)
+    units = phmdoctest.chains.dependency_units(blocks, setup_doctest=False)
+    assert code_lines(units) == [[2], [7, 11, 19], [23], [27], [32]]
+    units = phmdoctest.chains.dependency_units(blocks[:3], setup_doctest=False)
+    assert code_lines(units) == [[2], [7, 11]]
+
+
+def test_setup_units():
+    """With setup the code blocks after a clear-names block are in its unit."""
+    blocks = assigned_blocks(MARKDOWN, setup="FIRST")
+    assert blocks[0].role == Role.SETUP
+    units = phmdoctest.chains.dependency_units(blocks, setup_doctest=False)
+    assert code_lines(units) == [[7, 11, 19, 23], [27], [32]]
+    units = phmdoctest.chains.dependency_units(blocks, setup_doctest=True)
+    assert code_lines(units) == [[7, 11, 19, 23], [27, 32]]
+
+
+SETUP_MARKDOWN = """\
+```python
+import math
+```
+
+```python
+print(math.pi > 3)
+```
+```
+True
+```
+
+```python
+print(math.e > 2)
+```
+```
+True
+```
+
+```py
+>>> 1 + 1
+2
+```
+
+<!--phmdoctest-share-names-->
+```python
+x = math.floor(2.5)
+```
+
+<!--phmdoctest-clear-names-->
+```python
+print(x)
+```
+```
+2
+```
+"""
+
+
+def test_setup_independent_units():
+    """With setup the code blocks without directives are units of their own."""
+    blocks = assigned_blocks(SETUP_MARKDOWN, setup="FIRST")
+    units = phmdoctest.chains.dependency_units(blocks, setup_doctest=False)
+    assert code_lines(units) == [[6], [13], [20], [26, 31]]
+
+
+def test_xdist_groups():
+    """Only blocks that depend on other blocks get a group."""
+    blocks = assigned_blocks(MARKDOWN)
+    groups = phmdoctest.chains.xdist_groups("doc.md", blocks, setup_doctest=False)
+    assert sorted(block.line for block in groups) == [7, 11, 19]
+    assert set(groups.values()) == {"doc.md:7"}
+
+
+def test_group_marks():
+    """The test functions of a chain have the group mark."""
+    blocks = assigned_blocks(MARKDOWN)
+    args = make_args(xdist_groups=True)
+    text = phmdoctest.cases.build_test_cases(args, blocks)
+    assert text.count(GROUP_MARK) == 3
+    assert GROUP_MARK + "def test_code_7(managenamespace):\n" in text
+    assert "pytestmark" not in text
+    text = phmdoctest.cases.build_test_cases(args._replace(compact=True), blocks)
+    assert text.count('marks=pytest.mark.xdist_group(name="doc.md:7")') == 3
+
+
+def test_session_group():
+    """With --setup-doctest the sessions are grouped by the module mark."""
+    blocks = assigned_blocks(MARKDOWN, setup="FIRST")
+    args = make_args(setup="FIRST", setup_doctest=True, xdist_groups=True)
+    text = phmdoctest.cases.build_test_cases(args, blocks)
+    assert text.count('@pytest.mark.xdist_group(name="doc.md:7")\n') == 4
+    assert (
+        'pytestmark = [pytestmark, pytest.mark.xdist_group(name="doc.md:27")]\n' in text
+    )
+
+
+def test_setup_groups():
+    """With setup the chain and the sessions get groups, other blocks don't."""
+    markdown = SETUP_MARKDOWN + "\n```py\n>>> 2 + 2\n4\n```\n"
+    blocks = assigned_blocks(markdown, setup="FIRST")
+    groups = phmdoctest.chains.xdist_groups("doc.md", blocks, setup_doctest=True)
+    assert sorted(set(groups.values())) == ["doc.md:20", "doc.md:26"]
+    assert sorted(block.line for block in groups) == [20, 26, 31, 38]
+    args = make_args(setup="FIRST", setup_doctest=True, xdist_groups=True)
+    text = phmdoctest.cases.build_test_cases(args, blocks)
+    assert text.count("@pytest.mark.xdist_group") == 2
+    assert text.count('@pytest.mark.xdist_group(name="doc.md:26")\n') == 2
+
+
+def test_no_groups():
+    """Without chains the test file is unchanged."""
+    blocks = assigned_blocks("```python\na = 1\n```\n")
+    args = make_args(xdist_groups=True)
+    text = phmdoctest.cases.build_test_cases(args, blocks)
+    assert text == phmdoctest.cases.build_test_cases(make_args(), blocks)
+
+
+def test_generated_tests():
+    """The grouped test file passes when run without pytest-xdist."""
+    command = (
+        "phmdoctest doc/setup_doctest.md -u FIRST -d LAST --setup-doctest"
+        " --xdist-groups --outfile test_doc.py"
+    )
+    status = phmdoctest.simulator.run_and_pytest(
+        command, pytest_options=["--doctest-modules", "-W", "ignore"]
+    )
+    assert status.runner_status.exit_code == 0
+    assert status.pytest_exit_code == 0
+    assert "xdist_group" in status.outfile
@@ -0,0 +1,162 @@
+"""pytest test cases for --compact generated test files."""
+import ast
+import io
+from xml.etree import ElementTree
+
+from phmdoctest.entryargs import Args
+import phmdoctest.cases
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.simulator
+import phmdoctest.tool
+
+
+MARKDOWN = """\
+<!--phmdoctest-setup-->
+```python
+base = 100
+```
+
+<!--phmdoctest-share-names-->
+```python
+total = base + 1
+print(total)
+```
+```
+101
+```
+
+<!--phmdoctest-label test_labeled-->
+```python
+print(total * 2)
+```
+```
+202
+```
+
+<!--phmdoctest-label not_collected-->
+```python
+assert False
+```
+
+<!--phmdoctest-mark.skip-->
+```python
+assert False
+```
+
+<!--phmdoctest-clear-names-->
+```python
+print("right")
+```
+```
+right
+```
+
+```python
+print("wrong")
+```
+```
+right
+```
+
+```python
+def (
+```
+
+```python
+assert "total" not in globals()
+```
+
+```py
+>>> 1 + 1
+2
+```
+"""
+
+
+def build(markdown, **kwargs):
+    """Generate the --compact test file from the Markdown."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    fields = dict(
+        markdown_file="doc.md",
+        outfile="-",
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=True,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    fields.update(kwargs)
+    args = Args(**fields)
+    phmdoctest.fillrole.assign_roles(args, blocks)
+    return phmdoctest.cases.build_test_cases(args, blocks)
+
+
+def test_table_of_cases():
+    """Code blocks are rows with the test function names as ids."""
+    text = build(MARKDOWN)
+    ast.parse(text)
+    assert "from phmdoctest.functions import _phm_run_case\n" in text
+    assert "_phm_compare_exact" not in text
+    assert "def test_code" not in text
+    assert "id='test_code_8_output_12'" in text
+    assert "id='test_labeled'" in text
+    assert "not_collected" not in text
+    assert "marks=pytest.mark.skip())" in text
+    assert "(8, 'total = base + 1\\nprint(total)\\n', '101\\n', 'update')" in text
+    assert "'clear'), id=" in text
+    assert "def session_00001_line_57():" in text
+    assert text.endswith("    _phm_run_case(_phm_case, request)\n")
+
+
+def test_stream_output():
+    """The runner checks the output as it is printed."""
+    text = build(MARKDOWN, stream_output=True)
+    assert "from phmdoctest.fixture import expectoutput\n" in text
+    assert text.endswith("    _phm_run_case(_phm_case, request, stream_output=True)\n")
+
+
+def test_no_code_blocks():
+    """Without code blocks there is no table."""
+    text = build("```py\n>>> 1\n1\n```\n")
+    assert "_phm_cases" not in text
+    assert "import pytest" not in text
+
+
+def test_generated_tests(tmp_path):
+    """Setup, shared names, marks, and failures work as test cases."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(MARKDOWN, encoding="utf-8")
+    command = "phmdoctest {} --compact --outfile test_doc.py".format(markdown_path)
+    status = phmdoctest.simulator.run_and_pytest(
+        command, pytest_options=["--doctest-modules"], junit_family="xunit2"
+    )
+    assert status.runner_status.exit_code == 0
+    assert status.pytest_exit_code == 1
+    junit = status.junit_xml
+    assert 'tests="8"' in junit
+    assert 'failures="2"' in junit
+    assert 'errors="0"' in junit
+    assert 'skipped="1"' in junit
+    failed = set()
+    for testcase in ElementTree.fromstring(junit).iter("testcase"):
+        if testcase.find("failure") is not None:
+            failed.add(testcase.get("name"))
+    assert failed == {
+        "test_block[test_code_42_output_45]",
+        "test_block[test_code_49]",
+    }
+    assert 'name="test_block[test_labeled]"' in junit
+    # The block with a syntax error fails only its own test case.
+    assert "&lt;code block line 49&gt;" in junit
@@ -4,6 +4,7 @@ import sys
 import pytest
 
 from phmdoctest.fixture import managenamespace
+import phmdoctest.simulator
 import verify
 
 
@@ -14,6 +15,7 @@ import verify
 #
 # Require manual testing.
 # Edit fixture.py and run pytest on this file to inject the error.
+# Set the environment variable PHMDOCTEST_AUDIT_NAMESPACE=1 for 1.
 #
 # 1. namespace_names.add('verify')    # add this line above the 1st raise.
 #
@@ -91,3 +93,49 @@ def test_illegal_operation(managenamespace):
         managenamespace(operation="bogus", additions=items)
     want = 'phmdoctest- operation="bogus" is not allowed'
     assert want in str(exc_info.value)
+
+
+def test_extra_module_attribute(managenamespace):
+    """Update raises if a module attribute was added outside the namespace."""
+    module = sys.modules[__name__]
+    module.not_in_namespace = 1
+    try:
+        with pytest.raises(AttributeError) as exc_info:
+            managenamespace(operation="update", additions={"G": None})
+        assert "current attributes == original + namespace" in str(exc_info.value)
+    finally:
+        del module.not_in_namespace
+    managenamespace(operation="clear")
+
+
+def test_audit_namespace(monkeypatch):
+    """Generated tests pass with the full namespace audit."""
+    monkeypatch.setenv("PHMDOCTEST_AUDIT_NAMESPACE", "1")
+    command = "phmdoctest tests/managenamespace.md --outfile discarded.py"
+    status = phmdoctest.simulator.run_and_pytest(command, pytest_options=["-q"])
+    assert status.pytest_exit_code == 0
+
+
+def test_sync(managenamespace):
+    """Sync copies to the target only when the namespace has changed."""
+    managenamespace(operation="clear")
+    target = {"other": 0}
+    managenamespace(operation="update", additions={"H": 1, "I": 2})
+    managenamespace(operation="sync", target=target)
+    assert target == {"other": 0, "H": 1, "I": 2}
+
+    # No changes since the last sync so target is left alone.
+    target["H"] = 99
+    managenamespace(operation="sync", target=target)
+    assert target["H"] == 99
+
+    # Names cleared from the namespace are removed from the target.
+    managenamespace(operation="clear")
+    managenamespace(operation="update", additions={"I": 3})
+    managenamespace(operation="sync", target=target)
+    assert target == {"other": 0, "I": 3}
+    managenamespace(operation="clear")
+
+    with pytest.raises(ValueError) as exc_info:
+        managenamespace(operation="sync")
+    assert "need target" in str(exc_info.value)
@@ -30,19 +30,47 @@ def test_phm_compare_exact_prints(capsys):
             a="123zzz\n456aaa\n7890ccc", b="123zzz\n4x6aaa\n7890ccc"
         )
     expected = """\
-  123zzz
-- 456aaa
-?  ^
-
-+ 4x6aaa
-?  ^
-
-  7890ccc
+First difference at line 2.
+--- expected
++++ printed
+@@ -1,3 +1,3 @@
+ 123zzz
+-456aaa
++4x6aaa
+ 7890ccc
 """
     got = capsys.readouterr().out
     assert expected == got
 
 
+def test_phm_compare_exact_line_endings():
+    """Line endings and a missing newline at the end are not compared."""
+    phmdoctest.functions._phm_compare_exact(a="1\n2", b="1\r\n2\n")
+
+
+def test_phm_compare_exact_far_difference(capsys):
+    """Line numbers of a difference after many same lines."""
+    a = "".join("line {}\n".format(n) for n in range(1, 10001))
+    b = a.replace("line 9000\n", "line 9000!\n")
+    with pytest.raises(AssertionError):
+        phmdoctest.functions._phm_compare_exact(a=a, b=b)
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "First difference at line 9000."
+    assert lines[3] == "@@ -8997,7 +8997,7 @@"
+    assert lines[7:9] == ["-line 9000", "+line 9000!"]
+    assert len(lines) == 12
+
+
+def test_phm_compare_exact_max_diff_lines(capsys, monkeypatch):
+    """The diff is truncated at PHMDOCTEST_MAX_DIFF_LINES lines."""
+    monkeypatch.setenv("PHMDOCTEST_MAX_DIFF_LINES", "10")
+    with pytest.raises(AssertionError):
+        phmdoctest.functions._phm_compare_exact(a="a\n" * 5, b="b\n" * 100000)
+    lines = capsys.readouterr().out.splitlines()
+    assert len(lines) == 12
+    assert lines[-1].startswith("... diff truncated.")
+
+
 # The fixtures and functions in functions.py are not invoked
 # by phmdoctest.  The source code is read by Python standard
 # library inspect module, modified, and then written to the
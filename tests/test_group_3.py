@@ -46,11 +46,11 @@ def test_too_many_matches_for_setup():
     )
     assert simulator_status.runner_status.exit_code == 1
     assert simulator_status.pytest_exit_code is None
-    stdout = simulator_status.runner_status.stdout
-    assert "Error: More than one block matched command line" in stdout
-    assert "--setup or -u." in stdout
-    assert "Only one match is allowed." in stdout
-    assert "The matching blocks are at line numbers 20, 37, 47" in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "Error: More than one block matched command line" in stderr
+    assert "--setup or -u." in stderr
+    assert "Only one match is allowed." in stderr
+    assert "The matching blocks are at line numbers 20, 37, 47" in stderr
 
 
 def test_setup_is_not_code_block():
@@ -116,11 +116,11 @@ def test_too_many_matches_for_teardown():
     )
     assert simulator_status.runner_status.exit_code == 1
     assert simulator_status.pytest_exit_code is None
-    stdout = simulator_status.runner_status.stdout
-    assert "Error: More than one block matched command line" in stdout
-    assert "--teardown or -d." in stdout
-    assert "Only one match is allowed." in stdout
-    assert "The matching blocks are at line numbers 20, 76" in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "Error: More than one block matched command line" in stderr
+    assert "--teardown or -d." in stderr
+    assert "Only one match is allowed." in stderr
+    assert "The matching blocks are at line numbers 20, 76" in stderr
 
 
 def test_teardown_is_same_as_setup_block():
@@ -365,8 +365,8 @@ def test_label_is_not_identifier():
         well_formed_command=command, pytest_options=["--doctest-modules", "-v"]
     )
     assert simulator_status.runner_status.exit_code == 1
-    stdout = simulator_status.runner_status.stdout
-    assert "line 3 must be a valid python identifier." in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "line 3 must be a valid python identifier." in stderr
 
 
 def test_same_label_twice():
@@ -387,8 +387,8 @@ def test_bad_skipif_minor_number():
         well_formed_command=command, pytest_options=None
     )
     assert simulator_status.runner_status.exit_code == 1
-    stdout = simulator_status.runner_status.stdout
-    assert "line 15 must be a decimal number and >= zero." in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "line 15 must be a decimal number and >= zero." in stderr
 
     command = (
         'phmdoctest tests/bad_skipif_number.md --skip="palin" --outfile discarded.py'
@@ -397,8 +397,8 @@ def test_bad_skipif_minor_number():
         well_formed_command=command, pytest_options=None
     )
     assert simulator_status.runner_status.exit_code == 1
-    stdout = simulator_status.runner_status.stdout
-    assert "line 4 must be a decimal number and >= zero." in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "line 4 must be a decimal number and >= zero." in stderr
 
 
 def test_extra_setup_block():
@@ -408,9 +408,9 @@ def test_extra_setup_block():
         well_formed_command=command, pytest_options=["--doctest-modules", "-v"]
     )
     assert simulator_status.runner_status.exit_code == 1
-    stdout = simulator_status.runner_status.stdout
-    assert "More than one block is designated as setup" in stdout
-    assert "The blocks are at line numbers 25, 14" in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "More than one block is designated as setup" in stderr
+    assert "The blocks are at line numbers 25, 14" in stderr
 
 
 def test_extra_teardown_block():
@@ -423,9 +423,9 @@ def test_extra_teardown_block():
         well_formed_command=command, pytest_options=["--doctest-modules", "-v"]
     )
     assert simulator_status.runner_status.exit_code == 1
-    stdout = simulator_status.runner_status.stdout
-    assert "More than one block is designated as teardown" in stdout
-    assert "The blocks are at line numbers 25, 64" in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "More than one block is designated as teardown" in stderr
+    assert "The blocks are at line numbers 25, 64" in stderr
 
 
 def test_setup_directive_on_2_blocks():
@@ -435,9 +435,9 @@ def test_setup_directive_on_2_blocks():
         well_formed_command=command, pytest_options=["--doctest-modules", "-v"]
     )
     assert simulator_status.runner_status.exit_code == 1
-    stdout = simulator_status.runner_status.stdout
-    assert "More than 1 block has directive <!--phmdoctest-setup-->." in stdout
-    assert "The blocks are at line numbers 77, 116." in stdout
+    stderr = simulator_status.runner_status.stderr
+    assert "More than 1 block has directive <!--phmdoctest-setup-->." in stderr
+    assert "The blocks are at line numbers 77, 116." in stderr
 
 
 def test_ok_same_block_setup_2_ways():
@@ -629,3 +629,25 @@ if __name__ == "__main__":
     verify.a_and_b_are_the_same(want, got)
     ast.parse(code)
     ast.parse(want)
+
+
+def test_no_inline_command_is_unchanged():
+    """Code without an inline command is returned as is."""
+    code = "a = 1\n    # phmdoctest is not a command\n\n\n"
+    assert phmdoctest.inline.apply_inline_commands(code) == (code, 0)
+
+
+def test_many_omitted_sections():
+    """Each omit command in a long block is its own section."""
+    sections = 3000
+    code = "".join(
+        "if x:  # phmdoctest:omit\n    y = {}\n\nz = {}\n".format(n, n)
+        for n in range(sections)
+    )
+    want = "".join(
+        "# if x:  # phmdoctest:omit\n#     y = {}\n\nz = {}\n".format(n, n)
+        for n in range(sections)
+    )
+    got, num_changed_sections = phmdoctest.inline.apply_inline_commands(code)
+    assert num_changed_sections == sections
+    assert got == want
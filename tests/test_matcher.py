@@ -0,0 +1,82 @@
+"""pytest test cases for the --skip pattern matcher."""
+import random
+
+from click.testing import CliRunner
+
+import phmdoctest.fillrole
+import phmdoctest.main
+import phmdoctest.matcher
+
+
+class Block:
+    """Stand in for FencedBlock with just the contents."""
+
+    def __init__(self, contents):
+        self.contents = contents
+
+
+def test_automaton_overlapping_patterns():
+    """Patterns that overlap, nest, or repeat are all found."""
+    patterns = ["he", "she", "his", "hers", "", "s", "xyz", "she"]
+    automaton = phmdoctest.matcher.Automaton(patterns)
+    assert automaton.search("ushers") == {"he", "she", "hers", "", "s"}
+    assert automaton.search("") == {""}
+
+
+def test_automaton_random():
+    """Same patterns found as with the in operator."""
+    rng = random.Random(7)
+    for _ in range(200):
+        patterns = [
+            "".join(rng.choice("ab\nc") for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 30))
+        ]
+        text = "".join(rng.choice("ab\ncd") for _ in range(rng.randint(0, 60)))
+        automaton = phmdoctest.matcher.Automaton(patterns)
+        assert automaton.search(text) == {p for p in patterns if p in text}
+
+
+def test_skip_matcher_same_as_is_match():
+    """Order, repeats and positional patterns are the same as is_match()."""
+    rng = random.Random(11)
+    words = ["alpha", "beta", "gamma", "delta", "print", "(", "FIRST", "LAST"]
+    words += ["a", "lp", "ta", "ma d", "t(", "al", "ph", "gam", "de", "lt"]
+    for num_patterns in [0, 3, 20]:
+        patterns = [rng.choice(words) + rng.choice(["", "a"]) for _ in range(3)]
+        patterns += [rng.choice(words) for _ in range(num_patterns)]
+        patterns += ["SECOND", "FIRST"]
+        matcher = phmdoctest.matcher.SkipMatcher(patterns)
+        assert (matcher.automaton is not None) == (num_patterns == 20)
+        blocks = [
+            Block(" ".join(rng.choice(words) for _ in range(5))) for _ in range(10)
+        ]
+        for index, block in enumerate(blocks):
+            is_last = index == len(blocks) - 1
+            want = [
+                p
+                for p in patterns
+                if phmdoctest.fillrole.is_match(p, block, index, is_last)
+            ]
+            assert matcher.matches(block, index, is_last) == want
+
+
+def test_many_skips_report():
+    """Skips report with enough patterns to use the automaton."""
+    skips = ["import", "FIRST", "print(", "zzz", "LAST"]
+    skips += ["not-in-the-file-{}".format(n) for n in range(10)]
+    args = ["doc/example2.md", "--report"]
+    for skip in skips:
+        args.extend(["--skip", skip])
+    runner = CliRunner()
+    result = runner.invoke(phmdoctest.main.entry_point, args)
+    assert result.exit_code == 0
+    table = result.stdout.split("skip pattern matches")[1]
+    rows = dict(
+        (line.split(maxsplit=1) + [""])[:2] for line in table.splitlines()[4:-1]
+    )
+    assert rows.pop("import") == "87, 102"
+    assert rows.pop("FIRST") == "9"
+    assert rows.pop("print(") == "9, 20, 37, 44, 87"
+    assert rows.pop("LAST") == "102"
+    assert set(rows.values()) == {""}
+    assert len(rows) == 11
@@ -0,0 +1,184 @@
+"""pytest test cases for --measure and phmdoctest.measure."""
+import json
+import tracemalloc
+
+from click.testing import CliRunner
+
+from phmdoctest.measure import BlockMeasurement
+import phmdoctest.main
+import phmdoctest.measure
+import phmdoctest.simulator
+
+
+MARKDOWN = """\
+```python
+print("fast")
+```
+```
+fast
+```
+
+```python
+import time
+data = [bytes(1000) for _ in range(500)]
+time.sleep(0.1)
+```
+
+```python
+assert False
+```
+
+```py
+>>> 1 + 1
+2
+```
+
+```python
+import pytest
+pytest.skip("later")
+```
+"""
+
+
+def generate(tmp_path, *options):
+    """Write the Markdown and the test file. Return the test file path."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(MARKDOWN, encoding="utf-8")
+    outfile = tmp_path / "test_measured.py"
+    runner = CliRunner()
+    result = runner.invoke(
+        phmdoctest.main.entry_point,
+        [str(markdown_path), "--outfile", str(outfile), "--no-cache"] + list(options),
+    )
+    assert result.exit_code == 0, result.output
+    return outfile
+
+
+def measurement(line, wall, markdown_file="doc.md"):
+    """A BlockMeasurement with the wall time."""
+    return BlockMeasurement(
+        markdown_file=markdown_file,
+        line=line,
+        test_file="test_doc.py",
+        outcome="passed",
+        wall=wall,
+        cpu=wall / 2,
+        peak_bytes=2048,
+        profile=[],
+    )
+
+
+def test_generated_code(tmp_path):
+    """Code block test functions are decorated. Sessions are not."""
+    text = generate(tmp_path, "--measure").read_text(encoding="utf-8")
+    assert "from phmdoctest.functions import _phm_measure\n" in text
+    assert "\n_phm_recorder = _phm_measure(" in text
+    assert ", __file__)\n_phm_write_measurements = _phm_recorder.fixture()\n" in text
+    assert "\n@_phm_recorder.block(2)\ndef test_code_2_output_5(capsys):\n" in text
+    assert "\n@_phm_recorder.block(9)\ndef test_code_9():\n" in text
+    assert "\n\ndef session_00001_line_19():\n" in text
+    text = generate(tmp_path, "--measure-cprofile", "--compact").read_text(
+        encoding="utf-8"
+    )
+    assert ", __file__, cprofile=True)\n" in text
+    assert text.endswith("_phm_run_case(_phm_case, request, recorder=_phm_recorder)\n")
+
+
+def test_no_code_blocks(tmp_path):
+    """Without code blocks there is no recorder."""
+    status = phmdoctest.simulator.run_and_pytest(
+        "phmdoctest tests/twentysix_session_blocks.md --measure --outfile -"
+    )
+    assert "_phm_measure" not in status.runner_status.stdout
+
+
+def test_sidecar(tmp_path):
+    """Running the tests writes a measurement of each code block.
+
+    A skipped block is recorded as skipped.
+    """
+    for option in ["--measure-cprofile", "--compact"]:
+        outfile = generate(tmp_path, "--measure", option)
+        exit_code = phmdoctest.simulator.run_pytest_in_process(
+            ["-q", str(outfile)], module_name="test_measured"
+        )
+        assert exit_code == 1
+        measurements = phmdoctest.measure.read_sidecar(
+            str(tmp_path / "test_measured.measure.json")
+        )
+        assert [(m.line, m.outcome) for m in measurements] == [
+            (2, "passed"),
+            (9, "passed"),
+            (15, "failed"),
+            (24, "skipped"),
+        ]
+        slow = measurements[1]
+        assert slow.markdown_file.endswith("doc.md")
+        assert slow.test_file == "test_measured.py"
+        assert slow.wall >= 0.1
+        assert slow.peak_bytes > 500 * 1000
+        functions = [row[0] for row in slow.profile]
+        if option == "--measure-cprofile":
+            assert any("(test_code_9)" in f for f in functions)
+        else:
+            assert functions == []
+
+
+def test_no_reset_peak(monkeypatch):
+    """Without tracemalloc.reset_peak() the peak is None and not reported."""
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    recorder = phmdoctest.measure.Recorder("doc.md", "test_doc.py", False)
+    with recorder.block(2):
+        pass
+    assert recorder.blocks[2].peak_bytes is None
+    report = phmdoctest.measure.slowest_blocks_report(list(recorder.blocks.values()))
+    assert report.splitlines()[4].split()[4] == "passed"
+
+
+def test_sidecar_path(monkeypatch):
+    """Each pytest-xdist worker has its own sidecar."""
+    monkeypatch.delenv("PYTEST_XDIST_WORKER", raising=False)
+    assert phmdoctest.measure.sidecar_path("t/test_doc.py") == "t/test_doc.measure.json"
+    monkeypatch.setenv("PYTEST_XDIST_WORKER", "gw1")
+    assert phmdoctest.measure.sidecar_path("test_doc.py") == "test_doc.gw1.measure.json"
+
+
+def test_merge_and_report(tmp_path):
+    """Sidecars are merged keeping the slowest. The slowest are shown first."""
+    first = phmdoctest.measure.Recorder("doc.md", str(tmp_path / "test_a.py"), False)
+    first.add(measurement(2, 0.5))
+    first.add(measurement(9, 0.25))
+    first.write()
+    folder = tmp_path / "more"
+    folder.mkdir()
+    second = phmdoctest.measure.Recorder("doc.md", str(folder / "test_b.py"), False)
+    second.add(measurement(9, 1.0))
+    second.add(measurement(4, 0.125, markdown_file="other.md"))
+    second.write()
+    merged = phmdoctest.measure.merge([str(tmp_path)])
+    assert [(m.markdown_file, m.line, m.wall) for m in merged] == [
+        ("doc.md", 2, 0.5),
+        ("doc.md", 9, 1.0),
+        ("other.md", 4, 0.125),
+    ]
+    assert merged == phmdoctest.measure.merge([first.path, second.path])
+    report = phmdoctest.measure.slowest_blocks_report(merged, count=2, title="slow")
+    lines = report.splitlines()
+    assert lines[0].strip() == "slow"
+    assert lines[5].split() == ["doc.md", "9", "1.000", "0.500", "2", "passed"]
+    assert lines[6].split() == ["doc.md", "2", "0.500", "0.250", "2", "passed"]
+    assert "other.md" not in report
+
+    runner = CliRunner()
+    result = runner.invoke(
+        phmdoctest.measure.report_entry_point, [str(tmp_path), "--json", "-"]
+    )
+    assert result.exit_code == 0
+    data = json.loads(result.output)
+    assert [block["line"] for block in data["blocks"]] == [2, 9, 4]
+    result = runner.invoke(
+        phmdoctest.measure.report_entry_point, [str(tmp_path), "--count", "1"]
+    )
+    assert result.exit_code == 0
+    assert "9    1.000    0.500" in result.output
+    assert result.output.endswith("3 code blocks measured.\n")
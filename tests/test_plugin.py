@@ -0,0 +1,64 @@
+"""pytest test cases for the phmdoctest pytest plugin."""
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+
+def run_pytest(tmp_path, markdown_files, options):
+    """Run pytest in a subprocess on copies of the Markdown files."""
+    for markdown_file in markdown_files:
+        shutil.copy(markdown_file, str(tmp_path))
+    commandline = [sys.executable, "-m", "pytest", "-v", "-p", "no:cacheprovider"]
+    commandline.extend(options)
+    completed = subprocess.run(
+        commandline,
+        cwd=str(tmp_path),
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    return completed
+
+
+def test_collects_markdown(tmp_path):
+    """Code blocks are test functions and sessions are doctests."""
+    completed = run_pytest(tmp_path, ["doc/example1.md"], ["--phmdoctest"])
+    assert completed.returncode == 0
+    assert "example1.md::test_code_14_output_28 PASSED" in completed.stdout
+    assert "example1.md::phmdoctest_example1.session_00001_line_6 PASSED" in (
+        completed.stdout
+    )
+    assert "2 passed" in completed.stdout
+
+
+def test_not_collected_by_default(tmp_path):
+    """Markdown files are collected only when the plugin is turned on."""
+    completed = run_pytest(tmp_path, ["doc/example1.md"], [])
+    assert completed.returncode == pytest.ExitCode.NO_TESTS_COLLECTED
+    completed = run_pytest(tmp_path, [], ["-o", "phmdoctest=true"])
+    assert completed.returncode == 0
+    assert "2 passed" in completed.stdout
+
+
+def test_failures_and_setup(tmp_path):
+    """Failing output check, setup directive, and skip directive."""
+    completed = run_pytest(
+        tmp_path,
+        ["tests/unexpected_output.md", "tests/setup_only.md", "tests/direct.md"],
+        ["--phmdoctest", "unexpected_output.md", "setup_only.md"],
+    )
+    assert completed.returncode == pytest.ExitCode.TESTS_FAILED
+    assert "unexpected_output.md::test_code_4_output_17 FAILED" in completed.stdout
+    assert "setup_only.md::test_code_12_output_19 PASSED" in completed.stdout
+    assert "1 failed, 2 passed" in completed.stdout
+
+
+def test_collect_error(tmp_path):
+    """A Markdown file phmdoctest can't process is a collection error."""
+    completed = run_pytest(
+        tmp_path, ["tests/label_not_identifier.md"], ["--phmdoctest"]
+    )
+    assert completed.returncode == pytest.ExitCode.INTERRUPTED
+    assert "ERROR collecting label_not_identifier.md" in completed.stdout
+    assert "must be a valid python identifier." in completed.stdout
@@ -355,6 +355,30 @@ def test_simulator():
     simulator_example_code()
 
 
+# Developers: Changes here must be mirrored in a Markdown FCB in README.md.
+# The guts of this function are an exact copy of example in README.md.
+def run_many_example_code():
+    import phmdoctest.simulator
+
+    commands = [
+        "phmdoctest doc/example1.md --outfile test_example1.py",
+        "phmdoctest doc/example2.md --outfile test_example2.py",
+    ]
+    statuses = phmdoctest.simulator.run_many(
+        commands, pytest_options=["--doctest-modules"], in_process=True, workers=2
+    )
+    assert [status.pytest_exit_code for status in statuses] == [0, 0]
+
+
+def test_run_many():
+    """Assure the guts of the function are same as in Markdown."""
+    verify.example_code_checker(
+        callable_function=run_many_example_code,
+        example_string=labeled.contents(label="run-many"),
+    )
+    run_many_example_code()
+
+
 def test_quick_links():
     """Make sure the README.md quick links are up to date."""
     filename = "README.md"
@@ -0,0 +1,144 @@
+"""pytest test cases for --fingerprints and --phmdoctest-results."""
+import ast
+import os
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+import phmdoctest.main
+import phmdoctest.results
+
+
+MARKDOWN = """\
+```python
+print(1)
+```
+```
+1
+```
+
+<!--phmdoctest-share-names-->
+```python
+a = 5
+```
+
+<!--phmdoctest-label example-->
+```python
+b = 1
+```
+
+<!--phmdoctest-clear-names-->
+```python
+print(a)
+```
+```
+5
+```
+
+```py
+>>> 2 + 2
+4
+```
+"""
+
+
+def generate(tmp_path, markdown, *options):
+    """Write test_doc.py with --fingerprints. Return the table."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(markdown, encoding="utf-8")
+    outfile = tmp_path / "test_doc.py"
+    result = CliRunner().invoke(
+        phmdoctest.main.entry_point,
+        [str(markdown_path), "--outfile", str(outfile), "--fingerprints", "--no-cache"]
+        + list(options),
+    )
+    assert result.exit_code == 0
+    text = outfile.read_text(encoding="utf-8")
+    start = text.index("_phm_fingerprints = ")
+    return ast.literal_eval(text[start + len("_phm_fingerprints = ") :])
+
+
+def run_pytest(tmp_path, *options):
+    """Run pytest on the test file with --phmdoctest-results."""
+    commandline = [sys.executable, "-m", "pytest", "-v", "-p", "no:cacheprovider"]
+    commandline.extend(["--phmdoctest-results", "results"])
+    commandline.extend(options)
+    completed = subprocess.run(
+        commandline,
+        cwd=str(tmp_path),
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    return completed.stdout
+
+
+def test_table(tmp_path):
+    """Blocks that share names are in one unit. Uncollected labels are left out."""
+    units = generate(tmp_path, MARKDOWN)
+    assert [[name for name, _ in unit] for unit in units] == [
+        ["test_code_2_output_5"],
+        ["test_code_10", "test_code_20_output_23"],
+        ["session_00001_line_27"],
+    ]
+    moved = generate(tmp_path, "\n" + MARKDOWN)
+    assert [f for unit in moved for _, f in unit] == [
+        f for unit in units for _, f in unit
+    ]
+
+
+def test_names_to_run():
+    """Earlier test cases in the unit run when a later one runs."""
+    units = [[("a", "1"), ("b", "2"), ("c", "3")], [("d", "4")], [("e", "5")]]
+    passed = {"1", "2", "3", "5"}.__contains__
+    assert phmdoctest.results.names_to_run(units, passed) == {"d"}
+    passed = {"1", "3", "4", "5"}.__contains__
+    assert phmdoctest.results.names_to_run(units, passed) == {"a", "b"}
+
+
+def test_deselect_passed(tmp_path):
+    """Test cases that passed before are deselected."""
+    generate(tmp_path, MARKDOWN)
+    stdout = run_pytest(tmp_path, "--doctest-modules")
+    assert "4 passed" in stdout
+    assert len(os.listdir(str(tmp_path / "results"))) == 4
+    stdout = run_pytest(tmp_path, "--doctest-modules")
+    assert "4 deselected" in stdout
+
+    # The block before the changed one runs to share its names.
+    generate(tmp_path, MARKDOWN.replace("print(a)", "print(a + 0)"))
+    stdout = run_pytest(tmp_path, "--doctest-modules")
+    assert "test_doc.py::test_code_10 PASSED" in stdout
+    assert "test_doc.py::test_code_20_output_23 PASSED" in stdout
+    assert "2 passed, 2 deselected" in stdout
+
+    # Failures are not recorded.
+    generate(tmp_path, MARKDOWN.replace("4\n```", "5\n```"))
+    for _ in range(2):
+        stdout = run_pytest(tmp_path, "--doctest-modules")
+        assert "1 failed, 3 deselected" in stdout
+
+    # A different environment does not use the passes.
+    stdout = run_pytest(tmp_path, "--phmdoctest-env", "other")
+    assert "3 passed" in stdout
+
+
+def test_compact(tmp_path):
+    """--compact test cases are deselected by their ids."""
+    generate(tmp_path, MARKDOWN, "--compact")
+    assert "3 passed" in run_pytest(tmp_path)
+    assert "3 deselected" in run_pytest(tmp_path)
+
+
+def test_plugin_collected(tmp_path):
+    """Markdown collected by the plugin has fingerprints."""
+    (tmp_path / "doc.md").write_text(MARKDOWN, encoding="utf-8")
+    assert "4 passed" in run_pytest(tmp_path, "--phmdoctest", "doc.md")
+    assert "4 deselected" in run_pytest(tmp_path, "--phmdoctest", "doc.md")
+
+
+def test_without_table(tmp_path):
+    """Test files generated without --fingerprints always run."""
+    (tmp_path / "test_plain.py").write_text("def test_a():\n    pass\n")
+    assert "1 passed" in run_pytest(tmp_path)
+    assert "1 passed" in run_pytest(tmp_path)
@@ -0,0 +1,170 @@
+"""Compare the line oriented scanner to the commonmark parser."""
+import glob
+import io
+import random
+
+import pytest
+
+import phmdoctest.direct
+import phmdoctest.scanner
+import phmdoctest.tool
+
+
+def summarize(nodes):
+    """Fields of each fenced code block node used by phmdoctest."""
+    summary = []
+    for node in nodes:
+        directives = phmdoctest.direct.get_directives(node)
+        summary.append(
+            (
+                node.info,
+                node.sourcepos[0][0],
+                node.literal,
+                [tuple(d) for d in directives],
+            )
+        )
+    return summary
+
+
+def commonmark_summary(doc):
+    """The commonmark parser is the oracle."""
+    return summarize(phmdoctest.tool.fenced_block_nodes(io.StringIO(doc)))
+
+
+def scanner_summary(doc):
+    """Raises NeedsCommonmark if the scanner gives up."""
+    return summarize(phmdoctest.scanner.scan(io.StringIO(doc)))
+
+
+markdown_files = sorted(
+    glob.glob("*.md") + glob.glob("doc/*.md") + glob.glob("tests/*.md")
+)
+
+
+@pytest.mark.parametrize("markdown_filename", markdown_files)
+def test_same_as_commonmark(markdown_filename):
+    """Scanner finds the same blocks in the project Markdown files."""
+    with open(markdown_filename, "r", encoding="utf-8") as fp:
+        doc = fp.read()
+    assert scanner_summary(doc) == commonmark_summary(doc)
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        "",
+        "```python\nprint(1)\n```\n",
+        "```python\nprint(1)\n```",
+        "```python\nprint(1)\n",
+        "~~~py\n```\n~~~~\n",
+        "````\n```\n````\n",
+        "   ```py3\n    a\n  b\nc\n   ```\n",
+        "```py `x`\n```\n",
+        "``` python  \n\n\n  ```   \n",
+        "\tindented\n```\n",
+        "text\n```python\ncode\n```\n",
+        "<!--phmdoctest-skip-->\n```python\n```\n",
+        "<!--phmdoctest-skip-->\n\n\n```python\nx\n```\n",
+        "<!--phmdoctest-label a-->\n<!-- other -->\n\n<!--phmdoctest-setup-->\n```py\n",
+        "  <!--phmdoctest-skip-->\n```python\nx\n```\n",
+        "<!--phmdoctest-skip--> trailing\n```python\nx\n```\n",
+        "<!--phmdoctest-label\n   multi-->\n```python\nx\n```\n",
+        "<!--phmdoctest-skip-->\ntext\n```python\nx\n```\n",
+        "text\n<!--phmdoctest-skip-->\n```python\nx\n```\n",
+        "<div>\n```python\nx\n```\n\n```\ny\n```\n",
+        "text\n<span>\n```python\nx\n```\n",
+        "<span>\n```python\nx\n```\n",
+        "<pre>\n\n```\n</pre>\n```py\nx\n```\n",
+        "    ```\n    code\n```py\nx\n```\n",
+        "# heading\n<!--phmdoctest-skip-->\n```py\n```\n",
+        "- item\n```python\nx\n```\n",
+        "> quote\n<!--phmdoctest-skip-->\n```python\nx\n```\n",
+        "- item\n\nparagraph\n<span>\n```py\n```\n",
+        "[a]: /url\n```py\nx\n```\n",
+        "<!--phmdoctest-skip-->\n\n[a]: /url\n\n```py\nx\n```\n",
+        "```python\r\nx\r\n```\r\n",
+        "```python\rx\r```\r",
+        "```python\nnul\0\n```\n",
+    ],
+)
+def test_examples_same_as_commonmark(doc):
+    """Scanner finds the same blocks in Markdown snippets."""
+    try:
+        got = scanner_summary(doc)
+    except phmdoctest.scanner.NeedsCommonmark:
+        got = None
+    # The fallback always gets the commonmark result.
+    want = commonmark_summary(doc)
+    nodes = phmdoctest.scanner.fenced_block_nodes(io.StringIO(doc))
+    assert summarize(nodes) == want
+    if got is not None:
+        assert got == want
+
+
+@pytest.mark.parametrize(
+    "doc",
+    [
+        "- item\n\n  ```python\n  x\n  ```\n",
+        "> ```python\n> x\n> ```\n",
+        "1. step\n   <!--phmdoctest-skip-->\n   ```py\n   x\n   ```\n",
+        "<!--phmdoctest-skip-->\n[a]: /url\n```py\nx\n```\n",
+        "- item\n<span>\n```py\nx\n```\n",
+    ],
+)
+def test_needs_commonmark(doc):
+    """Scanner gives up, fenced_block_nodes() falls back to commonmark."""
+    with pytest.raises(phmdoctest.scanner.NeedsCommonmark):
+        scanner_summary(doc)
+    nodes = phmdoctest.scanner.fenced_block_nodes(io.StringIO(doc))
+    assert summarize(nodes) == commonmark_summary(doc)
+
+
+def test_random_documents():
+    """Documents made from lines that stress the block start rules."""
+    vocabulary = [
+        "",
+        "text",
+        "```python",
+        "```",
+        "~~~py",
+        "````",
+        "  ```",
+        "    ```",
+        "\t```",
+        "<!--phmdoctest-skip-->",
+        "<!--phmdoctest-label foo-->",
+        "<!-- c",
+        "-->",
+        "  <!--phmdoctest-skip-->",
+        "<div>",
+        "<span>",
+        "<pre>",
+        "</pre>",
+        "- item",
+        "-",
+        "* * *",
+        "1. one",
+        "> quote",
+        "# head",
+        "===",
+        "---",
+        "[a]: /url",
+        "    indented",
+        "> ```",
+        "- ```",
+        "print(1)",
+    ]
+    rng = random.Random(2021)
+    num_scanned = 0
+    for _ in range(1000):
+        num_lines = rng.randint(1, 20)
+        lines = [rng.choice(vocabulary) for _ in range(num_lines)]
+        doc = "\n".join(lines) + rng.choice(["", "\n"])
+        try:
+            got = scanner_summary(doc)
+        except phmdoctest.scanner.NeedsCommonmark:
+            continue
+        assert got == commonmark_summary(doc), repr(doc)
+        num_scanned += 1
+    # Most documents should not need commonmark.
+    assert num_scanned > 500
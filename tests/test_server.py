@@ -0,0 +1,130 @@
+"""pytest test cases for phmdoctest-server and phmdoctest.client."""
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from click.testing import CliRunner
+import pytest
+
+import phmdoctest.client
+import phmdoctest.main
+import phmdoctest.server
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(socket, "AF_UNIX"), reason="needs Unix domain sockets"
+)
+
+
+@pytest.fixture()
+def socket_path(tmp_path):
+    """Start a server in a subprocess. Stop it at the end of the test."""
+    path = str(tmp_path / "phm.sock")
+    code = "import phmdoctest.server; phmdoctest.server.server_entry_point()"
+    process = subprocess.Popen([sys.executable, "-c", code, path])
+    deadline = time.time() + 30
+    while not phmdoctest.server.is_listening(path):
+        assert process.poll() is None, "server exited"
+        assert time.time() < deadline, "server did not start"
+        time.sleep(0.05)
+    yield path
+    if phmdoctest.server.is_listening(path):
+        phmdoctest.client.stop(path)
+    process.wait(timeout=30)
+
+
+def test_messages():
+    """Length prefixed JSON messages go both ways."""
+    a, b = socket.socketpair()
+    with a, b:
+        message = {"op": "run", "args": ["π.md"], "input": "x" * 100000}
+        phmdoctest.client.send_message(a, message)
+        assert phmdoctest.client.receive_message(b) == message
+        a.close()
+        assert phmdoctest.client.receive_message(b) is None
+
+
+def test_run(socket_path):
+    """Generate and report requests run in the client's directory."""
+    reply = phmdoctest.client.run(socket_path, ["doc/example1.md", "--report"])
+    assert reply["exit_code"] == 0
+    assert "doc/example1.md fenced blocks" in reply["stdout"]
+    local = CliRunner().invoke(
+        phmdoctest.main.entry_point, ["doc/example2.md", "--outfile", "-"]
+    )
+    reply = phmdoctest.client.run(socket_path, ["doc/example2.md", "--outfile", "-"])
+    assert reply["stdout"] == local.stdout
+    reply = phmdoctest.client.run(
+        socket_path, ["-", "--outfile", "-"], input="```python\nprint(1)\n```\n"
+    )
+    assert "def test_code_2():\n    print(1)\n" in reply["stdout"]
+    reply = phmdoctest.client.run(socket_path, ["nowhere.md"])
+    assert reply["exit_code"] == 2
+    assert "nowhere.md" in reply["stderr"]
+
+
+def test_client_environment(socket_path, tmp_path, monkeypatch):
+    """The client's PHMDOCTEST_ environment variables are used."""
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("PHMDOCTEST_CACHE_DIR", str(cache_dir))
+    outfile = str(tmp_path / "test_example2.py")
+    reply = phmdoctest.client.run(
+        socket_path, ["doc/example2.md", "--outfile", outfile]
+    )
+    assert reply["exit_code"] == 0
+    assert cache_dir.is_dir()
+    monkeypatch.delenv("PHMDOCTEST_CACHE_DIR")
+    assert phmdoctest.client.phmdoctest_environment() == {}
+
+
+def test_run_and_pytest(socket_path):
+    """pytest runs on the server and the results come back."""
+    reply = phmdoctest.client.run_and_pytest(
+        socket_path,
+        "phmdoctest doc/example2.md --outfile test_example2.py",
+        pytest_options=["--doctest-modules"],
+        junit_family="xunit2",
+    )
+    assert reply["exit_code"] == 0
+    assert reply["pytest_exit_code"] == 0
+    assert "passed" in reply["pytest_output"]
+    assert 'failures="0"' in reply["junit_xml"]
+    assert reply["outfile"].startswith('"""pytest file built from doc/example2.md')
+
+
+def test_errors(socket_path):
+    """Bad requests get an error. A second server can't start."""
+    reply = phmdoctest.client.request(socket_path, {"op": "nope"})
+    assert reply == {"error": "unknown op 'nope'"}
+    reply = phmdoctest.client.request(socket_path, {"op": "run"})
+    assert reply == {"error": "KeyError: 'args'"}
+    result = CliRunner().invoke(phmdoctest.server.server_entry_point, [socket_path])
+    assert result.exit_code == 1
+    assert "A server is already listening on" in result.output
+
+
+def test_stop(socket_path):
+    """The server removes the socket file when it stops."""
+    phmdoctest.client.stop(socket_path)
+    deadline = time.time() + 30
+    while os.path.exists(socket_path):
+        assert time.time() < deadline, "server did not stop"
+        time.sleep(0.05)
+
+
+def test_client_without_server(tmp_path, capsys):
+    """With no server the client runs the command itself."""
+    path = str(tmp_path / "none.sock")
+    with pytest.raises(SystemExit) as exc_info:
+        phmdoctest.client.main([path, "doc/example1.md", "--report"])
+    assert exc_info.value.code == 0
+    assert "doc/example1.md fenced blocks" in capsys.readouterr().out
+
+
+def test_client_main(socket_path, capsys):
+    """The client prints the output and returns the exit code."""
+    assert phmdoctest.client.main([socket_path, "doc/example1.md", "--report"]) == 0
+    assert "doc/example1.md fenced blocks" in capsys.readouterr().out
+    assert phmdoctest.client.main([socket_path, "nowhere.md"]) == 2
+    assert "nowhere.md" in capsys.readouterr().err
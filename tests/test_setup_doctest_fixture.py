@@ -10,7 +10,6 @@ pytestmark = pytest.mark.usefixtures("_phm_setup_doctest_teardown")
 def test_setup_doctest_teardown_fixture(_phm_setup_doctest_teardown, managenamespace):
     """Show the fixture runs and the namespace is created."""
     # This is the fixture with placeholders for setup and teardown code.
-    # There is no way to get code coverage of the
-    # doctest_namespace assignment in the loop.
+    # The empty namespace is synced to doctest_namespace.
     items = managenamespace(operation="copy")
     assert items == dict()
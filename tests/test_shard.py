@@ -0,0 +1,177 @@
+"""pytest test cases for sharding the test file."""
+import io
+import os
+import re
+
+from click.testing import CliRunner
+import pytest
+
+from phmdoctest.entryargs import Args
+import phmdoctest.cases
+import phmdoctest.chains
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.main
+import phmdoctest.shard
+import phmdoctest.tool
+
+
+def invoke(args):
+    runner = CliRunner()
+    return runner.invoke(cli=phmdoctest.main.entry_point, args=args)
+
+
+def make_args(**kwargs):
+    fields = dict(
+        markdown_file="doc.md",
+        outfile="-",
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    fields.update(kwargs)
+    return Args(**fields)
+
+
+def assigned_blocks(markdown, **kwargs):
+    """Blocks of the Markdown with their roles assigned."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    phmdoctest.fillrole.assign_roles(make_args(**kwargs), blocks)
+    return blocks
+
+
+MARKDOWN = """\
+```python
+a = 1
+```
+
+<!--phmdoctest-share-names-->
+```python
+b = 2
+```
+
+```python
+print(b)
+```
+```
+2
+```
+
+<!--phmdoctest-clear-names-->
+```python
+c = 3
+```
+
+```python
+d = 4
+```
+
+```py
+>>> 1 + 1
+2
+```
+
+```py
+>>> 2 + 2
+4
+```
+"""
+
+
+def test_partition():
+    """Heaviest units go to the lightest shard."""
+    blocks = assigned_blocks(
+        "".join("```python\n" + "x = 1\n" * n + "```\n" for n in [1, 5, 2, 2, 4])
+    )
+    units = phmdoctest.chains.dependency_units(blocks, setup_doctest=False)
+    shards = phmdoctest.shard.partition(units, 2)
+    weights = [sum(phmdoctest.shard.block_weight(b) for b in s) for s in shards]
+    assert weights == [9, 10]
+    assert shards[0] == {blocks[1], blocks[3]}
+    assert phmdoctest.shard.partition(units, 7)[6] == set()
+
+
+def function_names(text):
+    return re.findall(r"^def (\w+)\(", text, flags=re.MULTILINE)
+
+
+@pytest.mark.parametrize("count", [1, 2, 3, 20])
+def test_shards_cover_the_blocks(count):
+    """Each test function is in exactly one shard with the same name."""
+    blocks = assigned_blocks(MARKDOWN, teardown="d = 4")
+    want = function_names(phmdoctest.cases.build_test_cases(make_args(), blocks))
+    got = []
+    for index in range(1, count + 1):
+        args = make_args(shard=(index, count))
+        text = phmdoctest.shard.build_test_cases(args, blocks)
+        assert "shard {}/{}".format(index, count) in text
+        assert "def _phm_setup_teardown(managenamespace):" in text
+        got.extend(function_names(text))
+    assert got.count("_phm_setup_teardown") == count
+    assert got.count("test_nothing_passes") == max(0, count - 4)
+    fixtures = ["_phm_setup_teardown", "test_nothing_passes"]
+    got = [name for name in got if name not in fixtures]
+    want.remove("_phm_setup_teardown")
+    assert sorted(got) == sorted(want)
+
+
+def test_empty_shard_passes():
+    """A shard without blocks passes even with --fail-nocode."""
+    blocks = assigned_blocks(MARKDOWN)
+    args = make_args(shard=(8, 8), fail_nocode=True)
+    text = phmdoctest.shard.build_test_cases(args, blocks)
+    assert function_names(text) == ["test_nothing_passes"]
+
+
+def test_setup_shards():
+    """With setup the code blocks spread over the shards."""
+    markdown = "```python\nimport math\n```\n" + "```python\nassert math.pi\n```\n" * 3
+    blocks = assigned_blocks(markdown, setup="FIRST")
+    for index in range(1, 4):
+        args = make_args(setup="FIRST", shard=(index, 3))
+        text = phmdoctest.shard.build_test_cases(args, blocks)
+        assert "    import math\n" in text
+        assert len(function_names(text)) == 2
+
+
+def test_split(tmp_path):
+    """--split writes a test file for each shard."""
+    outfile = str(tmp_path / "test_doc.py")
+    result = invoke(["doc/example2.md", "--split", "3", "--outfile", outfile])
+    assert result.exit_code == 0
+    names = sorted(os.listdir(str(tmp_path)))
+    assert names == ["test_doc_1.py", "test_doc_2.py", "test_doc_3.py"]
+    result = invoke(["doc/example2.md", "--shard", "2/3", "--outfile", "-"])
+    assert result.exit_code == 0
+    with open(str(tmp_path / "test_doc_2.py"), "r", encoding="utf-8") as fp:
+        assert fp.read() == result.stdout
+
+
+@pytest.mark.parametrize(
+    "options, message",
+    [
+        (["--shard", "0/2", "--outfile", "-"], "must be INDEX/COUNT"),
+        (["--shard", "3/2", "--outfile", "-"], "must be INDEX/COUNT"),
+        (["--shard", "two", "--outfile", "-"], "must be INDEX/COUNT"),
+        (["--split", "2", "--shard", "1/2", "--outfile", "x.py"], "not both"),
+        (["--split", "2", "--outfile", "-"], "--split needs an --outfile"),
+        (["--split", "0", "--outfile", "x.py"], "--split"),
+    ],
+)
+def test_bad_options(options, message):
+    result = invoke(["doc/example2.md"] + options)
+    assert result.exit_code != 0
+    assert message in result.output
@@ -0,0 +1,104 @@
+"""pytest test cases for running pytest in process and run_many()."""
+import os
+import sys
+from xml.etree import ElementTree
+
+import phmdoctest.simulator
+
+
+def outcomes(junit_xml):
+    """Map test case name to failed."""
+    return {
+        testcase.get("name"): testcase.find("failure") is not None
+        for testcase in ElementTree.fromstring(junit_xml).iter("testcase")
+    }
+
+
+def test_in_process_same_as_subprocess(tmp_path):
+    """Results are the same as running pytest in a subprocess."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(
+        "```python\nprint(1)\n```\n```\n2\n```\n```py\n>>> 1 + 1\n2\n```\n",
+        encoding="utf-8",
+    )
+    command = "phmdoctest {} --outfile test_doc.py".format(markdown_path)
+    statuses = [
+        phmdoctest.simulator.run_and_pytest(
+            command,
+            pytest_options=["--doctest-modules"],
+            junit_family="xunit2",
+            in_process=in_process,
+        )
+        for in_process in (False, True)
+    ]
+    assert statuses[0].outfile == statuses[1].outfile
+    assert statuses[0].pytest_exit_code == statuses[1].pytest_exit_code == 1
+    assert outcomes(statuses[1].junit_xml) == {
+        "test_code_2_output_5": True,
+        "test_doc.session_00001_line_8": False,
+    }
+    assert outcomes(statuses[0].junit_xml) == outcomes(statuses[1].junit_xml)
+
+
+def test_in_process_restores_modules(monkeypatch):
+    """The test file is imported even if its module name is taken."""
+    sentinel = object()
+    monkeypatch.setitem(sys.modules, "test_example1", sentinel)
+    before = set(sys.modules)
+    status = phmdoctest.simulator.run_and_pytest(
+        "phmdoctest doc/example1.md --outfile test_example1.py",
+        pytest_options=[],
+        in_process=True,
+    )
+    assert status.pytest_exit_code == 0
+    assert sys.modules["test_example1"] is sentinel
+    assert not [name for name in set(sys.modules) - before if "example1" in name]
+
+
+def test_in_process_keeps_other_modules(tmp_path, monkeypatch):
+    """Only the test module and its package are removed afterwards.
+
+    Plugins are not autoloaded during the run.
+    """
+    monkeypatch.delitem(sys.modules, "colorsys", raising=False)
+    monkeypatch.delenv("PYTEST_DISABLE_PLUGIN_AUTOLOAD", raising=False)
+    package = tmp_path / "pkg_for_simulator"
+    package.mkdir()
+    (package / "__init__.py").write_text("", encoding="utf-8")
+    (package / "test_mod_for_simulator.py").write_text(
+        "import colorsys\n"
+        "import os\n\n\n"
+        "def test_autoload():\n"
+        '    assert os.environ["PYTEST_DISABLE_PLUGIN_AUTOLOAD"] == "1"\n',
+        encoding="utf-8",
+    )
+    exit_code = phmdoctest.simulator.run_pytest_in_process(
+        ["-q", str(package / "test_mod_for_simulator.py") + "::test_autoload"]
+    )
+    assert exit_code == 0
+    assert "colorsys" in sys.modules
+    assert not [name for name in sys.modules if "_for_simulator" in name]
+    assert "PYTEST_DISABLE_PLUGIN_AUTOLOAD" not in os.environ
+
+
+def test_run_many():
+    """Statuses are returned in the order of the commands."""
+    commands = [
+        "phmdoctest doc/example2.md --outfile test_example2.py",
+        "phmdoctest doc/example1.md --bogus --outfile test_example1.py",
+        "phmdoctest doc/example1.md --report --outfile test_example1.py",
+    ]
+    statuses = phmdoctest.simulator.run_many(
+        commands,
+        pytest_options=["--doctest-modules"],
+        junit_family="xunit2",
+        in_process=True,
+        workers=2,
+    )
+    assert [s.runner_status.exit_code for s in statuses] == [0, 2, 0]
+    assert [s.pytest_exit_code for s in statuses] == [0, None, 0]
+    assert "test_nothing_passes" not in statuses[0].junit_xml
+    assert "doc/example1.md" in statuses[2].runner_status.stdout
+    assert statuses[2].runner_status.exc_info is None
+    sequential = phmdoctest.simulator.run_many(commands[:1])
+    assert sequential[0].outfile == statuses[0].outfile
@@ -0,0 +1,79 @@
+"""pytest test cases for --stamp and --check."""
+import shutil
+
+
+import phmdoctest.batch
+import phmdoctest.main
+import phmdoctest.simulator
+
+
+def invoke(args):
+    runner = phmdoctest.simulator.cli_runner()
+    return runner.invoke(cli=phmdoctest.main.entry_point, args=args)
+
+
+def test_stamp_and_check(tmp_path, monkeypatch):
+    """Stamped file is up to date until the Markdown file changes."""
+    markdown = str(tmp_path / "example1.md")
+    shutil.copy("doc/example1.md", markdown)
+    outfile = tmp_path / "test_example1.py"
+    plain = invoke([markdown, "--outfile", "-", "--no-cache"])
+    result = invoke([markdown, "--outfile", str(outfile), "--stamp", "--no-cache"])
+    assert result.exit_code == 0
+    stamp, rest = outfile.read_text(encoding="utf-8").split("\n", 1)
+    assert stamp.startswith("# phmdoctest-stamp version=")
+    assert rest == plain.stdout
+
+    def fail(*args):
+        raise AssertionError("parsed the Markdown")
+
+    monkeypatch.setattr(phmdoctest.main, "generate", fail)
+    check = [markdown, "--outfile", str(outfile), "--check"]
+    assert invoke(check).exit_code == 0
+
+    # Different options.
+    result = invoke(check + ["--fail-nocode"])
+    assert result.exit_code == 1
+    assert "test_example1.py is out of date." in result.stderr
+
+    # Changed Markdown.
+    with open(markdown, "a", encoding="utf-8") as fp:
+        fp.write("\nmore text\n")
+    result = invoke(check)
+    assert result.exit_code == 1
+    assert "is out of date. Generate it again from" in result.stderr
+
+
+def test_check_unstamped(tmp_path):
+    """A test file generated without --stamp is never up to date."""
+    outfile = str(tmp_path / "test_example1.py")
+    invoke(["doc/example1.md", "--outfile", outfile])
+    result = invoke(["doc/example1.md", "--outfile", outfile, "--check"])
+    assert result.exit_code == 1
+    assert "has no phmdoctest-stamp. Generate it with --stamp." in result.stderr
+    missing = str(tmp_path / "missing.py")
+    result = invoke(["doc/example1.md", "--outfile", missing, "--check"])
+    assert result.exit_code == 1
+
+
+def test_check_needs_paths():
+    """--check can't check stdout."""
+    result = invoke(["doc/example1.md", "--outfile", "-", "--check"])
+    assert result.exit_code == 1
+    assert "--check needs a MARKDOWN_FILE path and an --outfile path." in (
+        result.stderr
+    )
+
+
+def test_batch_check(tmp_path):
+    """phmdoctest-batch --check reports the stale test files."""
+    runner = phmdoctest.simulator.cli_runner()
+    outdir = str(tmp_path)
+    paths = ["doc/example1.md", "doc/example2.md", "--outdir", outdir, "-j", "1"]
+    result = runner.invoke(phmdoctest.batch.batch_entry_point, paths + ["--stamp"])
+    assert result.exit_code == 0
+    (tmp_path / "test_example2.py").write_text("stale\n", encoding="utf-8")
+    result = runner.invoke(phmdoctest.batch.batch_entry_point, paths + ["--check"])
+    assert result.exit_code == 1
+    assert result.stdout == "2 Markdown files, 1 test files up to date, 1 failed.\n"
+    assert "test_example2.py has no phmdoctest-stamp." in result.stderr
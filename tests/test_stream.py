@@ -0,0 +1,169 @@
+"""Compare streaming test file generation to the list of blocks version."""
+import glob
+import io
+import random
+
+import click
+from click.testing import CliRunner
+import pytest
+
+from phmdoctest.entryargs import Args
+import phmdoctest.cases
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.main
+import phmdoctest.report
+import phmdoctest.scanner
+import phmdoctest.stream
+import phmdoctest.tool
+
+
+def make_args(outfile, **kwargs):
+    """Args with defaults for the fields not in kwargs."""
+    fields = dict(
+        markdown_file="doc.md",
+        outfile=outfile,
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    fields.update(kwargs)
+    return Args(**fields)
+
+
+def batch_result(args, doc, capsys):
+    """Generate from the list of all the blocks."""
+    try:
+        nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(doc))
+        blocks = phmdoctest.fenced.convert_nodes(nodes)
+        phmdoctest.fillrole.assign_roles(args, blocks)
+        if args.is_report:
+            phmdoctest.report.print_report(args, blocks)
+        text = phmdoctest.cases.build_test_cases(args, blocks)
+    except click.ClickException as exc:
+        return capsys.readouterr().out, "error: " + exc.format_message()
+    return capsys.readouterr().out, text
+
+
+def stream_result(args, doc, capsys, tmp_path):
+    """Generate while reading the lines."""
+    outfile = tmp_path / "test_doc.py"
+    args = args._replace(outfile=str(outfile))
+    try:
+        phmdoctest.stream.write_test_cases(args, io.StringIO(doc))
+    except click.ClickException as exc:
+        assert not outfile.exists()
+        return capsys.readouterr().out, "error: " + exc.format_message()
+    text = outfile.read_text(encoding="utf-8")
+    outfile.unlink()
+    return capsys.readouterr().out, text
+
+
+def check_same(args, doc, capsys, tmp_path):
+    """Streaming gets the same report, test file, or exception."""
+    want = batch_result(args, doc, capsys)
+    got = stream_result(args, doc, capsys, tmp_path)
+    assert got == want
+
+
+option_sets = [
+    dict(),
+    dict(is_report=True),
+    dict(fail_nocode=True, skips=("FIRST",)),
+    dict(skips=("LAST", "SECOND", "import")),
+    dict(setup="FIRST", teardown="LAST", setup_doctest=True),
+    dict(setup="import", teardown="print", is_report=True),
+    dict(stream_output=True, setup="FIRST"),
+    dict(compact=True, setup="FIRST", skips=("LAST",)),
+]
+
+
+markdown_files = sorted(
+    glob.glob("*.md") + glob.glob("doc/*.md") + glob.glob("tests/*.md")
+)
+
+
+@pytest.mark.parametrize("options", option_sets)
+@pytest.mark.parametrize("markdown_filename", markdown_files)
+def test_same_as_batch(markdown_filename, options, capsys, tmp_path):
+    """Streaming generates the same output from the project Markdown files."""
+    with open(markdown_filename, "r", encoding="utf-8") as fp:
+        doc = fp.read()
+    args = make_args("-", markdown_file=markdown_filename, **options)
+    check_same(args, doc, capsys, tmp_path)
+
+
+def test_report_only(capsys):
+    """No outfile, just the report."""
+    args = make_args(None, is_report=True)
+    with open("doc/example2.md", "r", encoding="utf-8") as fp:
+        phmdoctest.stream.write_test_cases(args, fp)
+    assert "doc.md fenced blocks" in capsys.readouterr().out
+
+
+def test_needs_commonmark_writes_nothing(capsys, tmp_path):
+    """The outfile is not created if the scanner gives up."""
+    outfile = tmp_path / "test_doc.py"
+    args = make_args(str(outfile), is_report=True)
+    doc = "- item\n\n  ```python\n  print(1)\n  ```\n"
+    with pytest.raises(phmdoctest.scanner.NeedsCommonmark):
+        phmdoctest.stream.write_test_cases(args, io.StringIO(doc))
+    assert not outfile.exists()
+    assert capsys.readouterr().out == ""
+
+
+def test_random_documents(capsys, tmp_path):
+    """Documents made from blocks and directives in random order."""
+    vocabulary = [
+        "```python\nprint('hello')\n```\n",
+        "```python\nimport math\nb = 10\n```\n",
+        "```py3\n```\n",
+        "```\nhello\n```\n",
+        "```\n```\n",
+        "```pycon\n>>> print(1)\n1\n```\n",
+        "```python\n>>> 1 + 1\n2\n```\n",
+        "```text\nnot python\n```\n",
+        "<!--phmdoctest-skip-->\n",
+        "<!--phmdoctest-setup-->\n",
+        "<!--phmdoctest-teardown-->\n",
+        "<!--phmdoctest-label test_it-->\n",
+        "<!--phmdoctest-label 9bad-->\n",
+        "<!--phmdoctest-mark.skip-->\n",
+        "<!--phmdoctest-mark.skipif<3.7-->\n",
+        "<!--phmdoctest-mark.skipif<3.x-->\n",
+        "<!--phmdoctest-share-names-->\n",
+        "<!--phmdoctest-clear-names-->\n",
+        "text\n",
+        "\n",
+    ]
+    rng = random.Random(2021)
+    for _ in range(300):
+        doc = "".join(rng.choice(vocabulary) for _ in range(rng.randint(0, 12)))
+        options = rng.choice(option_sets)
+        args = make_args("-", **options)
+        check_same(args, doc, capsys, tmp_path)
+
+
+def test_cli_falls_back_to_commonmark():
+    """Code blocks in a list item are found by the commonmark parser."""
+    runner = CliRunner()
+    doc = "- item\n\n  ```python\n  print(1)\n  ```\n\n  ```\n  1\n  ```\n"
+    result = runner.invoke(
+        cli=phmdoctest.main.entry_point,
+        args=["-", "--outfile", "-"],
+        input=doc,
+    )
+    assert result.exit_code == 0
+    assert "def test_code_4_output_8(capsys):" in result.output
@@ -0,0 +1,116 @@
+"""pytest test cases for --stream-output and the expectoutput fixture."""
+import itertools
+import sys
+
+import pytest
+
+from phmdoctest.fixture import OutputChecker, expectoutput
+import phmdoctest.simulator
+
+
+def checker_for(expected):
+    """OutputChecker that is not installed as sys.stdout."""
+    return OutputChecker(expected, sys.stdout)
+
+
+def test_same_output():
+    """Lines split across writes and \\r\\n line endings are ok."""
+    checker = checker_for("one\ntwo\n\nthree")
+    for text in ["o", "ne\r", "\ntw", "o\n", "\n", "three\n"]:
+        checker.write(text)
+    checker.finish()
+
+
+def test_different_line_fails_at_once():
+    """A line fails as soon as the printed part can't match."""
+    checker = checker_for("one\ntwo\n")
+    checker.write("one\n")
+    with pytest.raises(AssertionError) as exc_info:
+        checker.write("tx")
+    assert "Printed line 2 is different" in str(exc_info.value)
+    assert "expected: 'two'" in str(exc_info.value)
+    assert "printed:  'tx'" in str(exc_info.value)
+    # Keeps failing even if the exception was caught.
+    with pytest.raises(AssertionError):
+        checker.write("o\n")
+    with pytest.raises(AssertionError):
+        checker.finish()
+
+
+def test_too_many_lines():
+    """Printing more lines than expected fails on the extra line."""
+    checker = checker_for("0\n1\n")
+    with pytest.raises(AssertionError) as exc_info:
+        for number in itertools.count():
+            checker.write("{}\n".format(number))
+    assert "Printed line 3" in str(exc_info.value)
+    assert "expected: no more lines" in str(exc_info.value)
+
+
+def test_missing_lines():
+    """finish() fails if fewer lines were printed."""
+    checker = checker_for("a\nb\nc\n")
+    checker.write("a\nb")
+    with pytest.raises(AssertionError) as exc_info:
+        checker.finish()
+    assert "Printed 2 lines. Expected 3 lines." in str(exc_info.value)
+
+
+def test_fixture_restores_stdout(expectoutput):
+    """The checker is sys.stdout until finish()."""
+    original = sys.stdout
+    checker = expectoutput("hello\n")
+    assert sys.stdout is checker
+    print("hello")
+    checker.finish()
+    assert sys.stdout is original
+
+
+MARKDOWN = """\
+<!--phmdoctest-share-names-->
+```python
+words = ["alpha", "beta"]
+print(*words, sep="\\n")
+```
+```
+alpha
+beta
+```
+
+```python
+import itertools
+for number in itertools.count():
+    print(number)
+```
+```
+0
+1
+```
+
+```python
+print(len(words))
+```
+```
+2
+```
+"""
+
+
+def test_generated_tests(tmp_path):
+    """Generated tests pass or fail fast, including an endless loop."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(MARKDOWN, encoding="utf-8")
+    command = "phmdoctest {} --stream-output --outfile test_doc.py".format(
+        markdown_path
+    )
+    status = phmdoctest.simulator.run_and_pytest(
+        command, pytest_options=["-q"], junit_family="xunit2"
+    )
+    assert status.runner_status.exit_code == 0
+    outfile = status.outfile
+    assert "from phmdoctest.fixture import expectoutput\n" in outfile
+    assert "_phm_compare_exact" not in outfile
+    assert status.pytest_exit_code == 1
+    assert 'tests="3"' in status.junit_xml
+    assert 'failures="1"' in status.junit_xml
+    assert "Printed line 3 is different" in status.junit_xml
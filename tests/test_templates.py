@@ -0,0 +1,76 @@
+"""pytest test cases for the precompiled code templates."""
+import inspect
+import io
+
+import pytest
+
+from phmdoctest.entryargs import Args
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.cases
+import phmdoctest.templates
+import phmdoctest.tool
+
+
+def code_block(markdown):
+    """The Python code block in the Markdown with its role assigned."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    args = Args(
+        markdown_file="x.md",
+        outfile="-",
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    phmdoctest.fillrole.assign_roles(args, blocks)
+    return blocks[0]
+
+
+def test_split_and_fill():
+    """fill() puts values between segments and replaces first occurrences."""
+    template = phmdoctest.templates.split("a-Y-b-X-c-X", ["X", "Y"])
+    assert template.segments == ("a-", "-b-", "-c-X")
+    assert template.placeholders == ("Y", "X")
+    values = {"X": "1", "Y": "2"}
+    assert phmdoctest.templates.fill(template, values) == "a-2-b-1-c-X"
+    with pytest.raises(AssertionError):
+        phmdoctest.templates.split("a-b", ["X"])
+
+
+def test_source_looked_up_once(monkeypatch):
+    """Templates are split once per process, not once per block."""
+    block = code_block("```python\nprint('hi')\n```\n")
+    phmdoctest.cases.test_case(block, set())
+    calls = []
+    original = inspect.getsource
+
+    def counting_getsource(obj):
+        calls.append(obj)
+        return original(obj)
+
+    monkeypatch.setattr(inspect, "getsource", counting_getsource)
+    for _ in range(3):
+        phmdoctest.cases.test_case(block, set())
+    assert calls == []
+
+
+def test_output_placeholder_in_code():
+    """Code that contains the expected output placeholder is kept as is."""
+    code_line = "x = '<<<replaced>>>'\n"
+    block = code_block("```python\n" + code_line + "```\n```\nhello\n```\n")
+    src = phmdoctest.cases.test_case(block, set())
+    assert "    " + code_line in src
+    assert '_phm_expected_str = """\\\nhello\n"""' in src
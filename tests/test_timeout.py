@@ -0,0 +1,190 @@
+"""pytest test cases for --timeout and the timeout directive."""
+import io
+import signal
+import threading
+from xml.etree import ElementTree
+
+import click
+import pytest
+
+from phmdoctest.entryargs import Args
+from phmdoctest.fenced import Role
+from phmdoctest.functions import _phm_time_limit
+import phmdoctest.analysis
+import phmdoctest.cases
+import phmdoctest.fenced
+import phmdoctest.fillrole
+import phmdoctest.simulator
+import phmdoctest.tool
+
+
+MARKDOWN = """\
+```python
+print("fast")
+```
+```
+fast
+```
+
+<!--phmdoctest-timeout 0.5-->
+```python
+while True:
+    pass
+```
+
+```python
+import time
+time.sleep(30)
+```
+
+<!--phmdoctest-timeout 0-->
+```python
+x = 1
+```
+"""
+
+
+def make_args(**kwargs):
+    """Args for generating a test file from a Markdown string."""
+    fields = dict(
+        markdown_file="doc.md",
+        outfile="-",
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    fields.update(kwargs)
+    return Args(**fields)
+
+
+def assigned_blocks(markdown, args):
+    """Blocks in the Markdown with their roles assigned."""
+    nodes = phmdoctest.tool.fenced_block_nodes(io.StringIO(markdown))
+    blocks = phmdoctest.fenced.convert_nodes(nodes)
+    phmdoctest.fillrole.assign_roles(args, blocks)
+    return blocks
+
+
+def build(markdown, **kwargs):
+    """Generate the test file from the Markdown."""
+    args = make_args(**kwargs)
+    return phmdoctest.cases.build_test_cases(args, assigned_blocks(markdown, args))
+
+
+def test_directive_overrides_option():
+    """The directive sets the block's seconds. Zero is no limit."""
+    blocks = assigned_blocks(MARKDOWN, make_args())
+    code_blocks = [b for b in blocks if b.role == Role.CODE]
+    analysis = phmdoctest.analysis.analyze(blocks)
+    assert analysis.needs_time_limit
+    assert [analysis.time_limit(b, 2.0) for b in code_blocks] == [2.0, 0.5, 2.0, 0]
+    assert [analysis.time_limit(b, None) for b in code_blocks] == [0, 0.5, 0, 0]
+
+
+@pytest.mark.parametrize("value", ["x", "-1", "inf", ""])
+def test_invalid_directive(value):
+    """The value must be a number of seconds >= zero."""
+    markdown = "<!--phmdoctest-timeout {}-->\n```python\na = 1\n```\n".format(value)
+    analysis = phmdoctest.analysis.analyze(assigned_blocks(markdown, make_args()))
+    with pytest.raises(click.ClickException) as exc_info:
+        analysis.raise_directive_error()
+    assert exc_info.value.message == (
+        "<!--phmdoctest-timeout {}-->\n".format(value)
+        + "at markdown file line 1 must be a number of seconds >= zero."
+    )
+
+
+def test_decorators():
+    """Test functions of blocks with a limit are decorated."""
+    text = build(MARKDOWN, timeout=2.0)
+    assert "from phmdoctest.functions import _phm_time_limit\n" in text
+    assert "\n@_phm_time_limit(2.0, 2)\ndef test_code_2_output_5(capsys):\n" in text
+    assert "\n@_phm_time_limit(0.5, 10)\ndef test_code_10():\n" in text
+    assert "\n\ndef test_code_21():\n" in text
+    assert build(MARKDOWN.replace("timeout 0.5", "timeout 0")) == build(
+        MARKDOWN.replace("timeout 0.5", "timeout 0"), timeout=0.0
+    )
+    assert "_phm_time_limit" not in build(MARKDOWN.replace("timeout 0.5", "timeout 0"))
+
+
+def test_compact_rows():
+    """A block with a limit has its seconds at the end of its row."""
+    text = build(MARKDOWN, timeout=2.0, compact=True)
+    assert "(2, 'print(\"fast\")\\n', 'fast\\n', '', 2.0), id=" in text
+    assert "(10, 'while True:\\n    pass\\n', '', '', 0.5), id=" in text
+    assert "(21, 'x = 1\\n', '', ''), id=" in text
+    assert "_phm_time_limit" not in text
+
+
+@pytest.mark.parametrize("option", ["", "--compact"])
+def test_generated_tests(tmp_path, option):
+    """Blocks that run too long fail with their Markdown line."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(MARKDOWN, encoding="utf-8")
+    command = "phmdoctest {} --timeout 0.5 {} --outfile test_doc.py".format(
+        markdown_path, option
+    )
+    status = phmdoctest.simulator.run_and_pytest(
+        command, pytest_options=["-q"], junit_family="xunit2"
+    )
+    assert status.runner_status.exit_code == 0
+    if not option:
+        assert "@_phm_time_limit(0.5, 15)\ndef test_code_15():\n" in status.outfile
+    assert status.pytest_exit_code == 1
+    junit = status.junit_xml
+    assert 'tests="4"' in junit
+    assert 'failures="2"' in junit
+    messages = [
+        failure.get("message")
+        for failure in ElementTree.fromstring(junit).iter("failure")
+    ]
+    assert [m.split(": ", 1)[-1] for m in messages] == [
+        "Code block at Markdown line 10 did not finish in 0.5 seconds.",
+        "Code block at Markdown line 15 did not finish in 0.5 seconds.",
+    ]
+
+
+def test_watchdog_thread():
+    """Off the main thread a watchdog interrupts the code."""
+    errors = []
+
+    def spin():
+        try:
+            with _phm_time_limit(0.2, 7):
+                while True:
+                    pass
+        except pytest.fail.Exception as exc:
+            errors.append(str(exc))
+
+    thread = threading.Thread(target=spin)
+    thread.start()
+    thread.join(10)
+    assert not thread.is_alive()
+    assert errors == ["Code block at Markdown line 7 did not finish in 0.2 seconds."]
+
+
+@pytest.mark.skipif(not hasattr(signal, "setitimer"), reason="needs SIGALRM")
+def test_restores_alarm():
+    """An alarm set by the caller keeps running with its handler."""
+    previous = signal.signal(signal.SIGALRM, signal.SIG_IGN)
+    try:
+        signal.setitimer(signal.ITIMER_REAL, 60)
+        with _phm_time_limit(5, 1):
+            pass
+        assert signal.getsignal(signal.SIGALRM) == signal.SIG_IGN
+        assert 55 < signal.getitimer(signal.ITIMER_REAL)[0] <= 60
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
@@ -0,0 +1,110 @@
+"""pytest test cases for stage timings."""
+import json
+import tracemalloc
+
+from click.testing import CliRunner
+
+from phmdoctest.entryargs import Args
+import phmdoctest.main
+import phmdoctest.timings
+
+
+def test_not_recording():
+    """stage() and timed() do nothing when not recording."""
+    assert phmdoctest.timings.current() is None
+    with phmdoctest.timings.stage("nothing"):
+        pass
+    assert list(phmdoctest.timings.timed([1, 2], "items")) == [1, 2]
+
+
+def test_nested_stages():
+    """Nested stages are recorded with depth and memory."""
+    with phmdoctest.timings.recording() as recorder:
+        assert phmdoctest.timings.current() is recorder
+        with phmdoctest.timings.stage("outer", label="x"):
+            data = [0] * 100000
+            del data
+            assert list(phmdoctest.timings.timed(range(3), "inner")) == [0, 1, 2]
+    assert phmdoctest.timings.current() is None
+    names = [(r.name, r.depth) for r in recorder.records]
+    assert names == [("inner", 1)] * 4 + [("outer", 0)]
+    outer = recorder.records[-1]
+    assert outer.details == {"label": "x"}
+    assert outer.peak_bytes >= 800000
+    assert outer.wall >= sum(r.wall for r in recorder.records[:-1])
+    totals = recorder.totals()
+    assert totals["inner"]["count"] == 4
+    assert totals["outer"]["peak_bytes"] == outer.peak_bytes
+
+
+def test_no_reset_peak(monkeypatch):
+    """Without tracemalloc.reset_peak() the peaks are None."""
+    monkeypatch.delattr(tracemalloc, "reset_peak", raising=False)
+    with phmdoctest.timings.recording() as recorder:
+        with phmdoctest.timings.stage("outer"):
+            with phmdoctest.timings.stage("inner"):
+                pass
+    assert [r.peak_bytes for r in recorder.records] == [None, None]
+    assert recorder.totals()["outer"]["peak_bytes"] is None
+    assert json.loads(recorder.to_json())["stages"][0]["peak_bytes"] is None
+
+
+def test_generate_stages(tmp_path):
+    """The Python API records the pipeline stages."""
+    args = Args(
+        markdown_file="doc/example2.md",
+        outfile=str(tmp_path / "test_example2.py"),
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    with phmdoctest.timings.recording(trace_memory=False) as recorder:
+        phmdoctest.main.generate(args)
+    totals = recorder.totals()
+    assert totals["generate"]["count"] == 1
+    assert totals["cases.block"]["count"] == 7
+    for name in ["scanner.scan", "fillrole.assign", "write outfile"]:
+        assert name in totals
+    assert all(r.peak_bytes == 0 for r in recorder.records)
+
+
+def test_timings_options(tmp_path):
+    """--timings writes JSON and --timings-trace writes trace events."""
+    timings_path = tmp_path / "timings.json"
+    trace_path = tmp_path / "trace.json"
+    runner = CliRunner()
+    result = runner.invoke(
+        cli=phmdoctest.main.entry_point,
+        args=[
+            "tests/direct.md",
+            "--outfile",
+            str(tmp_path / "test_direct.py"),
+            "--no-cache",
+            "--timings",
+            str(timings_path),
+            "--timings-trace",
+            str(trace_path),
+        ],
+    )
+    # The timings are written even when phmdoctest fails.
+    assert result.exit_code == 1
+    timings = json.loads(timings_path.read_text(encoding="utf-8"))
+    assert timings["version"] == phmdoctest.__version__
+    assert timings["stages"][0]["name"] == "generate"
+    assert "fillrole.assign" in timings["totals"]
+    trace = json.loads(trace_path.read_text(encoding="utf-8"))
+    events = trace["traceEvents"]
+    assert len(events) == len(timings["stages"])
+    assert {"name", "ph", "ts", "dur", "pid", "tid", "args"} <= set(events[0])
@@ -0,0 +1,191 @@
+"""pytest test cases for --watch."""
+
+from phmdoctest.entryargs import Args
+import phmdoctest.batch
+import phmdoctest.main
+import phmdoctest.simulator
+import phmdoctest.watch
+
+
+MARKDOWN = """\
+```python
+print(1)
+```
+```
+1
+```
+
+<!--phmdoctest-share-names-->
+```python
+a = 5
+```
+
+<!--phmdoctest-clear-names-->
+```python
+print(a)
+```
+```
+5
+```
+
+<!--phmdoctest-label test_labeled-->
+```python
+b = 1
+```
+
+```py
+>>> 2 + 2
+4
+```
+"""
+
+
+def make_args(markdown_file, outfile, **kwargs):
+    fields = dict(
+        markdown_file=markdown_file,
+        outfile=outfile,
+        skips=(),
+        is_report=False,
+        fail_nocode=False,
+        setup=None,
+        teardown=None,
+        setup_doctest=False,
+        stamp=False,
+        stream_output=False,
+        compact=False,
+        shard=None,
+        xdist_groups=False,
+        fingerprints=False,
+        timeout=None,
+        measure=False,
+        measure_cprofile=False,
+    )
+    fields.update(kwargs)
+    return Args(**fields)
+
+
+def fingerprints(tmp_path, markdown, **kwargs):
+    """Fingerprints of the test cases of the Markdown."""
+    path = tmp_path / "doc.md"
+    path.write_text(markdown, encoding="utf-8")
+    args = make_args(str(path), "test_doc.py", **kwargs)
+    return phmdoctest.watch.fingerprints(args, phmdoctest.watch.read_blocks(args))
+
+
+def node_ids(units):
+    """The node ids in the dependency units."""
+    return [node for unit in units for node, _ in unit]
+
+
+def test_node_ids(tmp_path):
+    """Code blocks are test functions and sessions are doctests."""
+    assert node_ids(fingerprints(tmp_path, MARKDOWN)) == [
+        "test_doc.py::test_code_2_output_5",
+        "test_doc.py::test_code_10",
+        "test_doc.py::test_code_15_output_18",
+        "test_doc.py::test_labeled",
+        "test_doc.py::test_doc.session_00001_line_27",
+    ]
+    assert node_ids(fingerprints(tmp_path, MARKDOWN, compact=True))[:2] == [
+        "test_doc.py::test_block[test_code_2_output_5]",
+        "test_doc.py::test_block[test_code_10]",
+    ]
+
+
+def test_changed_nodes(tmp_path):
+    """Edits change the edited block and the blocks that depend on it."""
+    old = fingerprints(tmp_path, MARKDOWN)
+    moved = fingerprints(tmp_path, "\n\n" + MARKDOWN)
+    assert phmdoctest.watch.changed_nodes(old, moved) == []
+    new = fingerprints(tmp_path, MARKDOWN.replace("a = 5", "a = 6"))
+    assert phmdoctest.watch.changed_nodes(old, new) == [
+        "test_doc.py::test_code_10",
+        "test_doc.py::test_code_15_output_18",
+    ]
+    new = fingerprints(tmp_path, MARKDOWN.replace("4\n```", "5\n```"))
+    assert phmdoctest.watch.changed_nodes(old, new) == [
+        "test_doc.py::test_doc.session_00001_line_27"
+    ]
+    new = fingerprints(tmp_path, MARKDOWN.replace("test_labeled", "test_renamed"))
+    assert phmdoctest.watch.changed_nodes(old, new) == ["test_doc.py::test_renamed"]
+
+
+def test_changed_nodes_share_names(tmp_path):
+    """The tests before a changed test in its share-names chain run too."""
+    old = fingerprints(tmp_path, MARKDOWN)
+    new = fingerprints(tmp_path, MARKDOWN.replace("print(a)", "print( a)"))
+    assert phmdoctest.watch.changed_nodes(old, new) == [
+        "test_doc.py::test_code_10",
+        "test_doc.py::test_code_15_output_18",
+    ]
+
+
+def test_setup_changes_code(tmp_path):
+    """A change to the setup block changes all the code blocks."""
+    markdown = "```python\nx = 1\n```\n" + MARKDOWN
+    old = fingerprints(tmp_path, markdown, setup="FIRST")
+    new = fingerprints(tmp_path, markdown.replace("x = 1", "x = 2"), setup="FIRST")
+    changed = phmdoctest.watch.changed_nodes(old, new)
+    assert len(changed) == 4
+    assert "session" not in " ".join(changed)
+
+
+def test_watch(tmp_path, monkeypatch, capsys):
+    """Only changed test cases run after the first run."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(MARKDOWN, encoding="utf-8")
+    outfile = str(tmp_path / "test_doc.py")
+    edits = [
+        MARKDOWN.replace("print(1)", "print(2)"),
+        "<!--phmdoctest-label 9-->\n```python\nprint(1)\n```\n",
+        MARKDOWN,
+    ]
+    runs = []
+
+    def edit(seconds):
+        markdown_path.write_text(edits.pop(0), encoding="utf-8")
+
+    def run_pytest(watched, nodes):
+        with open(outfile, encoding="utf-8") as fp:
+            runs.append((nodes, fp.read()))
+
+    monkeypatch.setattr(phmdoctest.watch.time, "sleep", edit)
+    monkeypatch.setattr(phmdoctest.watch, "run_pytest", run_pytest)
+    args = make_args(str(markdown_path), outfile)
+    phmdoctest.watch.watch([args], None, max_polls=3)
+    assert [nodes for nodes, _ in runs] == [
+        [outfile],
+        [outfile + "::test_code_2_output_5"],
+        [outfile + "::test_code_2_output_5"],
+    ]
+    assert "print(2)" in runs[1][1]
+    assert "print(1)" in runs[2][1]
+    captured = capsys.readouterr()
+    assert captured.out.count("doc.md changed: 1 test cases to run.") == 2
+    assert "must be a valid python identifier" in captured.err
+
+
+def test_runs_pytest(tmp_path, capsys):
+    """pytest runs in process on the test file."""
+    markdown_path = tmp_path / "doc.md"
+    markdown_path.write_text(MARKDOWN, encoding="utf-8")
+    args = make_args(str(markdown_path), str(tmp_path / "test_doc.py"))
+    phmdoctest.watch.watch([args], None, max_polls=0)
+    assert "5 passed" in capsys.readouterr().out
+
+
+def test_bad_options():
+    """--watch needs an outfile path and doesn't check or shard."""
+    runner = phmdoctest.simulator.cli_runner()
+    for options in (["--outfile", "-"], ["--outfile", "t.py", "--check"]):
+        result = runner.invoke(
+            phmdoctest.main.entry_point, ["doc/example1.md", "--watch"] + options
+        )
+        assert result.exit_code == 1
+        assert "--watch" in result.stderr
+    result = runner.invoke(
+        phmdoctest.batch.batch_entry_point,
+        ["doc", "--outdir", "out", "--watch", "--shard", "1/2"],
+    )
+    assert result.exit_code == 1
+    assert "--watch can't be used with --check or --shard." in result.stderr